@@ -0,0 +1,79 @@
+"""
+Compares two benchmark result files, e.g. before and after a change.
+
+    python -m benchmarks.compare baseline.json candidate.json --tolerance 0.1
+
+Prints candidate/baseline ratios for every benchmark and size present in both,
+and exits with status 1 if any throughput fell, or latency or memory rose,
+by more than the tolerance.
+"""
+
+import argparse
+import json
+import sys
+
+# (metric, True if higher is better)
+METRICS = [
+    ("texts_per_second", True),
+    ("latency_p50_seconds", False),
+    ("latency_p95_seconds", False),
+    ("latency_p99_seconds", False),
+    ("setup_seconds", False),
+    ("peak_rss_mb", False),
+]
+
+
+def _load(path: str) -> dict[tuple[str, int], dict]:
+    with open(path, encoding="utf-8") as f:
+        results = json.load(f)["results"]
+    return {(result["benchmark"], result["n_texts"]): result for result in results}
+
+
+def compare(
+    baseline: dict[tuple[str, int], dict],
+    candidate: dict[tuple[str, int], dict],
+    tolerance: float,
+) -> tuple[list[str], list[str]]:
+    """Report lines, and a description of each regression beyond tolerance."""
+    lines = []
+    regressions = []
+    for key in sorted(baseline.keys() & candidate.keys()):
+        benchmark, n_texts = key
+        lines.append(f"{benchmark} ({n_texts} texts)")
+        for metric, higher_is_better in METRICS:
+            before, after = baseline[key][metric], candidate[key][metric]
+            if not before:
+                continue
+            ratio = after / before
+            regressed = (
+                ratio < 1 - tolerance if higher_is_better else ratio > 1 + tolerance
+            )
+            lines.append(
+                f"  {metric:<22} {before:>12.4g} -> {after:>12.4g}  x{ratio:.2f}"
+                + ("  REGRESSION" if regressed else "")
+            )
+            if regressed:
+                regressions.append(
+                    f"{benchmark} ({n_texts} texts) {metric} x{ratio:.2f}"
+                )
+    return lines, regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    lines, regressions = compare(
+        _load(args.baseline), _load(args.candidate), args.tolerance
+    )
+    print("\n".join(lines))
+    if regressions:
+        print(f"\n{len(regressions)} regression(s):\n" + "\n".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
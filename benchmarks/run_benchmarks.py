@@ -0,0 +1,324 @@
+"""
+Benchmarks DEFTMatcher's matchers and whole pipelines on synthetic data.
+
+Run from the repository root, with deft_matcher importable, e.g.
+
+    PYTHONPATH=src python -m benchmarks.run_benchmarks --sizes 1000 100000 --output results.json
+
+Each benchmark runs in a fresh process, so its peak RSS is its own.
+Results are written as JSON, and two result files can be compared with benchmarks.compare.
+"""
+
+import argparse
+import json
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from pathlib import Path
+
+from benchmarks.synthetic import (
+    build_rag_data,
+    synthetic_corpus,
+    synthetic_terms,
+    write_obo,
+    write_obographs,
+)
+
+BENCHMARKS = [
+    "exact",
+    "synonym",
+    "mention",
+    "fuzzy",
+    "fast_hpo_cr",
+    "fast_hpo_cr_bulk",
+    "retriever",
+    "retriever_adaptive",
+    "rag",
+    "pipeline",
+]
+# These call the (stubbed) LLM, so only see the first llm_max_texts free texts.
+LLM_BENCHMARKS = {"rag", "pipeline"}
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def _time_batches(
+    get_matches_batch: Callable[[list[str]], list],
+    free_texts: list[str],
+    batch_size: int,
+) -> tuple[float, list[tuple[int, float]], int]:
+    """Wall time, (texts, seconds) per batch, and how many free texts got any result."""
+    timings: list[tuple[int, float]] = []
+    with_results = 0
+    start = time.perf_counter()
+    for batch_start in range(0, len(free_texts), batch_size):
+        batch = free_texts[batch_start : batch_start + batch_size]
+        batch_timer = time.perf_counter()
+        results = get_matches_batch(batch)
+        timings.append((len(batch), time.perf_counter() - batch_timer))
+        with_results += sum(bool(result) for result in results)
+    return time.perf_counter() - start, timings, with_results
+
+
+def _summary(
+    wall_seconds: float, timings: list[tuple[int, float]], n_texts: int
+) -> dict[str, float]:
+    from deft_matcher.metrics import weighted_percentile
+
+    return {
+        "wall_seconds": wall_seconds,
+        "texts_per_second": n_texts / wall_seconds if wall_seconds else 0.0,
+        "latency_p50_seconds": weighted_percentile(timings, 50),
+        "latency_p95_seconds": weighted_percentile(timings, 95),
+        "latency_p99_seconds": weighted_percentile(timings, 99),
+    }
+
+
+def _make_matcher(benchmark: str, data: dict, llm_host: str | None):
+    if benchmark == "exact":
+        from deft_matcher.lexicon import load_or_build_lexicon
+        from deft_matcher.matchers.exact_matcher import ExactMatcher
+
+        return ExactMatcher(load_or_build_lexicon(data["obographs"], data["cache_dir"]))
+    elif benchmark == "synonym":
+        from deft_matcher.lexicon import load_or_build_lexicon
+        from deft_matcher.matchers.synonym_matcher import SynonymMatcher
+
+        return SynonymMatcher(
+            load_or_build_lexicon(data["obographs"], data["cache_dir"])
+        )
+    elif benchmark == "mention":
+        from deft_matcher.lexicon import load_or_build_lexicon
+        from deft_matcher.matchers.mention_matcher import MentionMatcher
+
+        return MentionMatcher(
+            load_or_build_lexicon(data["obographs"], data["cache_dir"])
+        )
+    elif benchmark == "fuzzy":
+        from deft_matcher.lexicon import load_or_build_lexicon
+        from deft_matcher.matchers.fuzzy_matcher import FuzzyMatcher
+
+        return FuzzyMatcher(load_or_build_lexicon(data["obographs"], data["cache_dir"]))
+    elif benchmark in ("fast_hpo_cr", "fast_hpo_cr_bulk"):
+        from deft_matcher.matchers.fast_hpo_cr_matcher import FastHPOCRMatcher
+
+        return FastHPOCRMatcher(
+            data["obo"],
+            data["fast_hpo_cr_dir"],
+            bulk_annotation=benchmark == "fast_hpo_cr_bulk",
+        )
+    elif benchmark == "rag":
+        from deft_matcher.matchers.rag_hpo_matcher.rag_hpo_matcher import RagHpoMatcher
+
+        return RagHpoMatcher(
+            model_name="stub",
+            ollama_host=llm_host,
+            max_concurrent_requests=data["llm_concurrency"],
+            index_cache_dir=data["cache_dir"],
+            **data["rag"],
+        )
+    raise ValueError(f"Unknown benchmark {benchmark}.")
+
+
+def run_benchmark(benchmark: str, n_texts: int, data: dict) -> dict:
+    """Runs one benchmark in the current process, which should be a fresh one."""
+    from deft_matcher.testing import FakeOllama
+
+    terms = synthetic_terms(data["n_terms"], data["seed"])
+    free_texts = synthetic_corpus(terms, n_texts, data["seed"])
+    if benchmark in LLM_BENCHMARKS:
+        free_texts = free_texts[: data["llm_max_texts"]]
+    del terms
+
+    with FakeOllama(latency=data["llm_latency"]) as ollama:
+        setup_start = time.perf_counter()
+        if benchmark in ("retriever", "retriever_adaptive"):
+            from deft_matcher.matchers.rag_hpo_matcher.candidate_retriever import (
+                HpoCandidateRetriever,
+            )
+
+            retriever = HpoCandidateRetriever(
+                **data["rag"], index_cache_dir=data["cache_dir"]
+            )
+            retriever.warmup()
+            setup_seconds = time.perf_counter() - setup_start
+
+            def get_matches_batch(batch: list[str]) -> list:
+                return retriever.get_candidates_batch(
+                    batch,
+                    amount_to_search=500,
+                    min_candidates=15,
+                    max_candidates=20,
+                    similarity_threshold=0.35,
+                    hybrid_search=True,
+                    initial_amount_to_search=(
+                        data["initial_amount_to_search"]
+                        if benchmark == "retriever_adaptive"
+                        else None
+                    ),
+                )
+
+            wall, timings, with_results = _time_batches(
+                get_matches_batch, free_texts, data["batch_size"]
+            )
+        elif benchmark == "pipeline":
+            wall, timings, with_results, setup_seconds = _run_pipeline(
+                free_texts, data, ollama.host, setup_start
+            )
+        else:
+            matcher = _make_matcher(benchmark, data, ollama.host)
+            matcher.warmup()
+            setup_seconds = time.perf_counter() - setup_start
+            wall, timings, with_results = _time_batches(
+                matcher.get_matches_batch, free_texts, data["batch_size"]
+            )
+
+    return {
+        "benchmark": benchmark,
+        "n_texts": len(free_texts),
+        "n_terms": data["n_terms"],
+        "setup_seconds": setup_seconds,
+        **_summary(wall, timings, len(free_texts)),
+        "texts_with_results": with_results,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _run_pipeline(free_texts: list[str], data: dict, llm_host: str, setup_start: float):
+    """Exact, then synonym, then RAG matching, deduplicated by NormalisingCanonicaliser."""
+    from deft_matcher.ambiguity_resolvers.choose_first_resolver import (
+        ChooseFirstResolver,
+    )
+    from deft_matcher.canonicalisers.normalising_canonicaliser import (
+        NormalisingCanonicaliser,
+    )
+    from deft_matcher.decisive_matcher import DecisiveMatcher
+    from deft_matcher.deft_matcher import DeftMatcher
+    from deft_matcher.run_logging import LogConfig
+
+    choose_first = ChooseFirstResolver()
+    deft_matcher = DeftMatcher(
+        decisive_matchers=[
+            DecisiveMatcher(
+                _make_matcher(benchmark, data, llm_host),
+                ambiguity_resolver=choose_first,
+            )
+            for benchmark in ["exact", "synonym", "rag"]
+        ],
+        free_texts=set(free_texts),
+        data_name="BENCHMARK",
+        batch_size=data["batch_size"],
+        canonicaliser=NormalisingCanonicaliser(),
+        log_config=LogConfig(per_text="off", log_dir=None),
+    )
+    deft_matcher.warmup()
+    setup_seconds = time.perf_counter() - setup_start
+    deft_matcher.run()
+
+    timings = [
+        timing
+        for stage in deft_matcher.metrics.stages
+        for timing in stage.batch_timings
+    ]
+    return (
+        deft_matcher.metrics.wall_seconds,
+        timings,
+        len(deft_matcher.matched),
+        setup_seconds,
+    )
+
+
+def prepare_data(
+    args: argparse.Namespace, work_dir: Path, benchmarks: list[str]
+) -> dict:
+    """Writes the synthetic ontology, and the RAG data if it is needed, to work_dir."""
+    terms = synthetic_terms(args.n_terms, args.seed)
+    write_obographs(terms, work_dir / "hp.json")
+    write_obo(terms, work_dir / "hp.obo")
+    (work_dir / "fast_hpo_cr").mkdir(exist_ok=True)
+    (work_dir / "cache").mkdir(exist_ok=True)
+    data = {
+        "n_terms": args.n_terms,
+        "seed": args.seed,
+        "batch_size": args.batch_size,
+        "llm_latency": args.llm_latency,
+        "llm_concurrency": args.llm_concurrency,
+        "llm_max_texts": args.llm_max_texts,
+        "initial_amount_to_search": args.initial_amount_to_search,
+        "obographs": str(work_dir / "hp.json"),
+        "obo": str(work_dir / "hp.obo"),
+        "fast_hpo_cr_dir": str(work_dir / "fast_hpo_cr"),
+        "cache_dir": str(work_dir / "cache"),
+    }
+    if {"retriever", "retriever_adaptive", "rag", "pipeline"} & set(benchmarks):
+        data["rag"] = build_rag_data(terms, work_dir / "rag", seed=args.seed)
+    return data
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument(
+        "--benchmarks", nargs="+", choices=BENCHMARKS, default=BENCHMARKS
+    )
+    parser.add_argument("--n-terms", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--llm-latency", type=float, default=0.02)
+    parser.add_argument("--llm-concurrency", type=int, default=8)
+    parser.add_argument("--llm-max-texts", type=int, default=2000)
+    parser.add_argument("--initial-amount-to-search", type=int, default=32)
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        data = prepare_data(args, Path(work_dir), args.benchmarks)
+        for n_texts in args.sizes:
+            for benchmark in args.benchmarks:
+                with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as pool:
+                    result = pool.submit(
+                        run_benchmark, benchmark, n_texts, data
+                    ).result()
+                print(json.dumps(result), file=sys.stderr)
+                results.append(result)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "meta": {
+                    "git_commit": _git_commit(),
+                    "timestamp": datetime.now(timezone.utc).isoformat(),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "args": vars(args),
+                },
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Deterministic synthetic ontologies, free text corpora, and RAG data for benchmarking.
+
+Every generator takes a seed, so the same arguments always give the same output.
+"""
+
+import json
+import random
+from pathlib import Path
+
+_SYLLABLES = (
+    "ab ac al an ar ba ce cor da de di dys en fa ga hy in ka la le li lo ma me "
+    "mi mo na ne no os pa pe po ra re ro sa se si ta te ti to tu ur va ve vi"
+).split()
+_SYNONYM_PREDICATES = [
+    ("hasExactSynonym", "EXACT"),
+    ("hasRelatedSynonym", "RELATED"),
+    ("hasBroadSynonym", "BROAD"),
+    ("hasNarrowSynonym", "NARROW"),
+]
+_SYNONYM_TYPES = [None, "layperson", "abbreviation", "plural_form", "uk_spelling"]
+_OBO_PREFIX = "http://purl.obolibrary.org/obo/"
+ROOT_ID = "HP:0000118"
+
+
+def _vocabulary(rng: random.Random, size: int) -> list[str]:
+    words: set[str] = set()
+    while len(words) < size:
+        words.add("".join(rng.choices(_SYLLABLES, k=rng.randint(2, 4))))
+    return sorted(words)
+
+
+def _phrase(rng: random.Random, vocabulary: list[str]) -> str:
+    return " ".join(rng.choices(vocabulary, k=rng.randint(1, 4))).capitalize()
+
+
+def synthetic_terms(n_terms: int, seed: int = 0) -> list[dict]:
+    """
+    n_terms made-up HPO-like terms, each {"id", "name", "synonyms": [(name, scope, type)]},
+    all children of the Phenotypic abnormality root.
+    """
+    rng = random.Random(seed)
+    vocabulary = _vocabulary(rng, max(50, int(n_terms**0.6) * 4))
+    terms = []
+    for number in range(n_terms):
+        synonyms = [
+            (
+                _phrase(rng, vocabulary),
+                rng.choice(_SYNONYM_PREDICATES)[1],
+                rng.choice(_SYNONYM_TYPES),
+            )
+            for _ in range(rng.choice([0, 0, 1, 1, 2, 3]))
+        ]
+        terms.append(
+            {
+                "id": f"HP:{1000000 + number:07d}",
+                "name": _phrase(rng, vocabulary),
+                "synonyms": synonyms,
+            }
+        )
+    return terms
+
+
+def _obo_uri(term_id: str) -> str:
+    return _OBO_PREFIX + term_id.replace(":", "_")
+
+
+def write_obographs(terms: list[dict], path: Path, version: str = "2025-01-01") -> None:
+    """Writes the terms as an obographs JSON file, which hpotk.load_ontology can read."""
+    predicates = {scope: predicate for predicate, scope in _SYNONYM_PREDICATES}
+    nodes = [
+        {"id": _obo_uri("HP:0000001"), "lbl": "All", "type": "CLASS"},
+        {"id": _obo_uri(ROOT_ID), "lbl": "Phenotypic abnormality", "type": "CLASS"},
+    ]
+    edges = [{"sub": _obo_uri(ROOT_ID), "pred": "is_a", "obj": _obo_uri("HP:0000001")}]
+    for term in terms:
+        node = {"id": _obo_uri(term["id"]), "lbl": term["name"], "type": "CLASS"}
+        if term["synonyms"]:
+            node["meta"] = {
+                "synonyms": [
+                    {
+                        "pred": predicates[scope],
+                        "val": name,
+                        **(
+                            {"synonymType": f"{_OBO_PREFIX}hp#{synonym_type}"}
+                            if synonym_type
+                            else {}
+                        ),
+                    }
+                    for name, scope, synonym_type in term["synonyms"]
+                ]
+            }
+        nodes.append(node)
+        edges.append(
+            {"sub": _obo_uri(term["id"]), "pred": "is_a", "obj": _obo_uri(ROOT_ID)}
+        )
+
+    graph = {
+        "id": f"{_OBO_PREFIX}hp.json",
+        "meta": {"version": f"{_OBO_PREFIX}hp/releases/{version}/hp.json"},
+        "nodes": nodes,
+        "edges": edges,
+    }
+    path.write_text(json.dumps({"graphs": [graph]}), encoding="utf-8")
+
+
+def write_obo(terms: list[dict], path: Path, version: str = "2025-01-01") -> None:
+    """Writes the terms as an OBO file, which FastHPOCR can index."""
+    lines = [
+        "format-version: 1.2",
+        f"data-version: hp/releases/{version}",
+        "ontology: hp",
+        *(
+            f'synonymtypedef: {synonym_type} "{synonym_type}"'
+            for synonym_type in _SYNONYM_TYPES
+            if synonym_type
+        ),
+        "",
+        "[Term]",
+        "id: HP:0000001",
+        "name: All",
+        "",
+        "[Term]",
+        f"id: {ROOT_ID}",
+        "name: Phenotypic abnormality",
+        "is_a: HP:0000001",
+        "",
+    ]
+    for term in terms:
+        lines += ["[Term]", f"id: {term['id']}", f"name: {term['name']}"]
+        for name, scope, synonym_type in term["synonyms"]:
+            type_part = f" {synonym_type}" if synonym_type else ""
+            lines.append(f'synonym: "{name}" {scope}{type_part} []')
+        lines += [f"is_a: {ROOT_ID}", ""]
+    path.write_text("\n".join(lines), encoding="utf-8")
+
+
+def _typo(rng: random.Random, text: str) -> str:
+    if len(text) < 2:
+        return text
+    position = rng.randrange(len(text) - 1)
+    return text[:position] + text[position + 1] + text[position] + text[position + 2 :]
+
+
+def synthetic_corpus(terms: list[dict], n_texts: int, seed: int = 0) -> list[str]:
+    """
+    n_texts free texts, made of exact labels, synonyms, case and punctuation variants,
+    typos, labels inside longer sentences, and unrelated noise, with repeats.
+    """
+    rng = random.Random(seed)
+    noise_vocabulary = _vocabulary(random.Random(seed + 1), 200)
+    texts = []
+    for _ in range(n_texts):
+        term = rng.choice(terms)
+        names = [term["name"], *(name for name, _, _ in term["synonyms"])]
+        kind = rng.random()
+        if kind < 0.3:
+            texts.append(term["name"])
+        elif kind < 0.45:
+            texts.append(rng.choice(names))
+        elif kind < 0.55:
+            texts.append(f"  {rng.choice(names).upper()}. ")
+        elif kind < 0.65:
+            texts.append(_typo(rng, rng.choice(names)))
+        elif kind < 0.8:
+            texts.append(
+                f"patient has {rng.choice(names).lower()} since {rng.randint(1, 12)} months"
+            )
+        else:
+            texts.append(" ".join(rng.choices(noise_vocabulary, k=rng.randint(1, 5))))
+    return texts
+
+
+def build_rag_data(terms: list[dict], output_dir: Path, dim: int = 64, seed: int = 0):
+    """
+    Embeds every label and synonym of the synthetic terms with a random-projection
+    embedder, as the tests do for the mini HPO.
+    Returns the three paths HpoCandidateRetriever needs.
+    """
+    from deft_matcher.testing import build_rag_data as build_entries_rag_data
+
+    entries = [
+        {"hp_id": term["id"], "info": name}
+        for term in terms
+        for name in [term["name"], *(name for name, _, _ in term["synonyms"])]
+    ]
+    return build_entries_rag_data(entries, output_dir, dim=dim, seed=seed)
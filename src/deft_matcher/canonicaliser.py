@@ -0,0 +1,29 @@
+from abc import ABC, abstractmethod
+
+
+class Canonicaliser(ABC):
+    """
+    Decides which free texts are close enough to be matched as one.
+
+    Free texts with the same canonical form fall into the same equivalence class,
+    and DeftMatcher only sends one member of each class to its matchers.
+    """
+
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        """Each canonicaliser must have a 'name' attribute."""
+        pass
+
+    @property
+    def config(self) -> dict[str, str]:
+        """
+        Any settings, beyond the name, which change the canonical forms given.
+        Used to tell runs apart, so canonicalisers with options should override it.
+        """
+        return {}
+
+    @abstractmethod
+    def canonicalise(self, free_text: str) -> str:
+        """The canonical form of the free text."""
+        raise NotImplementedError
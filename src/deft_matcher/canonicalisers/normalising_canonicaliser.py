@@ -0,0 +1,89 @@
+import json
+import sys
+import unicodedata
+from functools import cache
+
+from deft_matcher.canonicaliser import Canonicaliser
+
+
+@cache
+def _punctuation_to_space() -> dict[int, str]:
+    """A str.translate table replacing every unicode punctuation character with a space."""
+    return {
+        code_point: " "
+        for code_point in range(sys.maxunicode + 1)
+        if unicodedata.category(chr(code_point)).startswith("P")
+    }
+
+
+class NormalisingCanonicaliser(Canonicaliser):
+    """
+    Treats free texts as the same if they differ only in unicode form, whitespace,
+    and optionally case, punctuation, or trailing qualifiers.
+
+    Punctuation means the unicode punctuation categories, so brackets, hyphens
+    and full stops are replaced by spaces, but signs such as "+" are kept.
+    trailing_qualifiers are words or phrases, e.g. "nos" or "unspecified",
+    which are dropped from the end of a free text, as many times as they occur,
+    unless nothing would be left.
+
+    >>> canonicaliser = NormalisingCanonicaliser(trailing_qualifiers=["nos"])
+    >>> canonicaliser.canonicalise("  Short-stature,  NOS ")
+    'short stature'
+    """
+
+    lowercase: bool
+    strip_punctuation: bool
+    trailing_qualifiers: list[list[str]]
+
+    def __init__(
+        self,
+        lowercase: bool = True,
+        strip_punctuation: bool = True,
+        trailing_qualifiers: list[str] | None = None,
+    ) -> None:
+        self.lowercase = lowercase
+        self.strip_punctuation = strip_punctuation
+        self.trailing_qualifiers = [
+            words
+            for words in (
+                self._words(qualifier) for qualifier in trailing_qualifiers or []
+            )
+            if words
+        ]
+
+    @property
+    def name(self) -> str:
+        return "NormalisingCanonicaliser"
+
+    @property
+    def config(self) -> dict[str, str]:
+        return {
+            "lowercase": str(self.lowercase),
+            "strip_punctuation": str(self.strip_punctuation),
+            "trailing_qualifiers": json.dumps(self.trailing_qualifiers),
+        }
+
+    def canonicalise(self, free_text: str) -> str:
+        words = self._words(free_text)
+
+        stripped = True
+        while stripped:
+            stripped = False
+            for qualifier in self.trailing_qualifiers:
+                if (
+                    len(words) > len(qualifier)
+                    and words[-len(qualifier) :] == qualifier
+                ):
+                    words = words[: -len(qualifier)]
+                    stripped = True
+
+        return " ".join(words)
+
+    def _words(self, text: str) -> list[str]:
+        text = unicodedata.normalize("NFKC", text)
+        if self.lowercase:
+            text = text.casefold()
+        if self.strip_punctuation:
+            text = text.translate(_punctuation_to_space())
+        return text.split()
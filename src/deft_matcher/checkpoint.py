@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+from collections.abc import Collection
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from deft_matcher.canonicaliser import Canonicaliser
+from deft_matcher.decisive_matcher import DecisiveMatcher
+from deft_matcher.match_cache import matcher_key
+
+_FORMAT = "deft_matcher.checkpoint.v1"
+
+
+@dataclass(frozen=True)
+class CheckpointConfig:
+    """
+    Where DeftMatcher snapshots its progress, and how often.
+
+    A snapshot is written at the end of every stage, and atomically replaces
+    the one before, so the file at path always holds a complete snapshot.
+    Within a stage, whenever every_n_texts more free texts have been dealt with,
+    only what they added is appended to a journal beside it, so that checkpointing
+    costs no more as the run goes on. Loading a snapshot replays its journal.
+    """
+
+    path: str
+    every_n_texts: int = 10000
+
+    def __post_init__(self) -> None:
+        if self.every_n_texts < 1:
+            raise ValueError(
+                f"every_n_texts must be at least 1, but was {self.every_n_texts}."
+            )
+
+
+def _journal_path(path: str | Path) -> Path:
+    path = Path(path)
+    return path.with_name(f"{path.name}.journal")
+
+
+def pipeline_key(
+    decisive_matchers: list[DecisiveMatcher], canonicaliser: Canonicaliser | None
+) -> str:
+    """
+    Identifies the matchers, their configs and versions, the resolvers,
+    and the canonicaliser and its config.
+    """
+    identity = json.dumps(
+        [
+            [
+                [matcher_key(dm.matcher), dm.ambiguity_resolver.name]
+                for dm in decisive_matchers
+            ],
+            [canonicaliser.name, canonicaliser.config]
+            if canonicaliser is not None
+            else None,
+        ],
+        sort_keys=True,
+    ).encode("utf-8")
+    return hashlib.sha256(identity).hexdigest()
+
+
+def free_texts_key(free_texts: Collection[str]) -> str:
+    """Identifies a set of free texts, whatever order they come in."""
+    digest = hashlib.sha256()
+    for free_text in sorted(free_texts):
+        digest.update(free_text.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+@dataclass
+class Checkpoint:
+    """
+    A snapshot of a DeftMatcher run.
+
+    unmatched holds the free texts which were unmatched when stage next_index began,
+    and stage_done those of their representatives already dealt with in that stage,
+    so a resumed run only sends the rest to the matcher.
+    pipeline_key and free_texts_key record what the run was,
+    so that a snapshot is never resumed by a different run.
+    """
+
+    pipeline_key: str
+    free_texts_key: str
+    next_index: int
+    matched: dict[str, str]
+    unmatched: list[str]
+    stage_done: list[str]
+
+    def save(self, path: str | Path) -> None:
+        """
+        Writes the snapshot via a temporary file, so a half-written one is never read,
+        then drops the journal, which it now includes.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"format": _FORMAT, **asdict(self)}, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        _journal_path(path).unlink(missing_ok=True)
+
+    @staticmethod
+    def append_progress(
+        path: str | Path,
+        next_index: int,
+        matched: dict[str, str],
+        stage_done: list[str],
+    ) -> None:
+        """
+        Appends to the journal of the snapshot at path the free texts newly dealt with
+        in stage next_index, and those newly matched.
+        """
+        entry = json.dumps(
+            {"next_index": next_index, "matched": matched, "stage_done": stage_done},
+            ensure_ascii=False,
+        )
+        with open(_journal_path(path), "a", encoding="utf-8") as f:
+            f.write(f"{entry}\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    @classmethod
+    def load(cls, path: str | Path) -> "Checkpoint":
+        """Reads the snapshot at path, with the progress in its journal applied."""
+        with open(path, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+        if snapshot.pop("format", None) != _FORMAT:
+            raise ValueError(f"{path} is not a DeftMatcher checkpoint.")
+        checkpoint = cls(**snapshot)
+        checkpoint.replay_journal(path)
+        return checkpoint
+
+    def replay_journal(self, path: str | Path) -> None:
+        """
+        Applies the progress journalled since the snapshot at path was written.
+
+        Entries for another stage are skipped. They can only be left over
+        from a snapshot which was written, but whose journal was not yet dropped,
+        and are already in it. So is a last entry cut short by a crash.
+        """
+        journal_path = _journal_path(path)
+        if not journal_path.exists():
+            return
+
+        stage_done = set(self.stage_done)
+        with open(journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                if entry["next_index"] != self.next_index:
+                    continue
+                self.matched.update(entry["matched"])
+                stage_done.update(entry["stage_done"])
+        self.stage_done = sorted(stage_done)
@@ -1,4 +1,5 @@
 from deft_matcher.ambiguity_resolver import AmbiguityResolver
+from deft_matcher.execution import ExecutorType
 from deft_matcher.matcher import Matcher
 
 
@@ -6,11 +7,25 @@ class DecisiveMatcher:
     """
     Simply a combination of a Matcher and an AmbiguityResolver.
     Together these can unambiguously match free text to a single string.
+
+    By default the matcher is applied serially. Set executor_type to "thread"
+    (for I/O-bound matchers) or "process" (for CPU-bound matchers) to spread
+    the stage across n_workers workers.
     """
 
     matcher: Matcher
     ambiguity_resolver: AmbiguityResolver
+    executor_type: ExecutorType
+    n_workers: int
 
-    def __init__(self, matcher: Matcher, ambiguity_resolver: AmbiguityResolver) -> None:
+    def __init__(
+        self,
+        matcher: Matcher,
+        ambiguity_resolver: AmbiguityResolver,
+        executor_type: ExecutorType = "serial",
+        n_workers: int = 1,
+    ) -> None:
         self.matcher = matcher
         self.ambiguity_resolver = ambiguity_resolver
+        self.executor_type = executor_type
+        self.n_workers = n_workers
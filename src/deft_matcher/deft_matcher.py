@@ -1,12 +1,34 @@
+import cProfile
+import os
 import random
+import time
+import weakref
+from datetime import datetime, timezone
+from collections.abc import Collection, Iterable, Iterator
+from itertools import count, islice
 from deft_matcher.ambiguity_resolver import AmbiguityResolver
+from deft_matcher.canonicaliser import Canonicaliser
+from deft_matcher.checkpoint import (
+    Checkpoint,
+    CheckpointConfig,
+    free_texts_key,
+    pipeline_key,
+)
 from deft_matcher.decisive_matcher import DecisiveMatcher
+from deft_matcher.execution import ExecutorType, StageExecutor
+from deft_matcher.match_cache import MatchCache
 from deft_matcher.matcher import Matcher
-from pathlib import Path
-from datetime import datetime
+from deft_matcher.metrics import RunMetrics, StageMetrics
+from deft_matcher.metrics_exporter import MetricsExporter
+from deft_matcher.profiling import ProfileConfig, SlowestTexts, write_slowest_texts
+from deft_matcher.results_store import MatchRecord, ResultsStore, stage_keys
+from deft_matcher.run_logging import LogConfig, RunLogHandlers
 import logging
 from logging import Logger
 
+# Numbers each run's logger, so that runs sharing a data_name never share handlers.
+_run_ids = count()
+
 
 class DeftMatcher:
     """
@@ -15,6 +37,55 @@ class DeftMatcher:
     Just provide your free texts, and your ordered list of DecisiveMatchers.
 
     The .next() function is your friend.
+
+    Free texts are passed to each matcher in chunks of batch_size,
+    so that matchers which implement get_matches_batch can amortise their cost.
+    If a DecisiveMatcher asks for a thread or process pool, the chunks are spread
+    across its workers and the results merged back in a fixed order.
+
+    If a MatchCache is given, each matcher's earlier answers are looked up there first,
+    and only the free texts it has never seen are sent to the matcher.
+
+    If a Canonicaliser is given, free texts with the same canonical form
+    are grouped into an equivalence class, and only one member of each class,
+    its representative, is sent to the matchers. Only if a matcher's matches for it
+    get no resolution are the other members sent, one by one, until one does.
+    The result is then recorded for every member.
+    saved_matcher_calls counts the free texts that were not sent, overall and per matcher.
+
+    Progress is logged to a logger of this run's own under "deft_matcher.<data_name>",
+    as set out by log_config.
+    By default every free text gets a record, and records go to a new file in logs/.
+    Call close() to detach the log handlers, and flush them if logging is asynchronous,
+    and to close the matchers, e.g. RagHpoMatcher's connections to Ollama.
+
+    Timings and counts for each stage are collected in metrics,
+    and handed to each of the metrics_exporters after every stage.
+
+    run and next take an optional ProfileConfig. When profiling, each stage is run
+    serially in this process under cProfile, one free text at a time,
+    so that the slowest free texts of each matcher can be kept in slowest_texts.
+    Batching and worker pools are skipped, so profiled runs are slower than normal ones.
+
+    If a CheckpointConfig is given, progress is snapshotted to checkpoint_config.path
+    at every stage boundary, and journalled beside it every every_n_texts free texts
+    within a stage. Resuming folds the journal back into the snapshot.
+    If that file already exists, the run carries on from it instead of starting again,
+    provided the matchers, resolvers, canonicaliser and free texts are the same.
+    Metrics only cover the work done since the run was resumed.
+    Checkpointing is not available when streaming.
+
+    If a ResultsStore is given, the run is incremental. Free texts already in the store
+    keep their stored result, unless the stage that decided it, or any stage before it,
+    now has a different matcher, config, version or resolver.
+    Free texts that went unmatched are only matched again if any stage has changed.
+    Only the remaining free texts are sent to the matchers, and what is decided for them
+    is written back to the store, with the matcher, version and resolver responsible.
+    reused holds the free texts whose stored results were used.
+
+    Matchers load their models and indexes when a free text first reaches them,
+    so a run that is settled by its early stages never pays for the later ones.
+    Call warmup() to load every matcher up front instead.
     """
 
     decisive_matchers: list[DecisiveMatcher]
@@ -24,34 +95,126 @@ class DeftMatcher:
     matched: dict[str, str]
     unmatched: set[str]
     logger: Logger
+    log_config: LogConfig
+    _log_handlers: RunLogHandlers
+    _sampler: random.Random
     data_name: str
+    batch_size: int
+    match_cache: MatchCache | None
+    canonicaliser: Canonicaliser | None
+    equivalence_classes: dict[str, list[str]]
+    _representatives: dict[str, str]
+    saved_matcher_calls: int
+    saved_matcher_calls_by_matcher: dict[str, int]
+    metrics: RunMetrics
+    metrics_exporters: list[MetricsExporter]
+    slowest_texts: dict[str, SlowestTexts]
+    checkpoint_config: CheckpointConfig | None
+    _stage_done: set[str]
+    _unsaved_progress: list[str]
+    _free_texts_key: str | None
+    results_store: ResultsStore | None
+    reused: set[str]
+    _settled: set[str]
 
     def __init__(
         self,
         decisive_matchers: list[DecisiveMatcher],
         free_texts: set[str],
         data_name: str,
+        batch_size: int = 1000,
+        match_cache: MatchCache | None = None,
+        canonicaliser: Canonicaliser | None = None,
+        log_config: LogConfig | None = None,
+        metrics_exporters: list[MetricsExporter] | None = None,
+        checkpoint_config: CheckpointConfig | None = None,
+        results_store: ResultsStore | None = None,
     ) -> None:
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be at least 1, but was {batch_size}.")
+
         self.decisive_matchers = decisive_matchers
+        self.data_name = data_name
+        self.log_config = log_config or LogConfig()
+        self.logger = self.initialise_logger()
+        self._sampler = random.Random(0)
+        self.batch_size = batch_size
+        self.match_cache = match_cache
+        self.canonicaliser = canonicaliser
+        self.checkpoint_config = checkpoint_config
+        self.results_store = results_store
+        self.reset(free_texts)
+        self.saved_matcher_calls = 0
+        self.saved_matcher_calls_by_matcher = {}
+        self.metrics = RunMetrics(data_name)
+        self.metrics_exporters = metrics_exporters or []
+        self.slowest_texts = {}
+
+        self.logger.info(self.startup_log_str())
+        if checkpoint_config is not None and os.path.exists(checkpoint_config.path):
+            self.resume_from_checkpoint()
+
+    def reset(self, free_texts: set[str]) -> None:
+        """Forgets any matches so far, and starts again from the first DecisiveMatcher."""
         self.next_index = 0
         self.next_matcher = self.get_next_matcher_from_next_index()
         self.next_resolver = self.get_next_resolver_from_next_index()
         self.matched = {}
         self.unmatched = free_texts
-        self.logger = self.initialise_logger()
-        self.data_name = data_name
+        self.equivalence_classes, self._representatives = self.group_free_texts(
+            free_texts
+        )
+        self._stage_done = set()
+        self._unsaved_progress = []
+        self._free_texts_key = (
+            free_texts_key(free_texts) if self.checkpoint_config is not None else None
+        )
+        self.reused, self._settled = set(), set()
+        if self.results_store is not None and free_texts:
+            self.reuse_stored_results()
 
-        self.logger.info(self.startup_log_str())
+    def warmup(self) -> None:
+        """Loads the models and indexes of every matcher now, rather than on first use."""
+        for decisive_matcher in self.decisive_matchers:
+            decisive_matcher.matcher.warmup()
 
-    def run(self):
+    def run(self, profile: ProfileConfig | None = None):
         """
         Applies all DecisiveMatchers in order.
         """
 
         for dm_no in range(len(self.decisive_matchers)):
-            self.next()
+            self.next(profile=profile)
+
+    def stream(
+        self, free_texts: Iterable[str], chunk_size: int = 10000
+    ) -> Iterator[tuple[str, str | None]]:
+        """
+        Matches free texts from an iterable of any length, chunk_size at a time.
 
-    def next(self):
+        Each chunk is put through every DecisiveMatcher, then for each free text in the chunk,
+        in the order given, the free text and its match (or None) are yielded.
+        Only one chunk is held at a time, so memory does not grow with the input,
+        and matched, unmatched and metrics.stages only ever describe the current chunk.
+        Free texts repeated across chunks are matched again, unless a MatchCache is used.
+        """
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be at least 1, but was {chunk_size}.")
+        if self.checkpoint_config is not None:
+            raise ValueError("Checkpointing is not available when streaming.")
+
+        # Keep the stages of the latest chunk only; totals still cover every chunk.
+        self.metrics.limit_stages(len(self.decisive_matchers))
+        free_texts_iter = iter(free_texts)
+        while chunk := list(islice(free_texts_iter, chunk_size)):
+            self.reset(set(chunk))
+            self.run()
+            for free_text in chunk:
+                yield free_text, self.matched.get(free_text)
+
+        self.reset(set())
+
+    def next(self, profile: ProfileConfig | None = None):
         """
         Applies the next DecisiveMatcher to the remaining unmatched strings.
         """
@@ -61,34 +224,492 @@ class DeftMatcher:
 
         matcher: Matcher = self.next_matcher
         resolver: AmbiguityResolver = self.next_resolver
+        decisive_matcher: DecisiveMatcher = self.decisive_matchers[self.next_index]
 
         self.log_new_matcher_and_resolver(
             matcher_name=matcher.name, resolver_name=resolver.name
         )
 
-        self.match(unmatched=self.unmatched, matcher=matcher, resolver=resolver)
+        self.match(
+            unmatched=self.unmatched,
+            matcher=matcher,
+            resolver=resolver,
+            executor_type=decisive_matcher.executor_type,
+            n_workers=decisive_matcher.n_workers,
+            profile=profile,
+        )
+
+    def match(
+        self,
+        unmatched: set[str],
+        matcher: Matcher,
+        resolver: AmbiguityResolver,
+        executor_type: ExecutorType = "serial",
+        n_workers: int = 1,
+        profile: ProfileConfig | None = None,
+    ):
+        """
+        Sends the representative of each equivalence class to the matcher.
+        Where that gets no resolution, the class's other members are sent,
+        one at a time, until one does or all have been tried.
+        """
+        stage_start = time.perf_counter()
+        stage_metrics = StageMetrics(
+            stage=self.next_index,
+            matcher_name=matcher.name,
+            resolver_name=resolver.name,
+            texts_in=len(unmatched),
+        )
+        stage = self.next_index
+        representatives = self.representatives(unmatched)
+        # After resuming mid-stage, some free texts have already been dealt with.
+        solved: list[str] = (
+            [free_text for free_text in unmatched if free_text in self.matched]
+            if self._stage_done
+            else []
+        )
+        tried = set(self._stage_done)
+        profiler = None if profile is None else cProfile.Profile()
+
+        classes = sorted(representatives - self._settled)
+        to_send = [free_text for free_text in classes if free_text not in tried]
+        other_members_sent = 0
+        while to_send:
+            self.match_free_texts(
+                to_send,
+                matcher,
+                resolver,
+                executor_type,
+                n_workers,
+                profile,
+                profiler,
+                stage_metrics,
+                solved,
+            )
+            tried.update(to_send)
+            classes, to_send = self.untried_members(classes, tried, set(solved))
+            other_members_sent += len(to_send)
+
+        self.record_saved_matcher_calls(
+            matcher.name, len(unmatched) - len(representatives) - other_members_sent
+        )
+        if profiler is not None:
+            self.write_profile(profiler, matcher, profile)
+        self.update_attributes(solved)
+        if self.results_store is not None:
+            self.store_results(stage, solved)
+        if self.checkpoint_config is not None:
+            self.save_checkpoint()
+
+        stage_metrics.matched = len(solved)
+        stage_metrics.unmatched = len(self.unmatched)
+        stage_metrics.wall_seconds = time.perf_counter() - stage_start
+        self.record_stage_metrics(stage_metrics)
+
+        self.log_match_info(
+            matcher_name=matcher.name, resolver_name=resolver.name, solved=solved
+        )
+
+    def match_free_texts(
+        self,
+        free_texts: list[str],
+        matcher: Matcher,
+        resolver: AmbiguityResolver,
+        executor_type: ExecutorType,
+        n_workers: int,
+        profile: ProfileConfig | None,
+        profiler: cProfile.Profile | None,
+        stage_metrics: StageMetrics,
+        solved: list[str],
+    ) -> None:
+        """
+        Resolves the matches for each free text, from the match cache if it is there,
+        otherwise from the matcher.
+        """
+        uncached = free_texts
+        if self.match_cache is not None:
+            cached_matches = self.match_cache.get_many(matcher, free_texts)
+            cache_hits = [
+                free_text
+                for free_text, matches in zip(free_texts, cached_matches)
+                if matches is not None
+            ]
+            stage_metrics.cache_hits += len(cache_hits)
+            stage_metrics.cache_misses += len(free_texts) - len(cache_hits)
+            for free_text, matches in zip(free_texts, cached_matches):
+                if matches is not None:
+                    self.resolve(free_text, matches, resolver, solved)
+            self.record_progress(cache_hits)
+            uncached = [
+                free_text
+                for free_text, matches in zip(free_texts, cached_matches)
+                if matches is None
+            ]
+
+        stage_metrics.texts_sent += len(uncached)
+        if profiler is None:
+            batch_results = self.match_batches(
+                uncached, matcher, executor_type, n_workers
+            )
+        else:
+            batch_results = self.match_profiled(uncached, matcher, profile, profiler)
 
-    def match(self, unmatched: set[str], matcher: Matcher, resolver: AmbiguityResolver):
-        solved: list[str] = []
+        for batch, batch_matches, batch_seconds in batch_results:
+            stage_metrics.batch_timings.append((len(batch), batch_seconds))
 
-        for free_text in unmatched:
-            matches = matcher.get_matches(free_text)
-            resolution = resolver.resolve(matches)
+            if self.match_cache is not None:
+                self.match_cache.put_many(matcher, batch, batch_matches)
+
+            for free_text, matches in zip(batch, batch_matches):
+                self.resolve(free_text, matches, resolver, solved)
+            self.record_progress(batch)
+
+    def untried_members(
+        self, representatives: list[str], tried: set[str], solved: set[str]
+    ) -> tuple[list[str], list[str]]:
+        """
+        The representatives of the classes that are still unresolved
+        and have members not yet tried, and the first such member of each.
+        """
+        unresolved: list[str] = []
+        untried: list[str] = []
+        for representative in representatives:
+            members = self.equivalence_classes.get(representative, [representative])
+            if members[0] in solved:
+                continue
+            member = next((member for member in members if member not in tried), None)
+            if member is not None:
+                unresolved.append(representative)
+                untried.append(member)
+        return unresolved, untried
+
+    def match_batches(
+        self,
+        free_texts: list[str],
+        matcher: Matcher,
+        executor_type: ExecutorType = "serial",
+        n_workers: int = 1,
+    ) -> Iterator[tuple[list[str], list[list[str]], float]]:
+        """
+        Yields each batch of free texts with the matcher's results for it,
+        and the wall time DeftMatcher waited for them.
+        """
+        batches = self.batches(free_texts, n_workers=n_workers)
 
+        with StageExecutor(matcher, executor_type, n_workers) as executor:
+            batch_start = time.perf_counter()
+            for batch, batch_matches in zip(batches, executor.map_batches(batches)):
+                batch_end = time.perf_counter()
+                yield batch, batch_matches, batch_end - batch_start
+                batch_start = time.perf_counter()
+
+    def match_profiled(
+        self,
+        free_texts: list[str],
+        matcher: Matcher,
+        profile: ProfileConfig,
+        profiler: cProfile.Profile,
+    ) -> Iterator[tuple[list[str], list[list[str]], float]]:
+        """
+        Like match_batches, but serially and one free text at a time, under the profiler.
+        """
+        slowest = self.slowest_texts.setdefault(
+            matcher.name, SlowestTexts(profile.top_n)
+        )
+
+        for free_text in free_texts:
+            profiler.enable()
+            start = time.perf_counter()
+            matches = matcher.get_matches_batch([free_text])
+            seconds = time.perf_counter() - start
+            profiler.disable()
+
+            slowest.add(free_text, seconds)
+            yield [free_text], matches, seconds
+
+    def write_profile(
+        self, profiler: cProfile.Profile, matcher: Matcher, profile: ProfileConfig
+    ) -> None:
+        """
+        Writes the stage's profile, once every free text has been matched,
+        along with the slowest free texts of every matcher so far.
+        """
+        profile_path = profile.profile_path(self.metrics.stage_count, matcher.name)
+        profile_path.parent.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(profile_path)
+        write_slowest_texts(profile.slowest_texts_path, self.slowest_texts)
+
+    def resolve(
+        self,
+        free_text: str,
+        matches: list[str],
+        resolver: AmbiguityResolver,
+        solved: list[str],
+    ):
+        """
+        Records the resolver's choice for free_text, if it makes one,
+        and for every other free text in its equivalence class.
+        """
+        resolution = resolver.resolve(matches)
+
+        if resolution is not None:
+            representative = self._representatives.get(free_text, free_text)
+            for member in self.equivalence_classes.get(representative, [free_text]):
+                self.matched[member] = resolution
+                solved.append(member)
+
+        if self.log_this_text():
             if resolution is not None:
-                self.matched[free_text] = resolution
-                solved.append(free_text)
-                self.logger.info(f"{free_text} was matched to {resolution}!")
+                self.logger.info(
+                    "%s was matched to %s!",
+                    free_text,
+                    resolution,
+                    extra={
+                        "event": "matched",
+                        "free_text": free_text,
+                        "match": resolution,
+                    },
+                )
             else:
-                self.logger.info(f"{free_text} had no resolution.")
+                self.logger.info(
+                    "%s had no resolution.",
+                    free_text,
+                    extra={"event": "unresolved", "free_text": free_text},
+                )
 
-        self.unmatched -= set(solved)
-        self.next_index += 1
+    def log_this_text(self) -> bool:
+        """Whether the per-text logging mode wants a record for the next free text."""
+        per_text = self.log_config.per_text
+        if per_text == "off":
+            return False
+        elif per_text == "sampled":
+            return self._sampler.random() < self.log_config.sample_rate
+        return True
+
+    def batches(
+        self, free_texts: Collection[str], n_workers: int = 1
+    ) -> list[list[str]]:
+        """
+        Splits the sorted free texts into consecutive chunks of at most batch_size.
+
+        With several workers, chunks are shrunk if necessary so every worker gets one.
+        """
+        free_texts_list = sorted(free_texts)
+        size = min(self.batch_size, max(1, -(-len(free_texts_list) // n_workers)))
+        return [
+            free_texts_list[start : start + size]
+            for start in range(0, len(free_texts_list), size)
+        ]
+
+    def group_free_texts(
+        self, free_texts: Collection[str]
+    ) -> tuple[dict[str, list[str]], dict[str, str]]:
+        """
+        Groups the free texts into equivalence classes by their canonical form.
+
+        Returns the members of each class keyed by its representative,
+        and the representative of each free text.
+        Members are ordered as the matchers are to be tried with them: first any member
+        which is its own canonical form, then members without stray whitespace,
+        then the rest, each in sorted order. The representative is the first of them.
+        Without a canonicaliser, there is nothing to group.
+        """
+        if self.canonicaliser is None:
+            return {}, {}
+
+        by_canonical_form: dict[str, list[str]] = {}
+        for free_text in free_texts:
+            # Texts with no canonical form at all are left on their own.
+            canonical_form = self.canonicaliser.canonicalise(free_text) or free_text
+            by_canonical_form.setdefault(canonical_form, []).append(free_text)
+
+        equivalence_classes: dict[str, list[str]] = {}
+        for canonical_form, members in by_canonical_form.items():
+            members.sort(
+                key=lambda member: (
+                    member != canonical_form,
+                    " ".join(member.split()) != member,
+                    member,
+                )
+            )
+            equivalence_classes[members[0]] = members
+        representatives = {
+            member: representative
+            for representative, members in equivalence_classes.items()
+            for member in members
+        }
+        return equivalence_classes, representatives
+
+    def representatives(self, free_texts: Collection[str]) -> set[str]:
+        """The representatives of the equivalence classes the free texts belong to."""
+        if not self._representatives:
+            return set(free_texts)
+        return {
+            self._representatives.get(free_text, free_text) for free_text in free_texts
+        }
+
+    def record_stage_metrics(self, stage_metrics: StageMetrics) -> None:
+        self.metrics.add_stage(stage_metrics)
+        for exporter in self.metrics_exporters:
+            exporter.export(self.metrics)
+
+    def reuse_stored_results(self) -> None:
+        """
+        Takes the stored result of every free text whose deciding stages are unchanged.
+
+        Stored matches go straight into matched. Free texts stored as unmatched
+        by the same pipeline stay in unmatched, but are not sent to any matcher,
+        unless their equivalence class also holds a free text that needs matching.
+        """
+        keys = stage_keys(self.decisive_matchers, self.canonicaliser)
+        current_keys = set(keys)
+        settled_unmatched: set[str] = set()
+
+        for free_text, record in self.results_store.get_many(self.unmatched).items():
+            if record.match is not None and record.provenance_key in current_keys:
+                self.matched[free_text] = record.match
+            elif record.match is None and keys and record.provenance_key == keys[-1]:
+                settled_unmatched.add(free_text)
+
+        self.unmatched -= set(self.matched)
+        self.reused = settled_unmatched | set(self.matched)
+        self._settled = {
+            representative
+            for representative in self.representatives(settled_unmatched)
+            if all(
+                member in settled_unmatched
+                for member in self.equivalence_classes.get(
+                    representative, [representative]
+                )
+            )
+        }
+        self.logger.info(
+            f"Reused stored results for {len(self.reused)} free texts, "
+            f"{len(self.unmatched) - len(settled_unmatched)} left to match."
+        )
+
+    def store_results(self, stage: int, solved: list[str]) -> None:
+        """
+        Writes what the stage decided to the results store,
+        and after the last stage, that the remaining free texts could not be matched.
+        """
+        keys = stage_keys(self.decisive_matchers, self.canonicaliser)
+        decisive_matcher = self.decisive_matchers[stage]
+        recorded_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        records = [
+            MatchRecord(
+                free_text=free_text,
+                match=self.matched[free_text],
+                matcher_name=decisive_matcher.matcher.name,
+                matcher_version=decisive_matcher.matcher.version,
+                resolver_name=decisive_matcher.ambiguity_resolver.name,
+                provenance_key=keys[stage],
+                data_name=self.data_name,
+                recorded_at=recorded_at,
+            )
+            for free_text in solved
+        ]
+        if stage == len(self.decisive_matchers) - 1:
+            records.extend(
+                MatchRecord(
+                    free_text=free_text,
+                    match=None,
+                    matcher_name=None,
+                    matcher_version=None,
+                    resolver_name=None,
+                    provenance_key=keys[-1],
+                    data_name=self.data_name,
+                    recorded_at=recorded_at,
+                )
+                for free_text in sorted(self.unmatched - self.reused)
+            )
+        self.results_store.put_many(records)
+
+    def record_progress(self, free_texts: list[str]) -> None:
+        """
+        Notes that the free texts have been dealt with in the current stage,
+        and checkpoints the run if every_n_texts have been since the last checkpoint.
+        """
+        if self.checkpoint_config is None:
+            return
+
+        self._stage_done.update(free_texts)
+        self._unsaved_progress.extend(free_texts)
+        if len(self._unsaved_progress) >= self.checkpoint_config.every_n_texts:
+            self.save_progress()
+
+    def save_progress(self) -> None:
+        """
+        Journals the free texts dealt with since the last checkpoint,
+        and the matches they resolved for their equivalence classes.
+        Snapshots the whole run instead if there is no snapshot to journal against yet.
+        """
+        path = self.checkpoint_config.path
+        if not os.path.exists(path):
+            self.save_checkpoint()
+            return
+
+        matched = {}
+        for free_text in self._unsaved_progress:
+            representative = self._representatives.get(free_text, free_text)
+            for member in self.equivalence_classes.get(representative, [free_text]):
+                if member in self.matched:
+                    matched[member] = self.matched[member]
+        Checkpoint.append_progress(
+            path, self.next_index, matched, self._unsaved_progress
+        )
+        self._unsaved_progress = []
+
+    def save_checkpoint(self) -> None:
+        Checkpoint(
+            pipeline_key=pipeline_key(self.decisive_matchers, self.canonicaliser),
+            free_texts_key=self._free_texts_key,
+            next_index=self.next_index,
+            matched=self.matched,
+            unmatched=sorted(self.unmatched),
+            stage_done=sorted(self._stage_done),
+        ).save(self.checkpoint_config.path)
+        self._unsaved_progress = []
+
+    def resume_from_checkpoint(self) -> None:
+        """
+        Picks up where the snapshot at checkpoint_config.path, and its journal, left off,
+        and folds the journal into the snapshot.
+
+        Raises a ValueError if it was made by a run with other matchers, resolvers,
+        canonicaliser or free texts, as its progress would not apply to this one.
+        """
+        path = self.checkpoint_config.path
+        checkpoint = Checkpoint.load(path)
+        if checkpoint.pipeline_key != pipeline_key(
+            self.decisive_matchers, self.canonicaliser
+        ):
+            raise ValueError(
+                f"The checkpoint at {path} was made with different matchers, resolvers "
+                "or canonicaliser, so cannot be resumed. Delete it to start afresh."
+            )
+        if checkpoint.free_texts_key != self._free_texts_key:
+            raise ValueError(
+                f"The checkpoint at {path} was made for different free texts, "
+                "so cannot be resumed. Delete it to start afresh."
+            )
+
+        self.next_index = checkpoint.next_index
         self.next_matcher = self.get_next_matcher_from_next_index()
         self.next_resolver = self.get_next_resolver_from_next_index()
+        self.matched = checkpoint.matched
+        self.unmatched = set(checkpoint.unmatched)
+        self._stage_done = set(checkpoint.stage_done)
+        checkpoint.save(path)
+        self.logger.info(
+            f"Resumed from {path} at stage {self.next_index}, "
+            f"with {len(self.matched)} free texts matched and {len(self.unmatched)} to go."
+        )
 
-        self.log_match_info(
-            matcher_name=matcher.name, resolver_name=resolver.name, solved=solved
+    def record_saved_matcher_calls(self, matcher_name: str, saved: int) -> None:
+        self.saved_matcher_calls += saved
+        self.saved_matcher_calls_by_matcher[matcher_name] = (
+            self.saved_matcher_calls_by_matcher.get(matcher_name, 0) + saved
         )
 
     def get_next_matcher_from_next_index(self) -> Matcher | None:
@@ -111,38 +732,47 @@ class DeftMatcher:
 
     def update_attributes(self, solved_free_texts: list[str]):
         self.unmatched -= set(solved_free_texts)
+        self._stage_done = set()
         self.next_index += 1
         self.next_matcher = self.get_next_matcher_from_next_index()
         self.next_resolver = self.get_next_resolver_from_next_index()
 
     # ---------------- LOGGING METHODS ----------------
 
-    @staticmethod
-    def initialise_logger() -> Logger:
-        log_dir = Path("logs")
-        log_dir.mkdir(exist_ok=True)
-
-        timestamp = datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
-        log_file = log_dir / f"{timestamp}.log"
-
-        logging.basicConfig(
-            level=logging.INFO,
-            format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-            handlers=[logging.FileHandler(log_file)],
-            force=True,
-        )
-
-        logger = logging.getLogger()
+    def initialise_logger(self) -> Logger:
+        """
+        The logger for this run, with the handlers from log_config attached.
 
+        It is a child of deft_matcher.<data_name>, of its own, so that two runs with
+        the same data_name never write each other's records.
+        The root logger is left alone, so records also reach any handlers the application set up.
+        """
+        logger = logging.getLogger(f"deft_matcher.{self.data_name}.{next(_run_ids)}")
+        self._log_handlers = RunLogHandlers(logger, self.log_config)
+        # Detach the handlers even if close() is never called.
+        weakref.finalize(self, self._log_handlers.close)
         return logger
 
+    def close(self) -> None:
+        """Detaches this run's log handlers, and closes its matchers."""
+        self._log_handlers.close()
+        for decisive_matcher in self.decisive_matchers:
+            decisive_matcher.matcher.close()
+
     def startup_log_str(self):
         header_str = f"Applying the DEFTMatcher pipeline to {self.data_name} with matchers and resolvers:\n"
         matcher_resolver_str = "\n".join(
             f"  - {dm.matcher.name} and {dm.ambiguity_resolver.name}"
             for dm in self.decisive_matchers
         )
-        return header_str + matcher_resolver_str
+        if self.canonicaliser is None:
+            return header_str + matcher_resolver_str
+
+        canonicaliser_str = (
+            f"\nThe {self.canonicaliser.name} grouped {len(self._representatives)} free texts "
+            f"into {len(self.equivalence_classes)} equivalence classes."
+        )
+        return header_str + matcher_resolver_str + canonicaliser_str
 
     def log_new_matcher_and_resolver(self, matcher_name: str, resolver_name: str):
         self.logger.info(
@@ -154,12 +784,19 @@ class DeftMatcher:
 
         log_parts = [
             self.header_log_str(matcher_name, resolver_name),
-            self.solved_log_str(solved, 3),
-            self.unsolved_log_str(3),
+            self.solved_log_str(solved, self.log_config.n_examples),
+            self.unsolved_log_str(self.log_config.n_examples),
             self.footer_log_str(),
         ]
 
-        self.logger.info("\n".join(log_parts))
+        self.logger.info(
+            "\n".join(log_parts),
+            extra={
+                "event": "stage_complete",
+                "matcher": matcher_name,
+                "resolver": resolver_name,
+            },
+        )
 
     @staticmethod
     def header_log_str(matcher_name: str, resolver_name: str) -> str:
@@ -189,10 +826,10 @@ class DeftMatcher:
                 )
 
     def unsolved_log_str(self, max_examples: int) -> str:
-        unsolved = list(self.unmatched)
-        random.shuffle(unsolved)
+        # Examples are taken in set order, so only max_examples are ever copied.
+        unsolved = list(islice(self.unmatched, max_examples))
 
-        num_unsolved = len(unsolved)
+        num_unsolved = len(self.unmatched)
         num_examples = min(max_examples, num_unsolved)
 
         if num_unsolved == 0:
@@ -0,0 +1,85 @@
+from collections.abc import Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Literal
+
+from deft_matcher.matcher import Matcher
+
+ExecutorType = Literal["serial", "thread", "process"]
+
+# Each process worker holds its own copy of the matcher.
+_worker_matcher: Matcher | None = None
+
+
+def _initialise_worker(matcher: Matcher) -> None:
+    """Runs once per process worker, so the matcher is only shipped and loaded once."""
+    global _worker_matcher
+    matcher.warmup()
+    _worker_matcher = matcher
+
+
+def _worker_get_matches_batch(free_texts: list[str]) -> list[list[str]]:
+    return _worker_matcher.get_matches_batch(free_texts)
+
+
+class StageExecutor:
+    """
+    Applies a Matcher to batches of free texts, either serially,
+    or across a pool of thread or process workers.
+
+    Batches are returned in the order they were submitted,
+    so results do not depend on which worker finished first.
+
+    Process workers receive the matcher once, when the worker starts,
+    so the matcher must be picklable.
+    The matcher is warmed up here first, so that any index it builds on disk
+    is built once, rather than by every worker at the same time.
+
+    Use as a context manager, so that the pool is shut down afterwards.
+    """
+
+    matcher: Matcher
+    executor_type: ExecutorType
+    n_workers: int
+    _pool: Executor | None
+
+    def __init__(
+        self,
+        matcher: Matcher,
+        executor_type: ExecutorType = "serial",
+        n_workers: int = 1,
+    ) -> None:
+        if executor_type not in ("serial", "thread", "process"):
+            raise ValueError(f"Unknown executor type {executor_type}.")
+        if n_workers < 1:
+            raise ValueError(f"n_workers must be at least 1, but was {n_workers}.")
+
+        self.matcher = matcher
+        self.executor_type = executor_type
+        self.n_workers = n_workers
+        self._pool = None
+
+    def __enter__(self) -> "StageExecutor":
+        if self.executor_type == "thread":
+            self._pool = ThreadPoolExecutor(max_workers=self.n_workers)
+        elif self.executor_type == "process":
+            self.matcher.warmup()
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.n_workers,
+                initializer=_initialise_worker,
+                initargs=(self.matcher,),
+            )
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=exc_type is not None)
+            self._pool = None
+
+    def map_batches(self, batches: list[list[str]]) -> Iterator[list[list[str]]]:
+        """Yields the result of get_matches_batch for each batch, in order."""
+        if self._pool is None:
+            return (self.matcher.get_matches_batch(batch) for batch in batches)
+        elif self.executor_type == "thread":
+            return self._pool.map(self.matcher.get_matches_batch, batches)
+        else:
+            return self._pool.map(_worker_get_matches_batch, batches)
@@ -0,0 +1,264 @@
+import json
+import os
+import shutil
+from pathlib import Path
+
+import hpotk
+import numpy as np
+from hpotk import Ontology, SynonymCategory, SynonymType
+from numpy import ndarray
+
+from deft_matcher.utils import file_digest, get_ontology_prefix
+
+# Bump whenever the saved layout changes, so old artifacts are rebuilt.
+LEXICON_FORMAT = "1"
+
+LABEL = 0
+SYNONYM = 1
+# Synonym categories and types are stored as their enum value, or this if there is none.
+NO_FLAG = 0
+
+_ARRAY_NAMES = ("key_starts", "term_codes", "kinds", "categories", "types")
+_SEPARATOR = "\0"
+
+
+def _flag_codes(flags: list[SynonymCategory | SynonymType | None]) -> list[int]:
+    return [NO_FLAG if flag is None else flag.value for flag in flags]
+
+
+def _join_strings(strings: list[str]) -> bytes:
+    return _SEPARATOR.join(strings).encode("utf-8")
+
+
+def _split_strings(blob: bytes, count: int) -> list[str]:
+    return blob.decode("utf-8").split(_SEPARATOR) if count else []
+
+
+class Lexicon:
+    """
+    Every lower-cased label and synonym of an ontology, and the terms they belong to.
+
+    Entries are held in flat arrays, grouped by key, in the order the ontology lists them.
+    Each entry records its term, whether it is a label or a synonym,
+    and the synonym's category and type,
+    so matchers with different synonym filters can share one Lexicon,
+    select entries with a boolean mask, and read out only the keys they need.
+
+    A Lexicon is built once from an Ontology, saved to a directory,
+    and loaded from there with its arrays memory-mapped,
+    which is much quicker than loading the ontology itself.
+
+    >>> lexicon = Lexicon.from_ontology(hpotk.load_ontology("tests/data/mini_hp.json"))
+    >>> lexicon.lookup("asthma", lexicon.label_mask())
+    ['HP:0002099']
+    """
+
+    prefix: str
+    version: str | None
+    _keys: list[str]
+    _key_to_code: dict[str, int]
+    _term_ids: list[str]
+    _key_starts: ndarray
+    _term_codes: ndarray
+    _kinds: ndarray
+    _categories: ndarray
+    _types: ndarray
+
+    def __init__(
+        self,
+        prefix: str,
+        version: str | None,
+        keys: list[str],
+        term_ids: list[str],
+        key_starts: ndarray,
+        term_codes: ndarray,
+        kinds: ndarray,
+        categories: ndarray,
+        types: ndarray,
+    ) -> None:
+        self.prefix = prefix
+        self.version = version
+        self._keys = keys
+        self._key_to_code = {key: code for code, key in enumerate(keys)}
+        self._term_ids = term_ids
+        self._key_starts = key_starts
+        self._term_codes = term_codes
+        self._kinds = kinds
+        self._categories = categories
+        self._types = types
+
+    @classmethod
+    def from_ontology(cls, ontology: Ontology) -> "Lexicon":
+        key_to_code: dict[str, int] = {}
+        term_ids: list[str] = []
+        # (key code, term code, kind, category, type) for each label and synonym.
+        entries: list[tuple[int, int, int, int, int]] = []
+
+        for term in ontology.terms:
+            term_code = len(term_ids)
+            term_ids.append(term.identifier.value)
+            key_code = key_to_code.setdefault(term.name.lower(), len(key_to_code))
+            entries.append((key_code, term_code, LABEL, NO_FLAG, NO_FLAG))
+
+            for syn in term.synonyms or []:
+                key_code = key_to_code.setdefault(syn.name.lower(), len(key_to_code))
+                category, synonym_type = _flag_codes([syn.category, syn.synonym_type])
+                entries.append((key_code, term_code, SYNONYM, category, synonym_type))
+
+        columns = np.array(entries, dtype=np.int64).reshape(-1, 5)
+        # A stable sort keeps each key's entries in ontology order.
+        columns = columns[np.argsort(columns[:, 0], kind="stable")]
+        key_starts = np.searchsorted(
+            columns[:, 0], np.arange(len(key_to_code) + 1)
+        ).astype(np.int64)
+
+        return cls(
+            prefix=get_ontology_prefix(ontology),
+            version=ontology.version,
+            keys=list(key_to_code),
+            term_ids=term_ids,
+            key_starts=key_starts,
+            term_codes=columns[:, 1].astype(np.int32),
+            kinds=columns[:, 2].astype(np.uint8),
+            categories=columns[:, 3].astype(np.uint8),
+            types=columns[:, 4].astype(np.uint8),
+        )
+
+    @classmethod
+    def load(cls, directory: str | Path) -> "Lexicon":
+        directory = Path(directory)
+        with open(directory / "lexicon.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["format"] != LEXICON_FORMAT:
+            raise ValueError(
+                f"Lexicon at {directory} has format {meta['format']}, expected {LEXICON_FORMAT}."
+            )
+
+        arrays = {
+            name: np.load(directory / f"{name}.npy", mmap_mode="r")
+            for name in _ARRAY_NAMES
+        }
+        return cls(
+            prefix=meta["prefix"],
+            version=meta["version"],
+            keys=_split_strings(
+                (directory / "keys.bin").read_bytes(), meta["key_count"]
+            ),
+            term_ids=_split_strings(
+                (directory / "term_ids.bin").read_bytes(), meta["term_count"]
+            ),
+            **arrays,
+        )
+
+    def save(self, directory: str | Path) -> None:
+        """Writes via a temporary directory, so a half-written copy is never loaded."""
+        directory = Path(directory)
+        tmp_directory = directory.with_name(f"{directory.name}.{os.getpid()}.tmp")
+        tmp_directory.mkdir(parents=True, exist_ok=True)
+
+        with open(tmp_directory / "lexicon.json", "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "format": LEXICON_FORMAT,
+                    "prefix": self.prefix,
+                    "version": self.version,
+                    "key_count": len(self._keys),
+                    "term_count": len(self._term_ids),
+                },
+                f,
+            )
+        (tmp_directory / "keys.bin").write_bytes(_join_strings(self._keys))
+        (tmp_directory / "term_ids.bin").write_bytes(_join_strings(self._term_ids))
+        for name in _ARRAY_NAMES:
+            np.save(
+                tmp_directory / f"{name}.npy", np.asarray(getattr(self, f"_{name}"))
+            )
+
+        try:
+            os.replace(tmp_directory, directory)
+        except OSError:
+            # Another process saved the same lexicon first.
+            shutil.rmtree(tmp_directory)
+
+    def __len__(self) -> int:
+        """The number of entries, i.e. labels plus synonyms."""
+        return len(self._term_codes)
+
+    def label_mask(self) -> ndarray:
+        """Selects the entries which are primary labels."""
+        return self._kinds == LABEL
+
+    def synonym_mask(
+        self,
+        synonym_categories: list[SynonymCategory | None],
+        synonym_types: list[SynonymType | None],
+    ) -> ndarray:
+        """Selects the synonyms with one of the given categories and one of the given types."""
+        return (
+            (self._kinds == SYNONYM)
+            & np.isin(self._categories, _flag_codes(synonym_categories))
+            & np.isin(self._types, _flag_codes(synonym_types))
+        )
+
+    def lookup(self, key: str, entry_mask: ndarray) -> list[str]:
+        """
+        The term IDs of the entries selected by entry_mask whose key is exactly key.
+        To look up many keys, selected_keys builds a dict once instead.
+        """
+        key_code = self._key_to_code.get(key)
+        if key_code is None:
+            return []
+
+        start, end = self._key_starts[key_code], self._key_starts[key_code + 1]
+        term_ids = self._term_ids
+        return [
+            term_ids[term_code]
+            for term_code, selected in zip(
+                self._term_codes[start:end].tolist(), entry_mask[start:end].tolist()
+            )
+            if selected
+        ]
+
+    def selected_keys(self, entry_mask: ndarray) -> dict[str, list[str]]:
+        """
+        Each key with an entry selected by entry_mask, and the term IDs of those entries,
+        in the order lookup gives them.
+        """
+        selected = np.flatnonzero(entry_mask)
+        key_codes = np.searchsorted(self._key_starts, selected, side="right") - 1
+        keys, term_ids = self._keys, self._term_ids
+        selected_keys: dict[str, list[str]] = {}
+        for key_code, term_code in zip(
+            key_codes.tolist(), self._term_codes[selected].tolist()
+        ):
+            selected_keys.setdefault(keys[key_code], []).append(term_ids[term_code])
+        return selected_keys
+
+
+def load_or_build_lexicon(
+    ontology_path: str,
+    cache_dir: str | Path,
+    prefixes_of_interest: set[str] | None = None,
+) -> Lexicon:
+    """
+    Loads the Lexicon for the ontology at ontology_path (an obographs JSON file)
+    from cache_dir, only loading the ontology and building the Lexicon the first time.
+    Lexicons are keyed on the ontology file's size and modification time.
+    """
+    if prefixes_of_interest is None:
+        prefixes_of_interest = {"HP"}
+
+    digest = file_digest(
+        ontology_path,
+        {
+            "format": LEXICON_FORMAT,
+            "prefixes_of_interest": ",".join(sorted(prefixes_of_interest)),
+        },
+    )
+    directory = Path(cache_dir) / f"lexicon_{digest}"
+    if not directory.exists():
+        ontology = hpotk.load_ontology(
+            ontology_path, prefixes_of_interest=prefixes_of_interest
+        )
+        Lexicon.from_ontology(ontology).save(directory)
+    return Lexicon.load(directory)
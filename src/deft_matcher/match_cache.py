@@ -0,0 +1,221 @@
+import hashlib
+import json
+import sqlite3
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+from deft_matcher.matcher import Matcher
+
+
+def matcher_key(matcher: Matcher) -> str:
+    """Identifies a matcher by its name, configuration and ontology/model version."""
+    identity = json.dumps(
+        [matcher.name, matcher.config, matcher.version], sort_keys=True
+    ).encode("utf-8")
+    return hashlib.sha256(identity).hexdigest()
+
+
+class MatchCache(ABC):
+    """
+    Remembers what a matcher returned for a free text, across DeftMatcher runs.
+
+    Entries are keyed on the matcher's name, config and version, and the exact free text,
+    so changing any of these simply misses the cache.
+    Texts are not normalised, as matchers need not treat, e.g., extra whitespace alike.
+    Hits and misses are counted overall and per matcher name.
+    """
+
+    hits: int
+    misses: int
+    stats_by_matcher: dict[str, dict[str, int]]
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.stats_by_matcher = {}
+
+    def get_many(
+        self, matcher: Matcher, free_texts: list[str]
+    ) -> list[list[str] | None]:
+        """The cached matches for each free text, or None where there are none."""
+        found = self._get_many(matcher, free_texts)
+
+        hits = sum(matches is not None for matches in found)
+        misses = len(found) - hits
+        self.hits += hits
+        self.misses += misses
+        matcher_stats = self.stats_by_matcher.setdefault(
+            matcher.name, {"hits": 0, "misses": 0}
+        )
+        matcher_stats["hits"] += hits
+        matcher_stats["misses"] += misses
+
+        return found
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @abstractmethod
+    def _get_many(
+        self, matcher: Matcher, free_texts: list[str]
+    ) -> list[list[str] | None]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def put_many(
+        self, matcher: Matcher, free_texts: list[str], batch_matches: list[list[str]]
+    ) -> None:
+        """Stores what the matcher returned for each of the free texts."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def invalidate(self, matcher_name: str | None = None) -> None:
+        """Forgets every entry for the named matcher, whatever its config or version, or everything."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def prune_stale(self, matcher: Matcher) -> None:
+        """Forgets entries for this matcher's name which were made with a different config or version."""
+        raise NotImplementedError
+
+
+class SQLiteMatchCache(MatchCache):
+    """
+    A MatchCache kept in a single SQLite file.
+
+    If max_entries is set, the least recently used entries are evicted
+    whenever the cache grows beyond it, down to 90% of max_entries
+    so that eviction does not run on every write.
+    """
+
+    path: Path
+    max_entries: int | None
+    _connection: sqlite3.Connection
+    _clock: int
+    # Never less than the number of entries, so counting only happens near the limit.
+    _size_upper_bound: int
+
+    # Stay well below SQLite's limit on the number of query parameters.
+    _LOOKUP_CHUNK_SIZE = 500
+    # Bump whenever what an entry is keyed on changes, so older entries are dropped.
+    _FORMAT = 2
+
+    def __init__(self, path: str | Path, max_entries: int | None = None) -> None:
+        super().__init__()
+        if max_entries is not None and max_entries < 1:
+            raise ValueError(f"max_entries must be at least 1, but was {max_entries}.")
+
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self._connection = sqlite3.connect(self.path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS matches (
+                matcher_key TEXT NOT NULL,
+                matcher_name TEXT NOT NULL,
+                text TEXT NOT NULL,
+                matches TEXT NOT NULL,
+                last_used INTEGER NOT NULL,
+                PRIMARY KEY (matcher_key, text)
+            )
+            """
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS matches_last_used ON matches (last_used)"
+        )
+        (cache_format,) = self._connection.execute("PRAGMA user_version").fetchone()
+        if cache_format != self._FORMAT:
+            self._connection.execute("DELETE FROM matches")
+            self._connection.execute(f"PRAGMA user_version = {self._FORMAT}")
+        self._connection.commit()
+        (latest,) = self._connection.execute(
+            "SELECT COALESCE(MAX(last_used), 0) FROM matches"
+        ).fetchone()
+        self._clock = latest
+        self._size_upper_bound = len(self)
+
+    def __len__(self) -> int:
+        (count,) = self._connection.execute("SELECT COUNT(*) FROM matches").fetchone()
+        return count
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def _get_many(
+        self, matcher: Matcher, free_texts: list[str]
+    ) -> list[list[str] | None]:
+        key = matcher_key(matcher)
+        found: dict[str, list[str]] = {}
+
+        for start in range(0, len(free_texts), self._LOOKUP_CHUNK_SIZE):
+            chunk = list(set(free_texts[start : start + self._LOOKUP_CHUNK_SIZE]))
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._connection.execute(
+                f"SELECT text, matches FROM matches WHERE matcher_key = ? AND text IN ({placeholders})",
+                [key, *chunk],
+            )
+            found.update((text, json.loads(matches)) for text, matches in rows)
+
+        if found:
+            now = self._tick()
+            self._connection.executemany(
+                "UPDATE matches SET last_used = ? WHERE matcher_key = ? AND text = ?",
+                [(now, key, text) for text in found],
+            )
+            self._connection.commit()
+
+        return [found.get(free_text) for free_text in free_texts]
+
+    def put_many(
+        self, matcher: Matcher, free_texts: list[str], batch_matches: list[list[str]]
+    ) -> None:
+        key = matcher_key(matcher)
+        now = self._tick()
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO matches VALUES (?, ?, ?, ?, ?)",
+            [
+                (key, matcher.name, free_text, json.dumps(matches), now)
+                for free_text, matches in zip(free_texts, batch_matches)
+            ],
+        )
+        self._size_upper_bound += len(free_texts)
+        self._evict()
+        self._connection.commit()
+
+    def _evict(self) -> None:
+        if self.max_entries is None or self._size_upper_bound <= self.max_entries:
+            return
+
+        size = len(self)
+        if size > self.max_entries:
+            self._connection.execute(
+                "DELETE FROM matches WHERE rowid IN "
+                "(SELECT rowid FROM matches ORDER BY last_used LIMIT ?)",
+                (size - max(1, int(self.max_entries * 0.9)),),
+            )
+            size = len(self)
+        self._size_upper_bound = size
+
+    def invalidate(self, matcher_name: str | None = None) -> None:
+        if matcher_name is None:
+            self._connection.execute("DELETE FROM matches")
+            self._size_upper_bound = 0
+        else:
+            self._connection.execute(
+                "DELETE FROM matches WHERE matcher_name = ?", (matcher_name,)
+            )
+        self._connection.commit()
+
+    def prune_stale(self, matcher: Matcher) -> None:
+        self._connection.execute(
+            "DELETE FROM matches WHERE matcher_name = ? AND matcher_key != ?",
+            (matcher.name, matcher_key(matcher)),
+        )
+        self._connection.commit()
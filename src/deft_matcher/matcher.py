@@ -8,7 +8,47 @@ class Matcher(ABC):
         """Each matcher must have a 'name' attribute."""
         pass
 
+    @property
+    def config(self) -> dict[str, str]:
+        """
+        Any settings, beyond the name, which change what this matcher returns.
+        Used to tell cached results apart, so matchers with options should override it.
+        """
+        return {}
+
+    @property
+    def version(self) -> str | None:
+        """The version of the ontology or model behind this matcher, if known."""
+        return None
+
+    def warmup(self) -> None:
+        """
+        Loads whatever this matcher needs to match, if it has not already.
+
+        Matchers with expensive state, like models or indexes, load it lazily on first use.
+        Calling warmup moves that cost up front. By default there is nothing to load.
+        """
+        pass
+
+    def close(self) -> None:
+        """
+        Releases whatever this matcher holds open, like connections or event loops.
+
+        A closed matcher can still be used, and opens them again when it is.
+        By default there is nothing to release.
+        """
+        pass
+
     @abstractmethod
     def get_matches(self, free_text: str) -> list[str]:
         """Return matching ontology IDs for the given free text."""
         raise NotImplementedError
+
+    def get_matches_batch(self, free_texts: list[str]) -> list[list[str]]:
+        """
+        Return matching ontology IDs for each of the given free texts, in the same order.
+
+        By default this just calls get_matches on each free text.
+        Matchers that can amortise their cost across many texts should override it.
+        """
+        return [self.get_matches(free_text) for free_text in free_texts]
@@ -1,31 +1,73 @@
+import threading
+
 from hpotk import Ontology
+from numpy import ndarray
 
+from deft_matcher.lexicon import Lexicon
 from deft_matcher.matcher import Matcher
-from deft_matcher.utils import get_ontology_prefix
 
 
 class ExactMatcher(Matcher):
     """
     If the free text matches the primary label of an ontology term,
     the ontology ID is returned.
+
+    Either an Ontology or a Lexicon built from one may be given.
+    A loaded Lexicon saves walking every term of the ontology,
+    and can be shared with other matchers.
+    The labels are read out of the Lexicon into a dict on first use, or by warmup.
     """
 
-    _ontology: Ontology
-    _label_to_id: dict[str, str]
+    _lexicon: Lexicon
+    _label_mask: ndarray
+    _label_to_id: dict[str, str] | None
+    _warmup_lock: threading.Lock
 
-    def __init__(self, ontology: Ontology) -> None:
-        self._ontology = ontology
-        self._label_to_id = self._initialise_label_to_id()
+    def __init__(self, ontology: Ontology | Lexicon) -> None:
+        self._lexicon = (
+            ontology
+            if isinstance(ontology, Lexicon)
+            else Lexicon.from_ontology(ontology)
+        )
+        self._label_mask = self._lexicon.label_mask()
+        self._label_to_id = None
+        self._warmup_lock = threading.Lock()
 
-    def _initialise_label_to_id(self) -> dict[str, str]:
-        return {
-            term.name.lower(): term.identifier.value for term in self._ontology.terms
-        }
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["_label_to_id"] = None
+        del state["_warmup_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._warmup_lock = threading.Lock()
 
     @property
     def name(self) -> str:
-        return f"ExactMatcher({get_ontology_prefix(self._ontology)})"
+        return f"ExactMatcher({self._lexicon.prefix})"
+
+    @property
+    def version(self) -> str | None:
+        return self._lexicon.version
+
+    def warmup(self) -> None:
+        with self._warmup_lock:
+            if self._label_to_id is None:
+                # If several terms share a label, the last one listed is kept.
+                self._label_to_id = {
+                    label: term_ids[-1]
+                    for label, term_ids in self._lexicon.selected_keys(
+                        self._label_mask
+                    ).items()
+                }
 
     def get_matches(self, free_text: str) -> list[str]:
-        possible_match = self._label_to_id.get(free_text.lower())
-        return [] if possible_match is None else [possible_match]
+        return self.get_matches_batch([free_text])[0]
+
+    def get_matches_batch(self, free_texts: list[str]) -> list[list[str]]:
+        if self._label_to_id is None:
+            self.warmup()
+        label_to_id = self._label_to_id
+        possible_matches = [label_to_id.get(text.lower()) for text in free_texts]
+        return [[] if match is None else [match] for match in possible_matches]
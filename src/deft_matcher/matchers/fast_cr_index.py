@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from importlib.metadata import version
+from pathlib import Path
+from typing import Literal
+
+from FastHPOCR.cr.CRIndexKB import CRIndexKB
+from FastHPOCR.util import ConfigConstants
+
+from deft_matcher.utils import exclusive_lock
+
+IndexedOntology = Literal["hpo", "mondo"]
+
+# Change this if DEFTMatcher changes how it builds indexes, so old ones are not reused.
+_BUILD_VERSION = "1"
+
+
+class _GroupedCRIndexKB(CRIndexKB):
+    """
+    A CRIndexKB which groups the base clusters by cluster ID once when serialising.
+
+    CRIndexKB scans every base cluster for each cluster in the index,
+    which is quadratic and takes most of a MONDO build.
+    The index written is identical, token for token.
+    """
+
+    def prepareClustersToSerialise(self, baseClusters):
+        for token, cluster_id in self.invertedClusters.items():
+            self.clusters[cluster_id] = [token]
+
+        tokens_by_cluster: dict[str, list[str]] = {}
+        for token, cluster_id in baseClusters.items():
+            tokens_by_cluster.setdefault(cluster_id, []).append(token)
+
+        for cluster_id, tokens in self.clusters.items():
+            cluster_tokens = list(tokens_by_cluster.get(cluster_id, []))
+            cluster_tokens.extend(
+                token for token in tokens if token not in cluster_tokens
+            )
+            self.clusters[cluster_id] = cluster_tokens
+
+
+def _hash_file(digest: "hashlib._Hash", path: str) -> None:
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+
+
+def index_digest(obo_path: str, ontology: IndexedOntology, index_config: dict) -> str:
+    """
+    A hash of everything an index is built from: the content of the OBO file,
+    and of any external synonyms file, the index config, and the FastHPOCR version.
+    """
+    digest = hashlib.sha256()
+    digest.update(
+        json.dumps(
+            [_BUILD_VERSION, version("FastHPOCR"), ontology, index_config],
+            sort_keys=True,
+        ).encode("utf-8")
+    )
+    _hash_file(digest, obo_path)
+    external_synonyms = index_config.get(ConfigConstants.VAR_EXTENAL_SYNS)
+    if external_synonyms is not None and os.path.isfile(external_synonyms):
+        _hash_file(digest, external_synonyms)
+    return digest.hexdigest()
+
+
+def index_file_path(
+    obo_path: str, ontology: IndexedOntology, index_config: dict, cache_dir: str
+) -> Path:
+    digest = index_digest(obo_path, ontology, index_config)
+    return Path(cache_dir) / f"{ontology}_{digest[:16]}.index"
+
+
+def build_fast_cr_index(
+    obo_path: str, ontology: IndexedOntology, index_config: dict, path: Path
+) -> None:
+    """
+    Builds a FastHPOCR index of the OBO file at path.
+
+    The index is built in a temporary directory beside path and then moved into place,
+    so a half-built index is never picked up.
+    """
+    if ontology == "hpo":
+        from FastHPOCR.IndexHPO import IndexHPO as Indexer
+        from FastHPOCR.util.CRConstants import HP_INDEX_FILE as index_file_name
+    elif ontology == "mondo":
+        from FastHPOCR.IndexMONDO import IndexMONDO as Indexer
+        from FastHPOCR.util.CRConstants import MONDO_INDEX_FILE as index_file_name
+    else:
+        raise ValueError(f"Unknown ontology {ontology}.")
+
+    build_dir = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    build_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        indexer = Indexer(obo_path, str(build_dir), indexConfig=index_config)
+        indexer.crIndexKB = _GroupedCRIndexKB()
+        indexer.index()
+        built_path = build_dir / index_file_name
+        if not built_path.exists():
+            raise ValueError(f"FastHPOCR could not index {obo_path}.")
+        os.replace(built_path, path)
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+
+def load_or_build_fast_cr_index(
+    obo_path: str, ontology: IndexedOntology, index_config: dict, cache_dir: str
+) -> Path:
+    """
+    The path of the index for this OBO file and index config in cache_dir,
+    building it first if it is not there yet.
+
+    Indexes are named by index_digest, so a changed OBO file or index config
+    gets a new index rather than a stale one, and any number of matchers,
+    processes or machines can share one cache_dir.
+    While an index is being built, others wanting it wait for it rather than building it too.
+    Without file locks they build it too, which is wasteful but safe,
+    as each index is moved into place whole.
+    """
+    path = index_file_path(obo_path, ontology, index_config, cache_dir)
+    if path.exists():
+        return path
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with exclusive_lock(path.with_name(f"{path.name}.lock")):
+        if not path.exists():
+            build_fast_cr_index(obo_path, ontology, index_config, path)
+    return path
+
+
+def build_fast_cr_indexes(
+    indexes: list[tuple[str, IndexedOntology, dict]], cache_dir: str, n_workers: int
+) -> list[Path]:
+    """
+    Builds several indexes, given as (OBO path, ontology, index config), side by side
+    in a pool of n_workers processes, and returns their paths in the same order.
+
+    A single index is built by one process, as FastHPOCR's build is not divisible,
+    but e.g. the HPO and MONDO indexes need not wait for each other.
+    """
+    if n_workers < 1:
+        raise ValueError(f"n_workers must be at least 1, but was {n_workers}.")
+
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        futures = [
+            pool.submit(
+                load_or_build_fast_cr_index, obo_path, ontology, index_config, cache_dir
+            )
+            for obo_path, ontology, index_config in indexes
+        ]
+        return [future.result() for future in futures]
@@ -0,0 +1,171 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
+
+from deft_matcher.matcher import Matcher
+
+if TYPE_CHECKING:
+    from FastHPOCR.HPOAnnotator import HPOAnnotator
+    from FastHPOCR.util.AnnotationToken import AnnotationToken
+
+# Joins packed texts. FastHPOCR makes it a token of its own, which ends each text.
+_BULK_SEPARATOR = "\n\0\n"
+_SEPARATOR_TOKEN = "\0"
+# FastHPOCR loses track of offsets beyond word 10000 of a document,
+# and a document can never have more words than characters.
+_MAX_BULK_DOCUMENT_CHARS = 10000
+
+
+class FastCRMatcher(Matcher, ABC):
+    """
+    Shared machinery for matchers built on a FastHPOCR HPOAnnotator.
+
+    Ontology IDs are read straight from the annotation objects,
+    so nothing is written to disk while matching
+    and several instances can safely run side by side.
+
+    The number of texts and annotations, and the time spent annotating,
+    are accumulated so that throughput can be read off annotations_per_second.
+    When the matcher runs in a process pool, each worker keeps its own counts.
+
+    If bulk_annotation = True, get_matches_batch packs many free texts into
+    one document, which is tokenised once, and then generates and matches
+    candidates text by text, annotating each distinct text only once.
+    Each text gets the same IDs, in the same order, as when annotated on its own.
+    FastHPOCR's cost per call is small next to its cost per token, so this only
+    pays off for batches which repeat texts, and is otherwise a little slower.
+
+    The annotator, and its index if that has to be built, is loaded
+    when the first batch is matched, or when warmup() is called.
+    A pickled matcher leaves its annotator behind, and loads its own when first used.
+    """
+
+    _annotator: "HPOAnnotator | None"
+    bulk_annotation: bool
+    annotated_texts: int
+    annotation_count: int
+    annotation_seconds: float
+
+    def __init__(self, bulk_annotation: bool = False) -> None:
+        self.bulk_annotation = bulk_annotation
+        self.annotated_texts = 0
+        self.annotation_count = 0
+        self.annotation_seconds = 0.0
+        self._annotator = None
+        self._warmup_lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["_annotator"] = None
+        del state["_warmup_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._warmup_lock = threading.Lock()
+
+    @abstractmethod
+    def _initialise_annotator(self) -> "HPOAnnotator":
+        """Builds the index if it does not exist yet, and loads an annotator over it."""
+        raise NotImplementedError
+
+    def warmup(self) -> None:
+        with self._warmup_lock:
+            if self._annotator is None:
+                self._annotator = self._initialise_annotator()
+
+    @property
+    def annotations_per_second(self) -> float:
+        if self.annotation_seconds == 0:
+            return 0.0
+        return self.annotation_count / self.annotation_seconds
+
+    def get_matches(self, free_text: str) -> list[str]:
+        return self.get_matches_batch([free_text])[0]
+
+    def get_matches_batch(self, free_texts: list[str]) -> list[list[str]]:
+        if self._annotator is None:
+            self.warmup()
+        start = time.perf_counter()
+
+        if self.bulk_annotation:
+            batch_matches = self._annotate_bulk(free_texts)
+        else:
+            batch_matches = [self._annotate(free_text) for free_text in free_texts]
+
+        self._record_throughput(
+            texts=len(free_texts),
+            annotations=sum(len(matches) for matches in batch_matches),
+            seconds=time.perf_counter() - start,
+        )
+        return batch_matches
+
+    def _record_throughput(self, texts: int, annotations: int, seconds: float):
+        self.annotated_texts += texts
+        self.annotation_count += annotations
+        self.annotation_seconds += seconds
+
+    def _annotate(self, free_text: str) -> list[str]:
+        return [
+            annotation.getHPOUri() for annotation in self._annotator.annotate(free_text)
+        ]
+
+    def _annotate_bulk(self, free_texts: list[str]) -> list[list[str]]:
+        matches: dict[str, list[str]] = {}
+        document_texts: list[str] = []
+        document_length = 0
+
+        for free_text in dict.fromkeys(free_texts):
+            packed_length = len(free_text) + len(_BULK_SEPARATOR)
+            if (
+                _SEPARATOR_TOKEN in free_text
+                or packed_length > _MAX_BULK_DOCUMENT_CHARS
+            ):
+                matches[free_text] = self._annotate(free_text)
+                continue
+
+            if document_length + packed_length > _MAX_BULK_DOCUMENT_CHARS:
+                matches.update(self._annotate_document(document_texts))
+                document_texts, document_length = [], 0
+            document_texts.append(free_text)
+            document_length += packed_length
+
+        if document_texts:
+            matches.update(self._annotate_document(document_texts))
+
+        return [list(matches[free_text]) for free_text in free_texts]
+
+    def _annotate_document(self, free_texts: list[str]) -> dict[str, list[str]]:
+        """
+        Annotates the free texts as one document, tokenised once,
+        then for each text does what HPOAnnotator.annotate would with it alone.
+        """
+        from FastHPOCR.cr.CandidateMatcher import CandidateMatcher
+        from FastHPOCR.cr.FormatResults import FormatResults
+        from FastHPOCR.cr.TextProcessor import TextProcessor
+        from FastHPOCR.cr.TextSplitter import TextSplitter
+
+        document = _BULK_SEPARATOR.join(free_texts)
+        crIndexKB = self._annotator.crIndexKB
+
+        text_tokens: list[list["AnnotationToken"]] = [[]]
+        for token in TextSplitter(document).getTokens():
+            if token.getToken() == _SEPARATOR_TOKEN:
+                text_tokens.append([])
+            else:
+                token.setClusterId(crIndexKB.getClusterId(token.getToken()))
+                text_tokens[-1].append(token)
+
+        matches: dict[str, list[str]] = {}
+        for free_text, tokens in zip(free_texts, text_tokens):
+            text_processor = TextProcessor(crIndexKB)
+            text_processor.tokens = tokens
+            text_processor.generateCandidates()
+            candidate_matcher = CandidateMatcher(crIndexKB)
+            candidate_matcher.matchCandidates(text_processor.getCandidates())
+            annotations = FormatResults(
+                document, crIndexKB, candidate_matcher.getMatches(), False
+            ).getResult()
+            matches[free_text] = [annotation.getHPOUri() for annotation in annotations]
+        return matches
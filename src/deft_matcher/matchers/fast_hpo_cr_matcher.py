@@ -1,59 +1,65 @@
-import os
-
-from FastHPOCR.HPOAnnotator import HPOAnnotator
-from FastHPOCR.IndexHPO import IndexHPO
-import pandas as pd
-
-from deft_matcher.matcher import Matcher
+import json
 from pathlib import Path
 
+from deft_matcher.matchers.fast_cr_matcher import FastCRMatcher
+from deft_matcher.utils import get_obo_data_version
 
-class FastHPOCRMatcher(Matcher):
+
+class FastHPOCRMatcher(FastCRMatcher):
     """
     Uses the FastHPOCR algorithm and library to match text to HPO terms.
     See:
     - https://academic.oup.com/bioinformatics/article/40/7/btae406/7698025
     - https://github.com/tudorgroza/fast_hpo_cr
 
-    NOTE: if you want to change the indexConfig in some way,
-    then you must delete the existing hp.index file in the data_output_dir.
+    The index is kept in data_output_dir, named by a hash of the OBO file's content
+    and index_config, so it is rebuilt whenever either changes,
+    and several matchers, or processes, can share the directory.
+    index_config is passed to FastHPOCR as its indexConfig,
+    and defaults to {"rootConcepts": ["HP:0000118"]}.
     """
 
     hpo_obo_path: str
     data_output_dir: str
-    _hpo_index_path: Path
-    _annotations_out_path: Path
-    _annotator: HPOAnnotator
+    index_config: dict
+    index_path: Path | None
 
-    def __init__(self, hpo_obo_path: str, data_output_dir: str) -> None:
+    def __init__(
+        self,
+        hpo_obo_path: str,
+        data_output_dir: str,
+        bulk_annotation: bool = False,
+        index_config: dict | None = None,
+    ) -> None:
+        super().__init__(bulk_annotation=bulk_annotation)
         self.hpo_obo_path = hpo_obo_path
         self.data_output_dir = data_output_dir
-        self._hpo_index_path = Path(self.data_output_dir + "/hp.index")
-        self._annotations_out_path = Path(self.data_output_dir + "/hpo_annotations.tsv")
-        self._annotator = self._initialise_annotator()
-
-    def _create_new_index_file(self):
-        if not self._hpo_index_path.exists():
-            index_config = {"rootConcepts": ["HP:0000118"]}
-            index_hpo = IndexHPO(
-                self.hpo_obo_path, self.data_output_dir, indexConfig=index_config
-            )
-            index_hpo.index()
+        self.index_config = (
+            {"rootConcepts": ["HP:0000118"]} if index_config is None else index_config
+        )
+        self.index_path = None
 
     def _initialise_annotator(self):
-        self._create_new_index_file()
-        return HPOAnnotator(self._hpo_index_path)
+        from FastHPOCR.HPOAnnotator import HPOAnnotator
+
+        from deft_matcher.matchers.fast_cr_index import load_or_build_fast_cr_index
+
+        self.index_path = load_or_build_fast_cr_index(
+            self.hpo_obo_path, "hpo", self.index_config, self.data_output_dir
+        )
+        return HPOAnnotator(str(self.index_path))
 
     @property
     def name(self) -> str:
         return "FastHPOCRMatcher"
 
-    def get_matches(self, free_text: str) -> list[str]:
-        annotations = self._annotator.annotate(free_text)
-        self._annotator.serialize(annotations, self._annotations_out_path)
-        if os.path.getsize(self._annotations_out_path) == 0:
-            return []
-        else:
-            df = pd.read_csv(self._annotations_out_path, sep="\t", header=None)
-            hpo_id_col = df[1]
-            return list(hpo_id_col)
+    @property
+    def config(self) -> dict[str, str]:
+        return {
+            "hpo_obo_path": self.hpo_obo_path,
+            "index_config": json.dumps(self.index_config, sort_keys=True),
+        }
+
+    @property
+    def version(self) -> str | None:
+        return get_obo_data_version(self.hpo_obo_path)
@@ -0,0 +1,437 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+from hpotk import Ontology, SynonymCategory, SynonymType
+from numpy import ndarray
+
+from deft_matcher.lexicon import Lexicon, _join_strings, _split_strings
+from deft_matcher.matcher import Matcher
+from deft_matcher.matchers.synonym_matcher import SynonymMatcher
+
+# Bump whenever the saved layout changes, so old indexes are rebuilt.
+FUZZY_INDEX_FORMAT = "1"
+
+_ARRAY_NAMES = ("deletes", "delete_starts", "key_codes", "key_lengths")
+
+
+def _deletes(text: str, max_deletes: int) -> set[str]:
+    """Every string made by deleting at most max_deletes characters from text."""
+    deletes = {text}
+    frontier = {text}
+    for _ in range(max_deletes):
+        frontier = {
+            candidate[:position] + candidate[position + 1 :]
+            for candidate in frontier
+            for position in range(len(candidate))
+        }
+        deletes |= frontier
+    return deletes
+
+
+def _strip_common_affixes(a: str, b: str) -> tuple[str, str]:
+    """The differing middles of a and b, which are all an edit distance depends on."""
+    prefix = 0
+    while prefix < len(a) and prefix < len(b) and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while (
+        suffix < len(a) - prefix
+        and suffix < len(b) - prefix
+        and a[-1 - suffix] == b[-1 - suffix]
+    ):
+        suffix += 1
+    return a[prefix : len(a) - suffix], b[prefix : len(b) - suffix]
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int | None:
+    """
+    The optimal string alignment distance between a and b, i.e. the number of insertions,
+    deletions, substitutions and transpositions of adjacent characters to turn one into the other,
+    or None if it is more than max_distance.
+
+    >>> edit_distance("hypotonai", "hypotonia", 2)
+    1
+    >>> edit_distance("microcephally", "microcephaly", 2)
+    1
+    >>> edit_distance("asthma", "autism", 2) is None
+    True
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+
+    a, b = _strip_common_affixes(a, b)
+    if not a or not b:
+        return max(len(a), len(b))
+
+    # Each edit changes the count of at most two characters, by one each.
+    count_difference = Counter(a)
+    count_difference.subtract(b)
+    if sum(map(abs, count_difference.values())) > 2 * max_distance:
+        return None
+
+    # Cells more than max_distance off the diagonal cannot lead to a match,
+    # so only a band around it is computed, and the rest left above max_distance.
+    too_far = max_distance + 1
+    before_previous: list[int] = []
+    previous = [j if j <= max_distance else too_far for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [too_far] * (len(b) + 1)
+        if i <= max_distance:
+            current[0] = i
+        first, last = max(1, i - max_distance), min(len(b), i + max_distance)
+        for j in range(first, last + 1):
+            distance = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (a[i - 1] != b[j - 1]),
+            )
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                distance = min(distance, before_previous[j - 2] + 1)
+            current[j] = distance
+        if min(current[first - 1 : last + 1]) > max_distance:
+            return None
+        before_previous, previous = previous, current
+
+    return previous[-1] if previous[-1] <= max_distance else None
+
+
+class FuzzyIndex:
+    """
+    A symmetric delete index, as in SymSpell, of a list of keys,
+    for finding every key within a small edit distance of a text.
+
+    Each key is indexed under every string made by deleting up to max_distance
+    characters from its first prefix_length characters.
+    Any key within max_distance of a text shares one of these with the text,
+    so a search only computes the edit distance to the few keys it finds that way.
+
+    The deletes are held sorted in a fixed-width array and searched by bisection,
+    so an index saved to a directory can be loaded memory-mapped, without rebuilding it.
+
+    >>> index = FuzzyIndex.from_keys(["hypotonia", "microcephaly", "asthma"], 2)
+    >>> index.search("microcephally", 2)
+    [(1, 1)]
+    """
+
+    keys: list[str]
+    max_distance: int
+    prefix_length: int
+    _deletes: ndarray
+    _delete_starts: ndarray
+    _key_codes: ndarray
+    _key_lengths: ndarray
+
+    def __init__(
+        self,
+        keys: list[str],
+        max_distance: int,
+        prefix_length: int,
+        deletes: ndarray,
+        delete_starts: ndarray,
+        key_codes: ndarray,
+        key_lengths: ndarray,
+    ) -> None:
+        self.keys = keys
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self._deletes = deletes
+        self._delete_starts = delete_starts
+        self._key_codes = key_codes
+        self._key_lengths = key_lengths
+
+    @classmethod
+    def from_keys(
+        cls, keys: list[str], max_distance: int, prefix_length: int = 7
+    ) -> "FuzzyIndex":
+        if max_distance < 0:
+            raise ValueError(
+                f"max_distance must not be negative, but was {max_distance}."
+            )
+        if prefix_length <= max_distance:
+            raise ValueError(
+                f"prefix_length must be more than max_distance, but was {prefix_length}."
+            )
+
+        keys_by_delete: dict[str, list[int]] = {}
+        for key_code, key in enumerate(keys):
+            for delete in _deletes(key[:prefix_length], max_distance):
+                keys_by_delete.setdefault(delete, []).append(key_code)
+
+        deletes = sorted(keys_by_delete)
+        key_codes = [keys_by_delete[delete] for delete in deletes]
+        return cls(
+            keys=keys,
+            max_distance=max_distance,
+            prefix_length=prefix_length,
+            deletes=np.array(deletes, dtype=f"<U{prefix_length}"),
+            delete_starts=np.cumsum([0, *map(len, key_codes)], dtype=np.int64),
+            key_codes=np.array(
+                [code for codes in key_codes for code in codes], dtype=np.int32
+            ),
+            key_lengths=np.array([len(key) for key in keys], dtype=np.int32),
+        )
+
+    @classmethod
+    def load(cls, directory: str | Path) -> "FuzzyIndex":
+        directory = Path(directory)
+        with open(directory / "fuzzy_index.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["format"] != FUZZY_INDEX_FORMAT:
+            raise ValueError(
+                f"FuzzyIndex at {directory} has format {meta['format']}, expected {FUZZY_INDEX_FORMAT}."
+            )
+
+        return cls(
+            keys=_split_strings(
+                (directory / "keys.bin").read_bytes(), meta["key_count"]
+            ),
+            max_distance=meta["max_distance"],
+            prefix_length=meta["prefix_length"],
+            **{
+                name: np.load(directory / f"{name}.npy", mmap_mode="r")
+                for name in _ARRAY_NAMES
+            },
+        )
+
+    def save(self, directory: str | Path) -> None:
+        """Writes via a temporary directory, so a half-written copy is never loaded."""
+        directory = Path(directory)
+        tmp_directory = directory.with_name(f"{directory.name}.{os.getpid()}.tmp")
+        tmp_directory.mkdir(parents=True, exist_ok=True)
+
+        with open(tmp_directory / "fuzzy_index.json", "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "format": FUZZY_INDEX_FORMAT,
+                    "max_distance": self.max_distance,
+                    "prefix_length": self.prefix_length,
+                    "key_count": len(self.keys),
+                },
+                f,
+            )
+        (tmp_directory / "keys.bin").write_bytes(_join_strings(self.keys))
+        for name in _ARRAY_NAMES:
+            np.save(
+                tmp_directory / f"{name}.npy", np.asarray(getattr(self, f"_{name}"))
+            )
+
+        try:
+            os.replace(tmp_directory, directory)
+        except OSError:
+            # Another process saved the same index first.
+            shutil.rmtree(tmp_directory)
+
+    def search(self, text: str, max_distance: int) -> list[tuple[int, int]]:
+        """
+        The (edit distance, key code) of each key within max_distance of text,
+        nearest first, and keys at the same distance in key order.
+        max_distance may not be more than the index was built for.
+        """
+        if max_distance > self.max_distance:
+            raise ValueError(
+                f"This index only supports max_distance up to {self.max_distance}."
+            )
+
+        queries = np.array(
+            sorted(_deletes(text[: self.prefix_length], max_distance)),
+            dtype=self._deletes.dtype,
+        )
+        positions = np.searchsorted(self._deletes, queries)
+        found = positions < len(self._deletes)
+        found[found] = self._deletes[positions[found]] == queries[found]
+        positions = positions[found]
+        if not len(positions):
+            return []
+
+        starts, ends = (
+            self._delete_starts[positions],
+            self._delete_starts[positions + 1],
+        )
+        candidates = np.unique(
+            np.concatenate(
+                [self._key_codes[start:end] for start, end in zip(starts, ends)]
+            )
+        )
+        candidates = candidates[
+            np.abs(self._key_lengths[candidates] - len(text)) <= max_distance
+        ]
+
+        matches = []
+        for key_code in candidates.tolist():
+            distance = edit_distance(text, self.keys[key_code], max_distance)
+            if distance is not None:
+                matches.append((distance, key_code))
+        matches.sort()
+        return matches
+
+
+def fuzzy_index_digest(keys: list[str], max_distance: int, prefix_length: int) -> str:
+    """A short hash of everything a FuzzyIndex is built from."""
+    digest = hashlib.sha256(
+        json.dumps([FUZZY_INDEX_FORMAT, max_distance, prefix_length]).encode("utf-8")
+    )
+    digest.update(_join_strings(keys))
+    return digest.hexdigest()[:16]
+
+
+class FuzzyMatcher(Matcher):
+    """
+    Matches free texts which are a label or allowed synonym with a typo or two,
+    e.g. "hypotonai" or "microcephally".
+
+    Up to max_distance insertions, deletions, substitutions or transpositions of adjacent
+    characters are allowed, but no more than one per chars_per_edit characters
+    of the free text, so that short free texts, like abbreviations, must match exactly.
+    The terms of the nearest label or synonym are returned.
+    If several are equally near, the terms of all of them are returned,
+    ordered by label or synonym, so the same free text always gets the same answer.
+
+    Synonyms are chosen as in SynonymMatcher, and include_synonyms=False keeps to labels.
+    The index is built on first use, or by warmup. If index_cache_dir is given,
+    it is saved there and loaded memory-mapped by later matchers with the same keys and settings.
+
+    >>> import hpotk
+    >>> matcher = FuzzyMatcher(hpotk.load_ontology("tests/data/mini_hp.json"))
+    >>> matcher.get_matches("Hypotonai")
+    ['HP:0001252']
+    """
+
+    max_distance: int
+    chars_per_edit: int
+    prefix_length: int
+    include_synonyms: bool
+    index_cache_dir: str | None
+    _lexicon: Lexicon
+    _entry_mask: ndarray
+    _allowed_synonym_categories: list[SynonymCategory]
+    _allowed_synonym_types: list[SynonymType]
+    _index: FuzzyIndex | None
+    _warmup_lock: threading.Lock
+
+    def __init__(
+        self,
+        ontology: Ontology | Lexicon,
+        max_distance: int = 2,
+        chars_per_edit: int = 4,
+        include_synonyms: bool = True,
+        synonym_categories: list[SynonymCategory] | None = None,
+        synonym_types: list[SynonymType] | None = None,
+        prefix_length: int = 7,
+        index_cache_dir: str | None = None,
+    ) -> None:
+        if max_distance < 0:
+            raise ValueError(
+                f"max_distance must not be negative, but was {max_distance}."
+            )
+        if chars_per_edit < 1:
+            raise ValueError(
+                f"chars_per_edit must be at least 1, but was {chars_per_edit}."
+            )
+        if prefix_length <= max_distance:
+            raise ValueError(
+                f"prefix_length must be more than max_distance, but was {prefix_length}."
+            )
+
+        self._lexicon = (
+            ontology
+            if isinstance(ontology, Lexicon)
+            else Lexicon.from_ontology(ontology)
+        )
+        self.max_distance = max_distance
+        self.chars_per_edit = chars_per_edit
+        self.prefix_length = prefix_length
+        self.include_synonyms = include_synonyms
+        self._allowed_synonym_categories = (
+            SynonymMatcher._get_allowed_synonym_categories(synonym_categories)
+        )
+        self._allowed_synonym_types = SynonymMatcher._get_allowed_synonym_types(
+            synonym_types
+        )
+        self._entry_mask = self._lexicon.label_mask()
+        if include_synonyms:
+            self._entry_mask = self._entry_mask | self._lexicon.synonym_mask(
+                self._allowed_synonym_categories, self._allowed_synonym_types
+            )
+        self.index_cache_dir = index_cache_dir
+        self._index = None
+        self._warmup_lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        # The index is rebuilt, or reloaded, where it is next used, rather than pickled.
+        state = self.__dict__.copy()
+        state["_index"] = None
+        del state["_warmup_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._warmup_lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return f"FuzzyMatcher({self._lexicon.prefix})"
+
+    @property
+    def config(self) -> dict[str, str]:
+        config = {
+            "max_distance": str(self.max_distance),
+            "chars_per_edit": str(self.chars_per_edit),
+            "include_synonyms": str(self.include_synonyms),
+        }
+        if self.include_synonyms:
+            config["synonym_categories"] = ",".join(
+                sorted(str(category) for category in self._allowed_synonym_categories)
+            )
+            config["synonym_types"] = ",".join(
+                sorted(
+                    str(synonym_type) for synonym_type in self._allowed_synonym_types
+                )
+            )
+        return config
+
+    @property
+    def version(self) -> str | None:
+        return self._lexicon.version
+
+    def warmup(self) -> None:
+        with self._warmup_lock:
+            if self._index is not None:
+                return
+            keys = sorted(self._lexicon.selected_keys(self._entry_mask).keys() - {""})
+            if self.index_cache_dir is None:
+                self._index = FuzzyIndex.from_keys(
+                    keys, self.max_distance, self.prefix_length
+                )
+                return
+
+            digest = fuzzy_index_digest(keys, self.max_distance, self.prefix_length)
+            directory = Path(self.index_cache_dir) / f"fuzzy_index_{digest}"
+            if not directory.exists():
+                FuzzyIndex.from_keys(keys, self.max_distance, self.prefix_length).save(
+                    directory
+                )
+            self._index = FuzzyIndex.load(directory)
+
+    def get_matches(self, free_text: str) -> list[str]:
+        if self._index is None:
+            self.warmup()
+
+        text = free_text.lower()
+        max_distance = min(self.max_distance, len(text) // self.chars_per_edit)
+        nearest = self._index.search(text, max_distance)
+        matches: dict[str, None] = {}
+        for distance, key_code in nearest:
+            if distance > nearest[0][0]:
+                break
+            matches.update(
+                dict.fromkeys(
+                    self._lexicon.lookup(self._index.keys[key_code], self._entry_mask)
+                )
+            )
+        return list(matches)
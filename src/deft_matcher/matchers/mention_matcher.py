@@ -0,0 +1,249 @@
+import threading
+from collections import deque
+
+from hpotk import Ontology, SynonymCategory, SynonymType
+
+from deft_matcher.lexicon import Lexicon
+from deft_matcher.matcher import Matcher
+from deft_matcher.matchers.synonym_matcher import SynonymMatcher
+
+# A mention of a key in a free text: (start, end, key code).
+Mention = tuple[int, int, int]
+
+
+class _Automaton:
+    """
+    An Aho-Corasick automaton over a list of keys,
+    which finds every occurrence of every key in a text in one pass over it.
+
+    States are numbered, with 0 the root. Each state has its transitions,
+    the state of its longest proper suffix which is also a key prefix (its fail state),
+    and the codes of the keys ending there, including those of its fail states.
+
+    >>> automaton = _Automaton(["he", "she", "his", "hers"])
+    >>> sorted(automaton.find("ushers"))
+    [(1, 4, 1), (2, 4, 0), (2, 6, 3)]
+    """
+
+    _transitions: list[dict[str, int]]
+    _fail: list[int]
+    _outputs: list[tuple[int, ...]]
+    _key_lengths: list[int]
+
+    def __init__(self, keys: list[str]) -> None:
+        self._transitions = [{}]
+        own_outputs: list[list[int]] = [[]]
+        for key_code, key in enumerate(keys):
+            state = 0
+            for char in key:
+                next_state = self._transitions[state].get(char)
+                if next_state is None:
+                    next_state = len(self._transitions)
+                    self._transitions[state][char] = next_state
+                    self._transitions.append({})
+                    own_outputs.append([])
+                state = next_state
+            own_outputs[state].append(key_code)
+        self._key_lengths = [len(key) for key in keys]
+
+        # Breadth first, so a state's fail state is always finished before it.
+        self._fail = [0] * len(self._transitions)
+        self._outputs = [()] * len(self._transitions)
+        queue = deque(self._transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            self._outputs[state] = (
+                *own_outputs[state],
+                *self._outputs[self._fail[state]],
+            )
+            for char, next_state in self._transitions[state].items():
+                fail = self._fail[state]
+                while fail and char not in self._transitions[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._transitions[fail].get(char, 0)
+                queue.append(next_state)
+
+    def __len__(self) -> int:
+        """The number of states."""
+        return len(self._transitions)
+
+    def find(self, text: str) -> list[Mention]:
+        """Every occurrence of a key in text, ordered by where it ends."""
+        transitions, fail, outputs = self._transitions, self._fail, self._outputs
+        key_lengths = self._key_lengths
+        mentions = []
+        state = 0
+        for end, char in enumerate(text, start=1):
+            while state and char not in transitions[state]:
+                state = fail[state]
+            state = transitions[state].get(char, 0)
+            for key_code in outputs[state]:
+                mentions.append((end - key_lengths[key_code], end, key_code))
+        return mentions
+
+
+def _on_word_boundaries(text: str, start: int, end: int) -> bool:
+    """Whether text[start:end] neither starts nor ends in the middle of a word."""
+    return (start == 0 or not text[start - 1].isalnum()) and (
+        end == len(text) or not text[end].isalnum()
+    )
+
+
+def _leftmost_longest(mentions: list[Mention]) -> list[Mention]:
+    """
+    Keeps the mentions which start first, and of those starting together the longest,
+    dropping any that overlap one already kept.
+    """
+    kept = []
+    kept_end = 0
+    for mention in sorted(mentions, key=lambda mention: (mention[0], -mention[1])):
+        if mention[0] >= kept_end:
+            kept.append(mention)
+            kept_end = mention[1]
+    return kept
+
+
+class MentionMatcher(Matcher):
+    """
+    Returns the ontology IDs of every label and allowed synonym mentioned in the free text,
+    in the order they are mentioned.
+
+    Where ExactMatcher and SynonymMatcher need the whole free text to be a label or synonym,
+    this finds them anywhere within it, e.g. both asthma and short stature in
+    "asthma and short stature". Matching is case-insensitive.
+    All labels and synonyms are compiled into one Aho-Corasick automaton,
+    so each free text is read once, however many there are to look for.
+
+    With word_boundaries, a mention must start and end at a word boundary,
+    so "seizure" is not found in "seizures".
+    With longest_match, only the longest of overlapping mentions is kept,
+    so "muscle hypotonia" is found in place of "hypotonia" within it.
+    Otherwise every mention is returned, overlapping or not.
+
+    Synonyms are chosen as in SynonymMatcher, and include_synonyms=False keeps to labels.
+    The automaton is built on first use, or by warmup.
+
+    >>> import hpotk
+    >>> matcher = MentionMatcher(hpotk.load_ontology("tests/data/mini_hp.json"))
+    >>> matcher.get_matches("Asthma, seizures and muscle hypotonia")
+    ['HP:0002099', 'HP:0001250', 'HP:0001252']
+    """
+
+    word_boundaries: bool
+    longest_match: bool
+    include_synonyms: bool
+    _lexicon: Lexicon
+    _allowed_synonym_categories: list[SynonymCategory]
+    _allowed_synonym_types: list[SynonymType]
+    _term_ids: list[list[str]] | None
+    _automaton: _Automaton | None
+    _warmup_lock: threading.Lock
+
+    def __init__(
+        self,
+        ontology: Ontology | Lexicon,
+        include_synonyms: bool = True,
+        synonym_categories: list[SynonymCategory] | None = None,
+        synonym_types: list[SynonymType] | None = None,
+        word_boundaries: bool = True,
+        longest_match: bool = True,
+    ) -> None:
+        self._lexicon = (
+            ontology
+            if isinstance(ontology, Lexicon)
+            else Lexicon.from_ontology(ontology)
+        )
+        self.include_synonyms = include_synonyms
+        self._allowed_synonym_categories = (
+            SynonymMatcher._get_allowed_synonym_categories(synonym_categories)
+        )
+        self._allowed_synonym_types = SynonymMatcher._get_allowed_synonym_types(
+            synonym_types
+        )
+        self.word_boundaries = word_boundaries
+        self.longest_match = longest_match
+        self._term_ids = None
+        self._automaton = None
+        self._warmup_lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        # The automaton is rebuilt where it is next used, rather than pickled.
+        state = self.__dict__.copy()
+        state["_term_ids"] = None
+        state["_automaton"] = None
+        del state["_warmup_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._warmup_lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return f"MentionMatcher({self._lexicon.prefix})"
+
+    @property
+    def config(self) -> dict[str, str]:
+        config = {
+            "include_synonyms": str(self.include_synonyms),
+            "word_boundaries": str(self.word_boundaries),
+            "longest_match": str(self.longest_match),
+        }
+        if self.include_synonyms:
+            config["synonym_categories"] = ",".join(
+                sorted(str(category) for category in self._allowed_synonym_categories)
+            )
+            config["synonym_types"] = ",".join(
+                sorted(
+                    str(synonym_type) for synonym_type in self._allowed_synonym_types
+                )
+            )
+        return config
+
+    @property
+    def version(self) -> str | None:
+        return self._lexicon.version
+
+    def warmup(self) -> None:
+        with self._warmup_lock:
+            if self._automaton is not None:
+                return
+            entry_mask = self._lexicon.label_mask()
+            if self.include_synonyms:
+                entry_mask = entry_mask | self._lexicon.synonym_mask(
+                    self._allowed_synonym_categories, self._allowed_synonym_types
+                )
+            selected_keys = self._lexicon.selected_keys(entry_mask)
+            selected_keys.pop("", None)
+            self._term_ids = list(selected_keys.values())
+            self._automaton = _Automaton(list(selected_keys))
+
+    def find_mentions(self, free_text: str) -> list[tuple[int, int, list[str]]]:
+        """
+        Each mention in the free text, as its start and end offsets in the lower-cased
+        free text and the ontology IDs of the label or synonym mentioned, in order of start.
+        """
+        if self._automaton is None:
+            self.warmup()
+
+        text = free_text.lower()
+        mentions = self._automaton.find(text)
+        if self.word_boundaries:
+            mentions = [
+                mention
+                for mention in mentions
+                if _on_word_boundaries(text, mention[0], mention[1])
+            ]
+        if self.longest_match:
+            mentions = _leftmost_longest(mentions)
+        else:
+            mentions.sort(key=lambda mention: (mention[0], -mention[1]))
+        return [
+            (start, end, self._term_ids[key_code]) for start, end, key_code in mentions
+        ]
+
+    def get_matches(self, free_text: str) -> list[str]:
+        matches = {}
+        for _, _, term_ids in self.find_mentions(free_text):
+            matches.update(dict.fromkeys(term_ids))
+        return list(matches)
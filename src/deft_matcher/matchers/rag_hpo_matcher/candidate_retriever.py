@@ -1,13 +1,45 @@
-import json
-import re
-from typing import List, Dict, Set
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Dict
 
-import faiss
 import numpy as np
-from faiss import IndexFlatIP
 from numpy import ndarray
 
-from sentence_transformers import SentenceTransformer
+from deft_matcher.matchers.rag_hpo_matcher.embedding_cache import (
+    EmbeddingCache,
+    EmbeddingStore,
+    embedding_model_key,
+)
+from deft_matcher.matchers.rag_hpo_matcher.embedding_metadata import (
+    EmbeddingMetadata,
+    load_embedding_metadata,
+)
+from deft_matcher.matchers.rag_hpo_matcher.faiss_index import (
+    FaissIndexConfig,
+    load_or_build_faiss_index,
+)
+
+if TYPE_CHECKING:
+    from faiss import Index
+    from sentence_transformers import SentenceTransformer
+
+
+def _is_settled(
+    candidates: List[Dict[str, str]],
+    similarities: ndarray[float],
+    indices: ndarray[int],
+    max_candidates: int,
+) -> bool:
+    """
+    Whether searching wider than this row of results could not change its candidates:
+    as the search found every vector it could, or max_candidates were taken
+    and the least similar neighbour found is strictly less similar than the last of them.
+    """
+    if indices[-1] < 0:
+        return True
+    if len(candidates) < max_candidates:
+        return False
+    return not candidates or similarities.min() < candidates[-1]["similarity_score"]
 
 
 class HpoCandidateRetriever:
@@ -17,74 +49,192 @@ class HpoCandidateRetriever:
     Given a str phrase, this phrase can be embedded
     and then the FAISS index can be used for either a simple similarity search,
     or a hybrid similarity search.
+
+    Many phrases can be handled at once with get_candidates_batch,
+    which embeds them in a single encode call and searches the index once.
+
+    By default the index is an exact IndexFlatIP, built afresh.
+    An approximate index can be chosen with index_config,
+    and if index_cache_dir is given, the built index is stored there
+    and memory-mapped on later loads instead of being rebuilt.
+    The embedding metadata is converted to a compact form and stored there too.
+    embedding_metadata_path may also name a directory saved by EmbeddingMetadata.save.
+
+    The embeddings of the last query_cache_size phrases are kept, so repeated phrases
+    are not encoded again. If query_cache_dir is given, every phrase's embedding
+    is also stored there, as float16, for the same model in other processes and later runs.
+    Hits and misses are counted by query_cache.
+
+    Nothing is loaded, and neither faiss nor sentence_transformers is imported,
+    until the first phrase is embedded or warmup() is called.
+    A pickled retriever leaves its loaded state behind, and loads its own when first used.
     """
 
     embedded_hpo_path: str
     embedding_metadata_path: str
     embedding_model_path: str
-    _emb_model: SentenceTransformer
+    index_config: FaissIndexConfig
+    index_cache_dir: str | None
+    query_cache_size: int
+    query_cache_dir: str | None
+    query_cache: EmbeddingCache | None
+    _faiss_index: "Index | None"
+    _embedding_metadata: EmbeddingMetadata | None
+    _emb_model: "SentenceTransformer | None"
 
     def __init__(
         self,
         embedded_hpo_path: str,
         embedding_metadata_path: str,
         embedding_model_path: str,
+        index_config: FaissIndexConfig | None = None,
+        index_cache_dir: str | None = None,
+        query_cache_size: int = 0,
+        query_cache_dir: str | None = None,
     ) -> None:
+        if query_cache_size < 0:
+            raise ValueError(
+                f"query_cache_size must not be negative, but was {query_cache_size}."
+            )
         self.embedded_hpo_path = embedded_hpo_path
         self.embedding_metadata_path = embedding_metadata_path
         self.embedding_model_path = embedding_model_path
-        self._faiss_index = self._initialise_faiss_index()
-        self._embedding_metadata = self._load_embedding_meta_data()
-        self._emb_model = self._initialise_embeddings_model()
+        self.index_config = index_config or FaissIndexConfig()
+        self.index_cache_dir = index_cache_dir
+        self.query_cache_size = query_cache_size
+        self.query_cache_dir = query_cache_dir
+        self.query_cache = None
+        self._faiss_index = None
+        self._embedding_metadata = None
+        self._emb_model = None
+        self._warmup_lock = threading.Lock()
 
-    def _initialise_faiss_index(self) -> IndexFlatIP:
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["_faiss_index"] = None
+        state["_embedding_metadata"] = None
+        state["_emb_model"] = None
+        state["query_cache"] = None
+        del state["_warmup_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._warmup_lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._emb_model is not None
+
+    def warmup(self) -> None:
+        """Loads the FAISS index, embedding metadata and embedding model, if not yet loaded."""
+        with self._warmup_lock:
+            if self._emb_model is not None:
+                return
+            self._faiss_index = self._initialise_faiss_index()
+            self._embedding_metadata = self._load_embedding_meta_data()
+            self.query_cache = self._initialise_query_cache()
+            self._emb_model = self._initialise_embeddings_model()
+
+    def _initialise_faiss_index(self) -> "Index":
         """
         Allows searches on the HPO embedding matrix.
         """
-        emb_matrix: ndarray[np.float32] = np.load(self.embedded_hpo_path)["emb"].astype(
-            np.float32
+        return load_or_build_faiss_index(
+            self.embedded_hpo_path, self.index_config, self.index_cache_dir
         )
-        dim: int = emb_matrix.shape[1]
-        faiss.normalize_L2(emb_matrix)
-        faiss_index: IndexFlatIP = faiss.IndexFlatIP(dim)
-        faiss_index.add(emb_matrix)  # type: ignore[arg-type]
-        return faiss_index
 
-    def _load_embedding_meta_data(self) -> List[Dict[str, str]]:
+    def _load_embedding_meta_data(self) -> EmbeddingMetadata:
         """
-        Output is a list of dictionaries of the form
-        {
-            'hp_id': HPO ID,
-            'info': synonym or label
-        }
-
-        The order of the list, corresponds to the order of the embedding matrix,
-        and to the indices returned by a search on the FAISS index.
+        The HPO ID and the synonym or label for each row of the embedding matrix,
+        so also for each index returned by a search on the FAISS index.
         """
-        with open(self.embedding_metadata_path, "r", encoding="utf-8") as f:
-            entries = json.load(f).get("entries", [])
-        return [{k: v for k, v in e.items() if k != "direction"} for e in entries]
+        return load_embedding_metadata(
+            self.embedding_metadata_path, self.index_cache_dir
+        )
+
+    def _initialise_query_cache(self) -> EmbeddingCache | None:
+        if self.query_cache_size == 0 and self.query_cache_dir is None:
+            return None
+
+        store = None
+        if self.query_cache_dir is not None:
+            model_key = embedding_model_key(self.embedding_model_path)
+            store = EmbeddingStore(
+                Path(self.query_cache_dir) / f"query_embeddings_{model_key[:16]}",
+                model_key,
+                self._faiss_index.d,
+            )
+        return EmbeddingCache(self.query_cache_size, store)
 
-    def _initialise_embeddings_model(self) -> SentenceTransformer:
+    def _initialise_embeddings_model(self) -> "SentenceTransformer":
         """
         Allows us to embed new phrases as 768 dimensional vectors.
         """
+        from sentence_transformers import SentenceTransformer
+
         return SentenceTransformer(self.embedding_model_path)
 
     def embed_phrase(self, phrase: str) -> ndarray[np.float32]:
         """
         Embed a phrase as a 768 dimensional vector.
         """
+        import faiss
+
+        if not self.is_loaded:
+            self.warmup()
+        if self.query_cache is not None:
+            return self.embed_phrases([phrase])
+
         vec: ndarray[np.float32] = self._emb_model.encode(phrase, convert_to_numpy=True)
         vec = vec.reshape(1, -1)
         faiss.normalize_L2(vec)
         return vec
 
-    @staticmethod
-    def _token_overlap(phrase1: str, phrase2: str) -> bool:
-        tokens1: Set[str] = set(re.findall(r"\w+", phrase1.lower()))
-        tokens2: Set[str] = set(re.findall(r"\w+", phrase2.lower()))
-        return bool(tokens1 & tokens2)
+    def embed_phrases(
+        self, phrases: List[str], batch_size: int = 64
+    ) -> ndarray[np.float32]:
+        """
+        Embed many phrases as a (len(phrases), 768) matrix, one row per phrase.
+        Phrases whose embeddings are in the query cache are not encoded again.
+        """
+        if not self.is_loaded:
+            self.warmup()
+        if self.query_cache is None:
+            return self._encode(phrases, batch_size)
+
+        cached = self.query_cache.get_many(phrases)
+        missing = list(
+            dict.fromkeys(
+                phrase
+                for phrase, embedding in zip(phrases, cached)
+                if embedding is None
+            )
+        )
+        encoded: dict[str, ndarray[np.float32]] = {}
+        if missing:
+            # As the cache will give them back, so hits and misses agree.
+            missing_vecs = self.query_cache.put_many(
+                missing, self._encode(missing, batch_size)
+            )
+            encoded = dict(zip(missing, missing_vecs))
+
+        return np.stack(
+            [
+                encoded[phrase] if embedding is None else embedding
+                for phrase, embedding in zip(phrases, cached)
+            ]
+        ).astype(np.float32, copy=False)
+
+    def _encode(self, phrases: List[str], batch_size: int) -> ndarray[np.float32]:
+        import faiss
+
+        vecs: ndarray[np.float32] = self._emb_model.encode(
+            phrases, batch_size=batch_size, convert_to_numpy=True
+        )
+        vecs = np.ascontiguousarray(vecs, dtype=np.float32).reshape(len(phrases), -1)
+        faiss.normalize_L2(vecs)
+        return vecs
 
     def get_candidates(
         self,
@@ -94,57 +244,184 @@ class HpoCandidateRetriever:
         max_candidates: int,
         similarity_threshold: float,
         hybrid_search: bool,
+        initial_amount_to_search: int | None = None,
     ) -> List[Dict[str, str]]:
         """
         Gets the best candidates based on cosine similarity score.
         If hybrid_search = True, then it also takes into account token overlap.
+
+        If initial_amount_to_search is given, the search starts with that many neighbours,
+        and only widens, up to amount_to_search, if they were not enough to decide
+        max_candidates candidates. See _search_and_select.
         """
+        query_vec: np.ndarray[np.float32] = self.embed_phrase(phrase)
 
-        similarities: ndarray[float]
-        indices: ndarray[int]
+        (candidates,) = self._search_and_select(
+            [phrase],
+            query_vec,
+            amount_to_search,
+            initial_amount_to_search,
+            min_candidates=min_candidates,
+            max_candidates=max_candidates,
+            similarity_threshold=similarity_threshold,
+            hybrid_search=hybrid_search,
+        )
+        return candidates
 
-        query_vec: np.ndarray[np.float32] = self.embed_phrase(phrase)
-        (similarities,), (indices,) = self._faiss_index.search(
-            query_vec, amount_to_search
-        )  # type: ignore[arg-type]
-
-        seen_hpo_ids: Set[str] = set()
-        candidates: List[Dict[str, str | float]] = []
-        for similarity_score, idx in sorted(
-            zip(similarities, indices), key=lambda x: x[0], reverse=True
-        ):
-            metadata: dict[str, str] = self._embedding_metadata[idx]
-            hpo_id: str = metadata.get("hp_id")
-            syn_or_label: str = metadata.get("info")
+    def get_candidates_batch(
+        self,
+        phrases: List[str],
+        amount_to_search: int,
+        min_candidates: int,
+        max_candidates: int,
+        similarity_threshold: float,
+        hybrid_search: bool,
+        batch_size: int = 64,
+        initial_amount_to_search: int | None = None,
+    ) -> List[List[Dict[str, str]]]:
+        """
+        The same as get_candidates, for many phrases at once.
 
-            if hpo_id in seen_hpo_ids:
-                continue
+        All phrases are embedded together and the FAISS index is searched with
+        the whole query matrix, then the candidates for each phrase are chosen
+        from its own row of results.
+        """
+        if not phrases:
+            return []
 
-            accept_candidate: bool
+        query_vecs: ndarray[np.float32] = self.embed_phrases(phrases, batch_size)
 
-            if hybrid_search:
-                accept_candidate = (
-                    similarity_score >= similarity_threshold
-                    or len(candidates) < min_candidates
-                    or self._token_overlap(phrase, syn_or_label)
-                )
-            else:
-                accept_candidate = (
-                    similarity_score >= similarity_threshold
-                    or len(candidates) < min_candidates
-                )
+        return self._search_and_select(
+            phrases,
+            query_vecs,
+            amount_to_search,
+            initial_amount_to_search,
+            min_candidates=min_candidates,
+            max_candidates=max_candidates,
+            similarity_threshold=similarity_threshold,
+            hybrid_search=hybrid_search,
+        )
+
+    def _search_and_select(
+        self,
+        phrases: List[str],
+        query_vecs: ndarray[np.float32],
+        amount_to_search: int,
+        initial_amount_to_search: int | None,
+        **selection,
+    ) -> List[List[Dict[str, str]]]:
+        """
+        Searches the FAISS index for each phrase, and chooses its candidates.
+
+        Candidates are chosen from the neighbours in order, each choice depending only on
+        the neighbours before it. So once max_candidates are chosen from the nearest k,
+        and the k-th is strictly less similar than the last of them, the rest can change
+        nothing. With initial_amount_to_search, each phrase is searched that wide,
+        and only the phrases not yet settled are searched again, four times as wide,
+        until amount_to_search is reached.
+        Where the k-th ties with the last candidate, FAISS may have kept any of the tied
+        neighbours, so the phrase is searched wider too.
+        The candidates are then the same as from searching amount_to_search at once,
+        as the neighbours more similar than the k-th are the same in either search,
+        for every index type but HNSW, which is always searched in full.
+        """
+        amount = amount_to_search
+        if (
+            initial_amount_to_search is not None
+            and self.index_config.index_type != "hnsw"
+        ):
+            amount = max(1, min(initial_amount_to_search, amount_to_search))
+
+        candidates: List[List[Dict[str, str]] | None] = [None] * len(phrases)
+        pending = np.arange(len(phrases))
+        while len(pending):
+            complete = amount >= amount_to_search or amount >= self._faiss_index.ntotal
+            similarities, indices = self._faiss_index.search(
+                query_vecs[pending], amount
+            )  # type: ignore[arg-type]
 
-            if accept_candidate:
-                seen_hpo_ids.add(hpo_id)
-                candidates.append(
-                    {
-                        "hpo_id": hpo_id,
-                        "description": syn_or_label,
-                        "similarity_score": float(similarity_score),
-                    }
+            still_pending = []
+            for position, phrase_similarities, phrase_indices in zip(
+                pending.tolist(), similarities, indices
+            ):
+                phrase_candidates = self._select_candidates(
+                    phrases[position], phrase_similarities, phrase_indices, **selection
                 )
+                if complete or _is_settled(
+                    phrase_candidates,
+                    phrase_similarities,
+                    phrase_indices,
+                    selection["max_candidates"],
+                ):
+                    candidates[position] = phrase_candidates
+                else:
+                    still_pending.append(position)
 
-            if len(candidates) >= max_candidates:
-                break
+            pending = np.array(still_pending, dtype=np.int64)
+            amount = min(amount * 4, amount_to_search)
 
         return candidates
+
+    def _select_candidates(
+        self,
+        phrase: str,
+        similarities: ndarray[float],
+        indices: ndarray[int],
+        min_candidates: int,
+        max_candidates: int,
+        similarity_threshold: float,
+        hybrid_search: bool,
+    ) -> List[Dict[str, str]]:
+        """
+        Chooses candidates from one row of FAISS search results, most similar first,
+        with at most one candidate per HPO ID.
+
+        Equally similar rows are taken in row order.
+        The first min_candidates HPO IDs are taken whatever their similarity.
+        After those, a row is only taken if it is at least similarity_threshold similar
+        or, with hybrid_search, shares a token with the phrase.
+        FAISS pads the row with index -1 if the index holds fewer vectors than were asked for.
+        """
+        order = np.flatnonzero(indices >= 0)
+        # FAISS returns rows most similar first, but breaks ties in no fixed way,
+        # so tied rows are put in row order, which searches of any width agree on.
+        if np.any(np.diff(similarities[order]) >= 0):
+            order = order[np.lexsort((indices[order], -similarities[order]))]
+        rows, similarities = indices[order], similarities[order]
+        hpo_id_codes = self._embedding_metadata.hpo_id_codes[rows]
+
+        # Where each row's HPO ID first appears.
+        _, first_appearances, hpo_id_inverse = np.unique(
+            hpo_id_codes, return_index=True, return_inverse=True
+        )
+        first_appearance = first_appearances[hpo_id_inverse]
+        taken_regardless = np.sort(first_appearances)[: max(min_candidates, 0)]
+        if min_candidates <= 0:
+            minimum_reached_at = 0
+        elif len(taken_regardless) == min_candidates:
+            minimum_reached_at = taken_regardless[-1] + 1
+        else:
+            minimum_reached_at = len(rows)
+
+        acceptable = similarities >= similarity_threshold
+        if hybrid_search:
+            acceptable |= self._embedding_metadata.shares_token(
+                rows, self._embedding_metadata.vocabulary_mask(phrase)
+            )
+        # The HPO IDs taken regardless are exactly those first appearing before then.
+        acceptable &= first_appearance >= minimum_reached_at
+        _, first_acceptable = np.unique(hpo_id_inverse[acceptable], return_index=True)
+        taken = np.concatenate(
+            [taken_regardless, np.flatnonzero(acceptable)[np.sort(first_acceptable)]]
+        )[: max(max_candidates, 0)]
+
+        return [
+            {
+                "hpo_id": self._embedding_metadata.hpo_id(row),
+                "description": self._embedding_metadata.info(row),
+                "similarity_score": float(similarity),
+            }
+            for row, similarity in zip(
+                rows[taken].tolist(), similarities[taken].tolist()
+            )
+        ]
@@ -0,0 +1,274 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+from numpy import ndarray
+
+from deft_matcher.utils import exclusive_lock
+
+# Bump whenever the saved layout changes, so old stores are not read.
+EMBEDDING_STORE_FORMAT = "1"
+
+
+def embedding_model_key(embedding_model_path: str) -> str:
+    """
+    Identifies an embedding model: by its path, and for a local model directory,
+    the names, sizes and modification times of its files,
+    so that replacing the model in place gets a new key.
+    """
+    path = Path(embedding_model_path)
+    files = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else []
+    identity = json.dumps(
+        [
+            os.path.abspath(path) if path.exists() else embedding_model_path,
+            [
+                [
+                    str(file.relative_to(path)),
+                    file.stat().st_size,
+                    file.stat().st_mtime_ns,
+                ]
+                for file in files
+            ],
+        ]
+    ).encode("utf-8")
+    return hashlib.sha256(identity).hexdigest()
+
+
+def round_to_float16(embeddings: ndarray) -> ndarray:
+    """
+    Embeddings as an EmbeddingStore gives them back: rounded to float16,
+    then, as rounding changes their length, L2-normalised again as float32.
+    """
+    rounded = np.asarray(embeddings, dtype=np.float16).astype(np.float32)
+    norms = np.linalg.norm(rounded, axis=1, keepdims=True)
+    return np.divide(rounded, norms, out=rounded, where=norms > 0)
+
+
+class EmbeddingStore:
+    """
+    Query embeddings kept on disk, as float16 rows of one memory-mapped file,
+    with a JSON lines index of which phrase is in which row.
+
+    Rows are only ever appended, under a file lock, each index line naming its row,
+    so several processes can share one store and a crash mid-append loses
+    at most the embeddings being appended.
+    A store only knows of the rows it has read or written itself since it was opened.
+    """
+
+    directory: Path
+    dim: int
+    _rows: dict[str, int]
+    _embeddings: ndarray | None
+
+    def __init__(self, directory: str | Path, model_key: str, dim: int) -> None:
+        self.directory = Path(directory)
+        self.dim = dim
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        meta_path = self.directory / "embedding_store.json"
+        meta = {"format": EMBEDDING_STORE_FORMAT, "model_key": model_key, "dim": dim}
+        with exclusive_lock(self._lock_path):
+            if not meta_path.exists():
+                with open(meta_path, "w", encoding="utf-8") as f:
+                    json.dump(meta, f)
+            with open(meta_path, "r", encoding="utf-8") as f:
+                found = json.load(f)
+        if found != meta:
+            raise ValueError(
+                f"The embedding store at {self.directory} is {found}, not {meta}."
+            )
+
+        self._rows = self._read_index()
+        self._embeddings = None
+
+    @property
+    def _lock_path(self) -> Path:
+        return self.directory / "embedding_store.lock"
+
+    @property
+    def _embeddings_path(self) -> Path:
+        return self.directory / "embeddings.f16"
+
+    @property
+    def _index_path(self) -> Path:
+        return self.directory / "index.jsonl"
+
+    @property
+    def _row_bytes(self) -> int:
+        return self.dim * np.dtype(np.float16).itemsize
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _read_index(self) -> dict[str, int]:
+        rows: dict[str, int] = {}
+        if not self._index_path.exists():
+            return rows
+        with open(self._index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                # A line cut short by a crash lacks its newline, or does not decode.
+                if not line.endswith("\n"):
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                rows[entry["phrase"]] = entry["row"]
+        return rows
+
+    def _mapped_embeddings(self) -> ndarray:
+        if self._embeddings is None:
+            n_rows = os.path.getsize(self._embeddings_path) // self._row_bytes
+            self._embeddings = np.memmap(
+                self._embeddings_path,
+                dtype=np.float16,
+                mode="r",
+                shape=(n_rows, self.dim),
+            )
+        return self._embeddings
+
+    def get_many(self, phrases: list[str]) -> list[ndarray | None]:
+        """
+        The stored embedding of each phrase, or None where there is none,
+        as float32 and L2-normalised, by round_to_float16.
+        """
+        rows = [self._rows.get(phrase) for phrase in phrases]
+        found_rows = [row for row in rows if row is not None]
+        if not found_rows:
+            return [None] * len(phrases)
+        embeddings = iter(round_to_float16(self._mapped_embeddings()[found_rows]))
+        return [None if row is None else next(embeddings) for row in rows]
+
+    def put_many(self, phrases: list[str], embeddings: ndarray) -> None:
+        """Appends the embeddings of the phrases, one row each."""
+        if not phrases:
+            return
+        data = np.ascontiguousarray(embeddings, dtype=np.float16).tobytes()
+
+        with exclusive_lock(self._lock_path):
+            with open(self._embeddings_path, "ab") as f:
+                # Overwrite any partial row left by a crash, so rows stay aligned.
+                first_row = f.seek(0, os.SEEK_END) // self._row_bytes
+                f.truncate(first_row * self._row_bytes)
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            lines = "".join(
+                json.dumps({"phrase": phrase, "row": first_row + offset}) + "\n"
+                for offset, phrase in enumerate(phrases)
+            )
+            with open(self._index_path, "ab+") as f:
+                # End any line cut short by a crash, so it is not joined to the next.
+                if f.seek(0, os.SEEK_END):
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        lines = "\n" + lines
+                f.write(lines.encode("utf-8"))
+
+        for offset, phrase in enumerate(phrases):
+            self._rows[phrase] = first_row + offset
+        self._embeddings = None
+
+
+class EmbeddingCache:
+    """
+    Remembers the embeddings of query phrases, so a phrase seen before is not encoded again.
+
+    The most recently used max_entries embeddings are kept in memory.
+    If an EmbeddingStore is given, embeddings are also kept there,
+    so other processes and later runs with the same model can reuse them.
+    Lookups found in memory count as hits, those found in the store as store_hits,
+    and the rest as misses.
+    """
+
+    max_entries: int
+    store: EmbeddingStore | None
+    hits: int
+    store_hits: int
+    misses: int
+    _entries: OrderedDict[str, ndarray]
+    _lock: threading.Lock
+
+    def __init__(self, max_entries: int, store: EmbeddingStore | None = None) -> None:
+        if max_entries < 0:
+            raise ValueError(
+                f"max_entries must not be negative, but was {max_entries}."
+            )
+        self.max_entries = max_entries
+        self.store = store
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        """The share of lookups found in memory or in the store."""
+        lookups = self.hits + self.store_hits + self.misses
+        return (self.hits + self.store_hits) / lookups if lookups else 0.0
+
+    @property
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "hits": self.hits,
+            "store_hits": self.store_hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+        }
+
+    def _remember(self, phrase: str, embedding: ndarray) -> None:
+        if self.max_entries == 0:
+            return
+        self._entries[phrase] = embedding
+        self._entries.move_to_end(phrase)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_many(self, phrases: list[str]) -> list[ndarray | None]:
+        """The embedding of each phrase, or None where it has not been seen."""
+        with self._lock:
+            found: list[ndarray | None] = []
+            for phrase in phrases:
+                embedding = self._entries.get(phrase)
+                if embedding is not None:
+                    self._entries.move_to_end(phrase)
+                found.append(embedding)
+            self.hits += sum(embedding is not None for embedding in found)
+
+            if self.store is not None:
+                missing = [i for i, embedding in enumerate(found) if embedding is None]
+                stored = self.store.get_many([phrases[i] for i in missing])
+                for i, embedding in zip(missing, stored):
+                    if embedding is not None:
+                        found[i] = embedding
+                        self._remember(phrases[i], embedding)
+                        self.store_hits += 1
+
+            self.misses += sum(embedding is None for embedding in found)
+            return found
+
+    def put_many(self, phrases: list[str], embeddings: ndarray) -> ndarray:
+        """
+        Remembers the embeddings of the phrases, which should be new to the cache,
+        and returns them as later lookups will.
+
+        With a store, that is as the store gives them back, by round_to_float16,
+        so a phrase gets the same embedding whether it was just encoded,
+        is remembered in memory, or is read from the store.
+        """
+        remembered = embeddings if self.store is None else round_to_float16(embeddings)
+        with self._lock:
+            for phrase, embedding in zip(phrases, remembered):
+                # A copy, so as not to keep the whole batch's array alive.
+                self._remember(phrase, np.array(embedding, dtype=np.float32))
+            if self.store is not None:
+                self.store.put_many(phrases, embeddings)
+        return remembered
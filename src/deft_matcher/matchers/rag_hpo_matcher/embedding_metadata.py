@@ -0,0 +1,260 @@
+import json
+import os
+import re
+import shutil
+from pathlib import Path
+
+import numpy as np
+from numpy import ndarray
+
+from deft_matcher.utils import file_digest
+
+_ARRAY_NAMES = (
+    "hpo_id_codes",
+    "hpo_id_offsets",
+    "hpo_id_bytes",
+    "info_offsets",
+    "info_bytes",
+)
+_TOKEN_ARRAY_NAMES = (
+    "token_offsets",
+    "token_codes",
+    "vocabulary_offsets",
+    "vocabulary_bytes",
+)
+
+# Bump whenever the saved layout changes, so cached metadata is converted again.
+EMBEDDING_METADATA_FORMAT = "2"
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenise(text: str) -> list[str]:
+    """
+    The distinct lower-cased word tokens of text, as compared in hybrid search.
+
+    >>> tokenise("Muscle hypotonia, hypotonia")
+    ['muscle', 'hypotonia']
+    """
+    return list(dict.fromkeys(_TOKEN_PATTERN.findall(text.lower())))
+
+
+def _pack_strings(strings: list[str]) -> tuple[ndarray, ndarray]:
+    """
+    Concatenates the UTF-8 encoded strings into one byte array,
+    with an array of len(strings) + 1 offsets marking where each one starts and ends.
+    """
+    encoded = [string.encode("utf-8") for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(string) for string in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def _unpack_strings(offsets: ndarray, blob: ndarray) -> list[str]:
+    blob_bytes = blob.tobytes()
+    return [
+        blob_bytes[start:end].decode("utf-8")
+        for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())
+    ]
+
+
+def _token_arrays(infos: list[str]) -> tuple[ndarray, ndarray, ndarray, ndarray]:
+    """
+    Tokenises each label or synonym into integer codes for a shared vocabulary:
+    the offsets of each row's codes, the codes, and the packed vocabulary.
+    """
+    vocabulary: dict[str, int] = {}
+    row_codes = [
+        sorted(
+            vocabulary.setdefault(token, len(vocabulary)) for token in tokenise(info)
+        )
+        for info in infos
+    ]
+    token_offsets = np.zeros(len(row_codes) + 1, dtype=np.int64)
+    np.cumsum([len(codes) for codes in row_codes], out=token_offsets[1:])
+    token_codes = np.fromiter(
+        (code for codes in row_codes for code in codes),
+        dtype=np.int32,
+        count=int(token_offsets[-1]),
+    )
+    return token_offsets, token_codes, *_pack_strings(list(vocabulary))
+
+
+class EmbeddingMetadata:
+    """
+    Which HPO ID, and which label or synonym, each row of the HPO embedding stands for.
+
+    The data is held in a handful of flat arrays rather than a dict per row:
+    each distinct HPO ID is stored once, and rows refer to it by an integer code,
+    while labels and synonyms are packed into a single UTF-8 byte array.
+    Saved to a directory of .npy files, it is memory-mapped when loaded,
+    so processes loading the same directory share its pages.
+
+    Each label and synonym is also tokenised once, into codes for a shared vocabulary,
+    so hybrid search can test many rows for a shared token with array operations
+    rather than tokenising each of them again for every query.
+
+    >>> metadata = EmbeddingMetadata.from_entries(
+    ...     [{"hp_id": "HP:1", "info": "a"}, {"hp_id": "HP:1", "info": "b"}]
+    ... )
+    >>> len(metadata), metadata.hpo_id(1), metadata.info(1)
+    (2, 'HP:1', 'b')
+    """
+
+    hpo_id_codes: ndarray
+    token_offsets: ndarray
+    token_codes: ndarray
+    _hpo_ids: list[str]
+    _info_offsets: ndarray
+    _info_bytes: ndarray
+    _vocabulary: dict[str, int]
+
+    def __init__(
+        self,
+        hpo_id_codes: ndarray,
+        hpo_id_offsets: ndarray,
+        hpo_id_bytes: ndarray,
+        info_offsets: ndarray,
+        info_bytes: ndarray,
+        token_offsets: ndarray,
+        token_codes: ndarray,
+        vocabulary_offsets: ndarray,
+        vocabulary_bytes: ndarray,
+    ) -> None:
+        self.hpo_id_codes = hpo_id_codes
+        # There are far fewer HPO IDs than rows, and every candidate needs one.
+        self._hpo_ids = _unpack_strings(hpo_id_offsets, hpo_id_bytes)
+        self._info_offsets = info_offsets
+        self._info_bytes = info_bytes
+        self.token_offsets = token_offsets
+        self.token_codes = token_codes
+        self._vocabulary = {
+            token: code
+            for code, token in enumerate(
+                _unpack_strings(vocabulary_offsets, vocabulary_bytes)
+            )
+        }
+
+    @classmethod
+    def from_entries(cls, entries: list[dict[str, str]]) -> "EmbeddingMetadata":
+        hpo_id_to_code: dict[str, int] = {}
+        hpo_id_codes = np.fromiter(
+            (
+                hpo_id_to_code.setdefault(entry["hp_id"], len(hpo_id_to_code))
+                for entry in entries
+            ),
+            dtype=np.int32,
+            count=len(entries),
+        )
+        infos = [entry["info"] for entry in entries]
+        return cls(
+            hpo_id_codes,
+            *_pack_strings(list(hpo_id_to_code)),
+            *_pack_strings(infos),
+            *_token_arrays(infos),
+        )
+
+    @classmethod
+    def from_json(cls, embedding_metadata_path: str) -> "EmbeddingMetadata":
+        """Reads the {"entries": [{"hp_id": ..., "info": ...}, ...]} metadata file."""
+        with open(embedding_metadata_path, "r", encoding="utf-8") as f:
+            entries = json.load(f).get("entries", [])
+        return cls.from_entries(entries)
+
+    @classmethod
+    def load(cls, directory: str | Path) -> "EmbeddingMetadata":
+        directory = Path(directory)
+        arrays = [
+            np.load(directory / f"{name}.npy", mmap_mode="r") for name in _ARRAY_NAMES
+        ]
+        if (directory / "token_codes.npy").exists():
+            token_arrays = [
+                np.load(directory / f"{name}.npy", mmap_mode="r")
+                for name in _TOKEN_ARRAY_NAMES
+            ]
+        else:
+            # Saved before labels and synonyms were tokenised.
+            token_arrays = _token_arrays(_unpack_strings(arrays[3], arrays[4]))
+        return cls(*arrays, *token_arrays)
+
+    def save(self, directory: str | Path) -> None:
+        """Writes via a temporary directory, so a half-written copy is never loaded."""
+        directory = Path(directory)
+        tmp_directory = directory.with_name(f"{directory.name}.{os.getpid()}.tmp")
+        tmp_directory.mkdir(parents=True, exist_ok=True)
+
+        hpo_id_offsets, hpo_id_bytes = _pack_strings(self._hpo_ids)
+        arrays = (
+            self.hpo_id_codes,
+            hpo_id_offsets,
+            hpo_id_bytes,
+            self._info_offsets,
+            self._info_bytes,
+            self.token_offsets,
+            self.token_codes,
+            *_pack_strings(list(self._vocabulary)),
+        )
+        for name, array in zip(_ARRAY_NAMES + _TOKEN_ARRAY_NAMES, arrays):
+            np.save(tmp_directory / f"{name}.npy", np.asarray(array))
+
+        try:
+            os.replace(tmp_directory, directory)
+        except OSError:
+            # Another process saved the same metadata first.
+            shutil.rmtree(tmp_directory)
+
+    def __len__(self) -> int:
+        return len(self.hpo_id_codes)
+
+    def hpo_id(self, row: int) -> str:
+        return self._hpo_ids[self.hpo_id_codes[row]]
+
+    def info(self, row: int) -> str:
+        """The label or synonym embedded at this row."""
+        start, end = self._info_offsets[row], self._info_offsets[row + 1]
+        return self._info_bytes[start:end].tobytes().decode("utf-8")
+
+    def vocabulary_mask(self, text: str) -> ndarray:
+        """Selects the tokens of the vocabulary which are also tokens of text."""
+        mask = np.zeros(len(self._vocabulary), dtype=bool)
+        codes = [self._vocabulary.get(token) for token in tokenise(text)]
+        mask[[code for code in codes if code is not None]] = True
+        return mask
+
+    def shares_token(self, rows: ndarray, vocabulary_mask: ndarray) -> ndarray:
+        """
+        For each of the rows, whether its label or synonym has a token
+        selected by vocabulary_mask.
+        """
+        starts = self.token_offsets[rows]
+        lengths = self.token_offsets[rows + 1] - starts
+        # The position in token_codes of every token of every row, row after row.
+        row_of_token = np.repeat(np.arange(len(rows)), lengths)
+        positions = (
+            np.arange(len(row_of_token))
+            - np.repeat(np.cumsum(lengths) - lengths, lengths)
+            + np.repeat(starts, lengths)
+        )
+        shared = vocabulary_mask[self.token_codes[positions]]
+        return np.bincount(row_of_token[shared], minlength=len(rows)) > 0
+
+
+def load_embedding_metadata(
+    embedding_metadata_path: str, cache_dir: str | None
+) -> EmbeddingMetadata:
+    """
+    Loads the metadata, either from a saved directory or from the JSON file.
+
+    If cache_dir is given, JSON metadata is converted once and saved there,
+    keyed on the JSON file's size and modification time, and memory-mapped from then on.
+    """
+    if os.path.isdir(embedding_metadata_path):
+        return EmbeddingMetadata.load(embedding_metadata_path)
+    if cache_dir is None:
+        return EmbeddingMetadata.from_json(embedding_metadata_path)
+
+    digest = file_digest(embedding_metadata_path, {"format": EMBEDDING_METADATA_FORMAT})
+    directory = Path(cache_dir) / f"hpo_metadata_{digest}"
+    if not directory.exists():
+        EmbeddingMetadata.from_json(embedding_metadata_path).save(directory)
+    return EmbeddingMetadata.load(directory)
@@ -0,0 +1,160 @@
+import math
+import os
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Literal
+
+import numpy as np
+from numpy import ndarray
+
+from deft_matcher.utils import file_digest
+
+# faiss is imported where it is used, so that importing this module stays cheap.
+if TYPE_CHECKING:
+    from faiss import Index
+
+IndexType = Literal["flat", "hnsw", "ivf_flat", "ivf_pq"]
+
+
+@dataclass(frozen=True)
+class FaissIndexConfig:
+    """
+    Which kind of FAISS index to search the HPO embedding with.
+
+    "flat" is exact. The others are approximate, trading recall for speed:
+    - "hnsw": a graph index. Raise ef_search for better recall.
+    - "ivf_flat": vectors bucketed into ivf_nlist clusters, of which nprobe are searched.
+    - "ivf_pq": as ivf_flat, but vectors are compressed into pq_m codes of pq_nbits bits.
+      pq_m must divide the embedding dimension.
+
+    If ivf_nlist is None, it is set to about 4 * sqrt(number of vectors).
+    """
+
+    index_type: IndexType = "flat"
+    hnsw_m: int = 32
+    ef_search: int = 64
+    ivf_nlist: int | None = None
+    nprobe: int = 16
+    pq_m: int = 16
+    pq_nbits: int = 8
+
+    def factory_string(self, n_vectors: int) -> str:
+        if self.index_type == "flat":
+            return "Flat"
+        elif self.index_type == "hnsw":
+            return f"HNSW{self.hnsw_m}"
+
+        nlist = self.ivf_nlist or max(
+            1, min(n_vectors, round(4 * math.sqrt(n_vectors)))
+        )
+        if self.index_type == "ivf_flat":
+            return f"IVF{nlist},Flat"
+        elif self.index_type == "ivf_pq":
+            return f"IVF{nlist},PQ{self.pq_m}x{self.pq_nbits}"
+        else:
+            raise ValueError(f"Unknown FAISS index type {self.index_type}.")
+
+    def as_dict(self) -> dict[str, str]:
+        return {key: str(value) for key, value in asdict(self).items()}
+
+
+def load_embedding_matrix(embedded_hpo_path: str) -> ndarray[np.float32]:
+    """The L2-normalised HPO embedding, so that inner product is cosine similarity."""
+    import faiss
+
+    emb_matrix: ndarray[np.float32] = np.ascontiguousarray(
+        np.load(embedded_hpo_path)["emb"], dtype=np.float32
+    )
+    faiss.normalize_L2(emb_matrix)
+    return emb_matrix
+
+
+def build_faiss_index(
+    emb_matrix: ndarray[np.float32], config: FaissIndexConfig
+) -> "Index":
+    """Builds (and if needed, trains) an inner product index over the normalised embedding."""
+    import faiss
+
+    n_vectors, dim = emb_matrix.shape
+    faiss_index: "Index" = faiss.index_factory(
+        dim, config.factory_string(n_vectors), faiss.METRIC_INNER_PRODUCT
+    )
+    if not faiss_index.is_trained:
+        faiss_index.train(emb_matrix)  # type: ignore[arg-type]
+    faiss_index.add(emb_matrix)  # type: ignore[arg-type]
+    configure_search(faiss_index, config)
+    return faiss_index
+
+
+def configure_search(faiss_index: "Index", config: FaissIndexConfig) -> None:
+    """Applies the search-time parameters, which are not stored with the index."""
+    import faiss
+
+    if config.index_type == "hnsw":
+        faiss.ParameterSpace().set_index_parameter(
+            faiss_index, "efSearch", config.ef_search
+        )
+    elif config.index_type in ("ivf_flat", "ivf_pq"):
+        faiss.ParameterSpace().set_index_parameter(faiss_index, "nprobe", config.nprobe)
+
+
+def index_file_path(
+    embedded_hpo_path: str, config: FaissIndexConfig, index_cache_dir: str
+) -> Path:
+    """
+    Where the index for this embedding and config is stored.
+
+    The file name is keyed on the embedding file's size and modification time,
+    and on the parameters that shape the index, so a changed embedding gets a new index.
+    """
+    build_params = {
+        key: value
+        for key, value in config.as_dict().items()
+        if key not in ("ef_search", "nprobe")
+    }
+    digest = file_digest(embedded_hpo_path, build_params)
+    return Path(index_cache_dir) / f"hpo_{config.index_type}_{digest}.faiss"
+
+
+def read_faiss_index(path: Path, config: FaissIndexConfig) -> "Index":
+    """Memory-maps a stored index rather than reading it all into memory."""
+    import faiss
+
+    if config.index_type in ("flat", "hnsw"):
+        mmap_flag = faiss.IO_FLAG_MMAP_IFC
+    else:
+        mmap_flag = faiss.IO_FLAG_MMAP
+    faiss_index: "Index" = faiss.read_index(
+        str(path), mmap_flag | faiss.IO_FLAG_READ_ONLY
+    )
+    configure_search(faiss_index, config)
+    return faiss_index
+
+
+def write_faiss_index(faiss_index: "Index", path: Path) -> None:
+    """Writes via a temporary file, so a half-written index is never picked up."""
+    import faiss
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    faiss.write_index(faiss_index, str(tmp_path))
+    os.replace(tmp_path, path)
+
+
+def load_or_build_faiss_index(
+    embedded_hpo_path: str, config: FaissIndexConfig, index_cache_dir: str | None
+) -> "Index":
+    """
+    Loads the index from index_cache_dir if it has been built before,
+    otherwise builds it, and stores it there for next time.
+    """
+    if index_cache_dir is None:
+        return build_faiss_index(load_embedding_matrix(embedded_hpo_path), config)
+
+    path = index_file_path(embedded_hpo_path, config, index_cache_dir)
+    if not path.exists():
+        faiss_index = build_faiss_index(
+            load_embedding_matrix(embedded_hpo_path), config
+        )
+        write_faiss_index(faiss_index, path)
+    return read_faiss_index(path, config)
@@ -0,0 +1,97 @@
+import argparse
+import json
+import time
+
+import numpy as np
+from numpy import ndarray
+
+from deft_matcher.matchers.rag_hpo_matcher.faiss_index import (
+    FaissIndexConfig,
+    build_faiss_index,
+    load_embedding_matrix,
+)
+
+
+def recall_at_k(exact_indices: ndarray, approximate_indices: ndarray, k: int) -> float:
+    """
+    The share of the exact top k neighbours that the approximate search also returned,
+    averaged over the queries.
+
+    >>> recall_at_k(np.array([[0, 1], [2, 3]]), np.array([[1, 0], [2, 5]]), k=2)
+    0.75
+    """
+    found = 0
+    for exact_row, approximate_row in zip(exact_indices, approximate_indices):
+        found += len(set(exact_row[:k]) & set(approximate_row[:k]) - {-1})
+    return found / (k * len(exact_indices))
+
+
+def benchmark_index_configs(
+    emb_matrix: ndarray[np.float32],
+    query_matrix: ndarray[np.float32],
+    configs: list[FaissIndexConfig],
+    k: int = 500,
+) -> list[dict[str, str | float]]:
+    """
+    Builds each index over emb_matrix and searches it with query_matrix,
+    reporting build time, mean query latency, and recall@k against an exact flat index.
+    Both matrices should already be L2-normalised.
+    """
+    k = min(k, len(emb_matrix))
+    exact_index = build_faiss_index(emb_matrix, FaissIndexConfig())
+    _, exact_indices = exact_index.search(query_matrix, k)  # type: ignore[call-arg]
+
+    results: list[dict[str, str | float]] = []
+    for config in configs:
+        start = time.perf_counter()
+        faiss_index = build_faiss_index(emb_matrix, config)
+        build_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, indices = faiss_index.search(query_matrix, k)  # type: ignore[call-arg]
+        search_seconds = time.perf_counter() - start
+
+        results.append(
+            {
+                **config.as_dict(),
+                "k": k,
+                "recall_at_k": recall_at_k(exact_indices, indices, k),
+                "build_seconds": build_seconds,
+                "query_latency_ms": 1000 * search_seconds / len(query_matrix),
+            }
+        )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare approximate FAISS indexes over an HPO embedding with exact search."
+    )
+    parser.add_argument("embedded_hpo_path")
+    parser.add_argument("--k", type=int, default=500)
+    parser.add_argument("--n-queries", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    emb_matrix = load_embedding_matrix(args.embedded_hpo_path)
+    # Perturbed rows of the embedding stand in for real queries.
+    rng = np.random.default_rng(args.seed)
+    rows = rng.choice(len(emb_matrix), size=min(args.n_queries, len(emb_matrix)))
+    query_matrix = emb_matrix[rows] + rng.normal(
+        scale=0.05, size=(len(rows), emb_matrix.shape[1])
+    ).astype(np.float32)
+    query_matrix /= np.linalg.norm(query_matrix, axis=1, keepdims=True)
+
+    configs = [
+        FaissIndexConfig(index_type="hnsw", ef_search=64),
+        FaissIndexConfig(index_type="hnsw", ef_search=256),
+        FaissIndexConfig(index_type="ivf_flat", nprobe=16),
+        FaissIndexConfig(index_type="ivf_flat", nprobe=64),
+        FaissIndexConfig(index_type="ivf_pq", nprobe=64),
+    ]
+    results = benchmark_index_configs(emb_matrix, query_matrix, configs, k=args.k)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,246 @@
-import json
-from ollama import chat, ChatResponse
+import asyncio
+import threading
+import weakref
+from collections.abc import Coroutine, Iterable
+from typing import TYPE_CHECKING, Any, TypeVar
+
+# ollama (and httpx with it) is imported when the first client is made.
+if TYPE_CHECKING:
+    import httpx
+    from ollama import AsyncClient, ChatResponse, Client
+
+T = TypeVar("T")
+
+
+class _EventLoopThread:
+    """
+    An event loop running on its own daemon thread,
+    with the connection pool and request slots bound to it.
+    """
+
+    loop: asyncio.AbstractEventLoop
+    thread: threading.Thread
+    async_client: "AsyncClient | None"
+    slots: asyncio.Semaphore | None
+
+    def __init__(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, name="OllamaClient", daemon=True
+        )
+        self.thread.start()
+        self.async_client = None
+        self.slots = None
+
+    def run(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        if threading.current_thread() is self.thread:
+            coroutine.close()
+            raise RuntimeError("OllamaClient.run cannot be called from its own loop.")
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+
+    async def _shutdown(self) -> None:
+        if self.async_client is not None:
+            await self.async_client._client.aclose()
+        await self.loop.shutdown_asyncgens()
+        await self.loop.shutdown_default_executor()
+
+    def close(self) -> None:
+        """Closes the connection pool, then stops and closes the loop."""
+        if self.loop.is_closed():
+            return
+        if self.thread.is_alive() and threading.current_thread() is not self.thread:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+        if not self.loop.is_running():
+            self.loop.close()
 
 
 class OllamaClient:
+    """
+    Sends chat requests to an Ollama model.
+
+    The synchronous and asynchronous paths each keep one pooled HTTP connection,
+    which is reused for every request rather than reconnecting per query.
+    Asynchronous requests all run on one event loop, on a thread of the client's own,
+    whichever threads call run(), so the pool is shared by every caller and every batch.
+    At most max_concurrent_requests asynchronous requests are in flight at once,
+    across all callers, and submit() waits for a free slot, so callers that produce work
+    faster than the model can answer are held back.
+
+    close() shuts down the loop and both connection pools,
+    which are opened again if the client is used afterwards.
+    """
+
     model_name: str
+    host: str | None
+    max_concurrent_requests: int
+
+    def __init__(
+        self, model_name: str, host: str | None = None, max_concurrent_requests: int = 4
+    ):
+        if max_concurrent_requests < 1:
+            raise ValueError(
+                f"max_concurrent_requests must be at least 1, but was {max_concurrent_requests}."
+            )
 
-    def __init__(self, model_name: str):
         self.model_name = model_name
+        self.host = host
+        self.max_concurrent_requests = max_concurrent_requests
+        self._client: "Client | None" = None
+        self._loop_thread: _EventLoopThread | None = None
+        self._close_loop: weakref.finalize | None = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        """Connections are not picklable, so a copy of the client opens its own."""
+        state = self.__dict__.copy()
+        state["_client"] = None
+        state["_loop_thread"] = None
+        state["_close_loop"] = None
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _messages(self, system_message: str, user_input: str) -> list[dict[str, str]]:
+        return [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": user_input},
+        ]
+
+    def _limits(self) -> "httpx.Limits":
+        import httpx
+
+        return httpx.Limits(
+            max_connections=self.max_concurrent_requests,
+            max_keepalive_connections=self.max_concurrent_requests,
+        )
+
+    def _sync_client(self) -> "Client":
+        with self._lock:
+            if self._client is None:
+                from ollama import Client
+
+                self._client = Client(host=self.host, limits=self._limits())
+            return self._client
 
     def query(self, system_message: str, user_input: str) -> str:
-        resp: ChatResponse = chat(
-            model=self.model_name,
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": user_input},
-            ],
+        resp: "ChatResponse" = self._sync_client().chat(
+            model=self.model_name, messages=self._messages(system_message, user_input)
+        )
+        return resp.message.content or ""
+
+    def model_digest(self) -> str | None:
+        """
+        The digest of the model as Ollama has it now, which changes whenever it is
+        pulled or created again, or None if Ollama cannot be reached or lacks the model.
+        """
+        import httpx
+        from ollama import ResponseError
+
+        try:
+            models = self._sync_client().list().models
+        except (ConnectionError, ResponseError, httpx.HTTPError):
+            return None
+
+        # Ollama lists models by their full name, with the tag.
+        model_name = (
+            self.model_name if ":" in self.model_name else f"{self.model_name}:latest"
+        )
+        return next(
+            (model.digest for model in models if model.model == model_name), None
+        )
+
+    def _async_client(self) -> tuple["AsyncClient", asyncio.Semaphore]:
+        """The connection pool and request slots on this client's event loop."""
+        loop_thread = self._loop_thread
+        if loop_thread is None or asyncio.get_running_loop() is not loop_thread.loop:
+            raise RuntimeError(
+                "OllamaClient coroutines must be run with OllamaClient.run."
+            )
+        if loop_thread.async_client is None:
+            from ollama import AsyncClient
+
+            loop_thread.async_client = AsyncClient(
+                host=self.host, limits=self._limits()
+            )
+            loop_thread.slots = asyncio.Semaphore(self.max_concurrent_requests)
+        return loop_thread.async_client, loop_thread.slots
+
+    async def _query_async(
+        self, async_client: "AsyncClient", system_message: str, user_input: str
+    ) -> str:
+        resp: "ChatResponse" = await async_client.chat(
+            model=self.model_name, messages=self._messages(system_message, user_input)
         )
-        resp_json: dict = json.loads(resp.model_dump_json())
-        return resp_json.get("message", {}).get("content", "")
+        return resp.message.content or ""
+
+    async def submit(self, system_message: str, user_input: str) -> asyncio.Task[str]:
+        """
+        Waits until fewer than max_concurrent_requests requests are in flight,
+        then starts this one and returns the task that will hold its answer.
+        """
+        async_client, slots = self._async_client()
+        await slots.acquire()
+
+        async def run_query() -> str:
+            try:
+                return await self._query_async(async_client, system_message, user_input)
+            finally:
+                slots.release()
+
+        return asyncio.create_task(run_query())
+
+    async def query_many_async(
+        self, system_message: str, user_inputs: Iterable[str]
+    ) -> list[str]:
+        """Answers every user input, concurrently, in the order they were given."""
+        tasks = [
+            await self.submit(system_message, user_input) for user_input in user_inputs
+        ]
+        return await gather_or_cancel(tasks)
+
+    def query_many(self, system_message: str, user_inputs: Iterable[str]) -> list[str]:
+        return self.run(self.query_many_async(system_message, user_inputs))
+
+    def run(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        """
+        Runs a coroutine on this client's long-lived event loop, and waits for its result,
+        so that the connection pool and request slots are shared by every call.
+        """
+        with self._lock:
+            if self._loop_thread is None:
+                self._loop_thread = _EventLoopThread()
+                # Stop the loop even if close() is never called.
+                self._close_loop = weakref.finalize(self, self._loop_thread.close)
+            loop_thread = self._loop_thread
+        return loop_thread.run(coroutine)
+
+    def close(self) -> None:
+        """Closes the connection pools and the event loop."""
+        with self._lock:
+            client, self._client = self._client, None
+            close_loop, self._close_loop = self._close_loop, None
+            self._loop_thread = None
+        if client is not None:
+            client._client.close()
+        if close_loop is not None:
+            close_loop()
+
+
+async def gather_or_cancel(tasks: list[asyncio.Task[T]]) -> list[T]:
+    """Like asyncio.gather, except that if one task fails, the others are cancelled."""
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
@@ -1,11 +1,23 @@
+import asyncio
 import json
+import os
+from pathlib import Path
 from typing import List, Dict
 
 from deft_matcher.matcher import Matcher
 from deft_matcher.matchers.rag_hpo_matcher.candidate_retriever import (
     HpoCandidateRetriever,
 )
-from deft_matcher.matchers.rag_hpo_matcher.ollama_client import OllamaClient
+from deft_matcher.matchers.rag_hpo_matcher.embedding_cache import (
+    EmbeddingCache,
+    embedding_model_key,
+)
+from deft_matcher.matchers.rag_hpo_matcher.faiss_index import FaissIndexConfig
+from deft_matcher.matchers.rag_hpo_matcher.ollama_client import (
+    OllamaClient,
+    gather_or_cancel,
+)
+from deft_matcher.utils import file_digest
 
 
 class RagHpoMatcher(Matcher):
@@ -15,6 +27,25 @@ class RagHpoMatcher(Matcher):
 
     These candidate HPO terms are found via a vector similarity search.
     The vectorised HPO is found in hpo_embedded.npz.
+
+    get_matches_batch works through the batch embedding_batch_size phrases at a time.
+    While the LLM answers one chunk (up to max_concurrent_requests at once),
+    candidates for the next chunk are retrieved in a background thread.
+
+    With initial_amount_to_search, the candidate search starts that wide,
+    and only searches up to amount_to_search neighbours for the free texts that need it.
+    The candidates, so the matches, are the same either way, so it is not part of config.
+
+    query_cache_size and query_cache_dir are passed to HpoCandidateRetriever,
+    to avoid encoding the same free text twice, within a run or across runs.
+
+    version identifies the LLM by its digest in Ollama, the embedding model by its files,
+    and the HPO embedding and its metadata by their size and modification time,
+    so results are not reused once any of them is pulled or rebuilt in place.
+
+    The embedding model and FAISS index are loaded when the first free text is matched,
+    so a RagHpoMatcher costs almost nothing if no text reaches it.
+    Call warmup() to load them up front instead.
     """
 
     def __init__(
@@ -28,14 +59,32 @@ class RagHpoMatcher(Matcher):
         max_candidates: int = 20,
         similarity_threshold: float = 0.35,
         hybrid_search: bool = True,
+        initial_amount_to_search: int | None = None,
+        embedding_batch_size: int = 64,
+        ollama_host: str | None = None,
+        max_concurrent_requests: int = 4,
+        index_config: FaissIndexConfig | None = None,
+        index_cache_dir: str | None = None,
+        query_cache_size: int = 0,
+        query_cache_dir: str | None = None,
     ) -> None:
         self.model_name = model_name
         self.embedded_hpo_path = embedded_hpo_path
         self.embedding_metadata_path = embedding_metadata_path
         self.embedding_model_path = embedding_model_path
-        self._client = OllamaClient(model_name=self.model_name)
+        self._client = OllamaClient(
+            model_name=self.model_name,
+            host=ollama_host,
+            max_concurrent_requests=max_concurrent_requests,
+        )
         self._hpo_candidate_retriever = HpoCandidateRetriever(
-            embedded_hpo_path, embedding_metadata_path, embedding_model_path
+            embedded_hpo_path,
+            embedding_metadata_path,
+            embedding_model_path,
+            index_config=index_config,
+            index_cache_dir=index_cache_dir,
+            query_cache_size=query_cache_size,
+            query_cache_dir=query_cache_dir,
         )
         # parameters for candidate retrieval
         self.amount_to_search = amount_to_search
@@ -43,19 +92,133 @@ class RagHpoMatcher(Matcher):
         self.max_candidates = max_candidates
         self.similarity_threshold = similarity_threshold
         self.hybrid_search = hybrid_search
+        self.initial_amount_to_search = initial_amount_to_search
+        self.embedding_batch_size = embedding_batch_size
 
     @property
     def name(self) -> str:
         return f"RagHpoMatcher({self.model_name})"
 
-    def get_matches(self, free_text: str) -> list[str]:
+    @property
+    def config(self) -> dict[str, str]:
+        config = {
+            "embedded_hpo_path": self.embedded_hpo_path,
+            "embedding_metadata_path": self.embedding_metadata_path,
+            "embedding_model_path": self.embedding_model_path,
+            "amount_to_search": str(self.amount_to_search),
+            "min_candidates": str(self.min_candidates),
+            "max_candidates": str(self.max_candidates),
+            "similarity_threshold": str(self.similarity_threshold),
+            "hybrid_search": str(self.hybrid_search),
+            **self._hpo_candidate_retriever.index_config.as_dict(),
+        }
+        if self._hpo_candidate_retriever.query_cache_dir is not None:
+            # Stored query embeddings are rounded to float16, which can shift candidates.
+            config["query_embedding_store"] = "float16"
+        return config
+
+    @property
+    def version(self) -> str | None:
+        """Found afresh on every call, from Ollama and the files, without loading anything."""
+        metadata_digest = (
+            embedding_model_key(self.embedding_metadata_path)[:16]
+            if os.path.isdir(self.embedding_metadata_path)
+            else file_digest(self.embedding_metadata_path)
+        )
+        return json.dumps(
+            {
+                "model_digest": self._client.model_digest(),
+                "embedding_model": embedding_model_key(self.embedding_model_path)[:16],
+                "embedded_hpo": file_digest(self.embedded_hpo_path),
+                "embedding_metadata": metadata_digest,
+            }
+        )
+
+    @property
+    def query_cache(self) -> EmbeddingCache | None:
+        """The retriever's cache of query embeddings, with its hit and miss counts, once loaded."""
+        return self._hpo_candidate_retriever.query_cache
+
+    def warmup(self) -> None:
+        self._hpo_candidate_retriever.warmup()
+
+    def close(self) -> None:
+        self._client.close()
+
+    @staticmethod
+    def _load_system_message() -> str:
         with open(
-            "/Users/patrick/DEFTMatcher/src/deft_matcher/matchers/rag_hpo_matcher/system_message.txt",
-            "r",
-            encoding="utf-8",
+            Path(__file__).parent / "system_message.txt", "r", encoding="utf-8"
         ) as f:
-            system_message: str = f.read()
+            return f.read()
 
+    def get_matches(self, free_text: str) -> list[str]:
+        return self._get_matches_with_system_message(
+            free_text, self._load_system_message()
+        )
+
+    def get_matches_batch(self, free_texts: list[str]) -> list[list[str]]:
+        system_message: str = self._load_system_message()
+        return self._client.run(self._match_batch_async(free_texts, system_message))
+
+    async def _match_batch_async(
+        self, free_texts: list[str], system_message: str
+    ) -> list[list[str]]:
+        chunks: list[list[str]] = [
+            free_texts[start : start + self.embedding_batch_size]
+            for start in range(0, len(free_texts), self.embedding_batch_size)
+        ]
+        answers: list[asyncio.Task[str]] = []
+        retrieval: asyncio.Task | None = None
+
+        try:
+            for chunk_no, chunk in enumerate(chunks):
+                if retrieval is None:
+                    retrieval = asyncio.create_task(
+                        asyncio.to_thread(self._retrieve_candidates, chunk)
+                    )
+                batch_candidates = await retrieval
+                retrieval = None
+
+                if chunk_no + 1 < len(chunks):
+                    retrieval = asyncio.create_task(
+                        asyncio.to_thread(
+                            self._retrieve_candidates, chunks[chunk_no + 1]
+                        )
+                    )
+
+                for free_text, candidates in zip(chunk, batch_candidates):
+                    answers.append(
+                        await self._client.submit(
+                            system_message, self._user_input(free_text, candidates)
+                        )
+                    )
+        except BaseException:
+            for task in answers:
+                task.cancel()
+            raise
+
+        return [[answer] for answer in await gather_or_cancel(answers)]
+
+    def _retrieve_candidates(self, free_texts: list[str]) -> List[List[Dict[str, str]]]:
+        return self._hpo_candidate_retriever.get_candidates_batch(
+            phrases=free_texts,
+            amount_to_search=self.amount_to_search,
+            min_candidates=self.min_candidates,
+            max_candidates=self.max_candidates,
+            similarity_threshold=self.similarity_threshold,
+            hybrid_search=self.hybrid_search,
+            batch_size=self.embedding_batch_size,
+            initial_amount_to_search=self.initial_amount_to_search,
+        )
+
+    @staticmethod
+    def _user_input(free_text: str, candidates: List[Dict[str, str]]) -> str:
+        return json.dumps({"phrase": free_text, "candidates": candidates})
+
+    def _get_matches_with_system_message(
+        self, free_text: str, system_message: str
+    ) -> list[str]:
         candidates: List[Dict[str, str]] = self._hpo_candidate_retriever.get_candidates(
             phrase=free_text,
             amount_to_search=self.amount_to_search,
@@ -63,8 +226,14 @@ class RagHpoMatcher(Matcher):
             max_candidates=self.max_candidates,
             similarity_threshold=self.similarity_threshold,
             hybrid_search=self.hybrid_search,
+            initial_amount_to_search=self.initial_amount_to_search,
         )
 
-        user_input: str = json.dumps({"phrase": free_text, "candidates": candidates})
+        return self._query_llm(system_message, free_text, candidates)
+
+    def _query_llm(
+        self, system_message: str, free_text: str, candidates: List[Dict[str, str]]
+    ) -> list[str]:
+        user_input: str = self._user_input(free_text, candidates)
 
         return [self._client.query(system_message, user_input)]
@@ -1,7 +1,10 @@
+import threading
+
 from hpotk import Ontology, SynonymCategory, SynonymType
+from numpy import ndarray
 
+from deft_matcher.lexicon import Lexicon
 from deft_matcher.matcher import Matcher
-from deft_matcher.utils import get_ontology_prefix
 
 
 class SynonymMatcher(Matcher):
@@ -11,48 +14,58 @@ class SynonymMatcher(Matcher):
 
     The acceptable Synonym Categories and Types can be chosen.
     If synonym_categories or synonym_types = None, then that will be interpreted as "anything goes".
+
+    Either an Ontology or a Lexicon built from one may be given.
+    Matchers with different filters can share one Lexicon,
+    as each only keeps a mask of the synonyms it accepts.
+    The accepted synonyms are read out of the Lexicon into a dict on first use, or by warmup.
     """
 
-    _ontology: Ontology
-    _syn_to_ids: dict[str, list[str]]
+    _lexicon: Lexicon
+    _synonym_mask: ndarray
+    _syn_to_ids: dict[str, list[str]] | None
+    _warmup_lock: threading.Lock
     _allowed_synonym_categories: list[SynonymCategory]
     _allowed_synonym_types: list[SynonymType]
 
     def __init__(
         self,
-        ontology: Ontology,
+        ontology: Ontology | Lexicon,
         synonym_categories: list[SynonymCategory] | None = None,
         synonym_types: list[SynonymType] | None = None,
     ) -> None:
-        self._ontology = ontology
+        self._lexicon = (
+            ontology
+            if isinstance(ontology, Lexicon)
+            else Lexicon.from_ontology(ontology)
+        )
         self._allowed_synonym_categories = self._get_allowed_synonym_categories(
             synonym_categories
         )
         self._allowed_synonym_types = self._get_allowed_synonym_types(synonym_types)
-        self._syn_to_ids = self._initialise_syn_to_ids()
-
-    def _initialise_syn_to_ids(self) -> dict[str, list[str]]:
-        """
-        For each allowed synonym, returns all ontology IDs which correspond to it.
-        Yes, it is possible that a synonym appears twice in an ontology.
-        """
+        self._synonym_mask = self._initialise_synonym_mask()
+        self._syn_to_ids = None
+        self._warmup_lock = threading.Lock()
 
-        syn_to_ids = {}
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["_syn_to_ids"] = None
+        del state["_warmup_lock"]
+        return state
 
-        for term in self._ontology.terms:
-            if term.synonyms is None:
-                continue
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._warmup_lock = threading.Lock()
 
-            for syn in term.synonyms:
-                if (
-                    syn.category in self._allowed_synonym_categories
-                    and syn.synonym_type in self._allowed_synonym_types
-                ):
-                    syn_to_ids.setdefault(syn.name.lower(), []).append(
-                        term.identifier.value
-                    )
-
-        return syn_to_ids
+    def _initialise_synonym_mask(self) -> ndarray:
+        """
+        Selects the allowed synonyms from the lexicon.
+        Yes, it is possible that a synonym appears twice in an ontology,
+        so a synonym may match several ontology IDs.
+        """
+        return self._lexicon.synonym_mask(
+            self._allowed_synonym_categories, self._allowed_synonym_types
+        )
 
     @staticmethod
     def _get_allowed_synonym_categories(
@@ -92,8 +105,35 @@ class SynonymMatcher(Matcher):
 
     @property
     def name(self) -> str:
-        return f"SynonymMatcher({get_ontology_prefix(self._ontology)})"
+        return f"SynonymMatcher({self._lexicon.prefix})"
+
+    @property
+    def config(self) -> dict[str, str]:
+        return {
+            "synonym_categories": ",".join(
+                sorted(str(category) for category in self._allowed_synonym_categories)
+            ),
+            "synonym_types": ",".join(
+                sorted(
+                    str(synonym_type) for synonym_type in self._allowed_synonym_types
+                )
+            ),
+        }
+
+    @property
+    def version(self) -> str | None:
+        return self._lexicon.version
+
+    def warmup(self) -> None:
+        with self._warmup_lock:
+            if self._syn_to_ids is None:
+                self._syn_to_ids = self._lexicon.selected_keys(self._synonym_mask)
 
     def get_matches(self, free_text: str) -> list[str]:
-        possible_matches = self._syn_to_ids.get(free_text.lower())
-        return [] if possible_matches is None else possible_matches
+        return self.get_matches_batch([free_text])[0]
+
+    def get_matches_batch(self, free_texts: list[str]) -> list[list[str]]:
+        if self._syn_to_ids is None:
+            self.warmup()
+        syn_to_ids = self._syn_to_ids
+        return [syn_to_ids.get(text.lower(), []) for text in free_texts]
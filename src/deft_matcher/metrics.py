@@ -0,0 +1,183 @@
+from collections import Counter, deque
+from dataclasses import dataclass, field
+
+# A matcher's totals compact their batch timings once they hold more than this many.
+# Compacted timings keep per-text latencies to 3 significant figures,
+# so there are at most 900 per decade of latency, and always fewer than this.
+_MAX_MATCHER_TIMINGS = 20000
+
+
+def weighted_percentile(timings: list[tuple[int, float]], q: float) -> float:
+    """
+    The q-th percentile of per-text latency, given (number of texts, seconds) per batch,
+    where each text in a batch is taken to have cost the batch's average.
+
+    >>> weighted_percentile([(3, 3.0), (1, 5.0)], 50)
+    1.0
+    >>> weighted_percentile([(3, 3.0), (1, 5.0)], 99)
+    5.0
+    """
+    per_text = sorted(
+        (seconds / n_texts, n_texts) for n_texts, seconds in timings if n_texts
+    )
+    total = sum(n_texts for _, n_texts in per_text)
+    if total == 0:
+        return 0.0
+
+    rank = q / 100 * total
+    seen = 0
+    for latency, n_texts in per_text:
+        seen += n_texts
+        if seen >= rank:
+            return latency
+    return per_text[-1][0]
+
+
+def compact_timings(timings: list[tuple[int, float]]) -> list[tuple[int, float]]:
+    """
+    Merges batches whose per-text latencies agree to 3 significant figures,
+    which changes weighted_percentile by less than 0.5%.
+
+    >>> compact_timings([(2, 0.02), (1, 0.0100001), (1, 5.0)])
+    [(3, 0.03), (1, 5.0)]
+    """
+    texts_by_latency: Counter[float] = Counter()
+    for n_texts, seconds in timings:
+        if n_texts:
+            texts_by_latency[float(f"{seconds / n_texts:.3g}")] += n_texts
+    return [
+        (n_texts, n_texts * latency) for latency, n_texts in texts_by_latency.items()
+    ]
+
+
+@dataclass
+class StageMetrics:
+    """
+    What happened when one DecisiveMatcher was applied.
+
+    texts_in counts the unmatched free texts at the start of the stage,
+    texts_sent those actually given to the matcher,
+    after equivalent texts were grouped and cached answers were used.
+    Latencies are per text, as seen by DeftMatcher: each batch's wall time
+    is shared evenly between its texts.
+    """
+
+    stage: int
+    matcher_name: str
+    resolver_name: str
+    texts_in: int = 0
+    texts_sent: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    matched: int = 0
+    unmatched: int = 0
+    wall_seconds: float = 0.0
+    batch_timings: list[tuple[int, float]] = field(default_factory=list)
+
+    @property
+    def texts_per_second(self) -> float:
+        return self.texts_in / self.wall_seconds if self.wall_seconds else 0.0
+
+    @property
+    def cache_hit_rate(self) -> float:
+        lookups = self.cache_hits + self.cache_misses
+        return self.cache_hits / lookups if lookups else 0.0
+
+    def latency_percentile(self, q: float) -> float:
+        return weighted_percentile(self.batch_timings, q)
+
+    def as_dict(self) -> dict[str, str | int | float]:
+        return {
+            "stage": self.stage,
+            "matcher": self.matcher_name,
+            "resolver": self.resolver_name,
+            "texts_in": self.texts_in,
+            "texts_sent": self.texts_sent,
+            "matched": self.matched,
+            "unmatched": self.unmatched,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_hit_rate": self.cache_hit_rate,
+            "wall_seconds": self.wall_seconds,
+            "texts_per_second": self.texts_per_second,
+            "latency_p50_seconds": self.latency_percentile(50),
+            "latency_p95_seconds": self.latency_percentile(95),
+            "latency_p99_seconds": self.latency_percentile(99),
+        }
+
+
+@dataclass
+class RunMetrics:
+    """
+    The StageMetrics of the stages DeftMatcher has run, in order,
+    and running totals over all of them, overall and per matcher.
+
+    In streaming mode each chunk runs every stage again,
+    so by_matcher adds up the stages that used the same matcher.
+    Totals are kept up to date as stages are added, and their batch timings compacted,
+    so neither memory nor the cost of an export grows with the number of stages.
+    If max_stages is set, stages only keeps that many of the latest.
+    """
+
+    data_name: str
+    stages: deque[StageMetrics] = field(default_factory=deque)
+    max_stages: int | None = None
+    stage_count: int = field(default=0, init=False)
+    texts: int = field(default=0, init=False)
+    wall_seconds: float = field(default=0.0, init=False)
+    _matchers: dict[str, StageMetrics] = field(
+        default_factory=dict, init=False, repr=False
+    )
+
+    def __post_init__(self) -> None:
+        stages, self.stages = self.stages, deque(maxlen=self.max_stages)
+        for stage in stages:
+            self.add_stage(stage)
+
+    def add_stage(self, stage: StageMetrics) -> None:
+        self.stages.append(stage)
+        self.stage_count += 1
+        self.wall_seconds += stage.wall_seconds
+        if stage.stage == 0:
+            # The number of free texts given to the run, i.e. to its first stages.
+            self.texts += stage.texts_in
+
+        total = self._matchers.setdefault(
+            stage.matcher_name,
+            StageMetrics(stage.stage, stage.matcher_name, stage.resolver_name),
+        )
+        total.texts_in += stage.texts_in
+        total.texts_sent += stage.texts_sent
+        total.cache_hits += stage.cache_hits
+        total.cache_misses += stage.cache_misses
+        total.matched += stage.matched
+        total.unmatched += stage.unmatched
+        total.wall_seconds += stage.wall_seconds
+        total.batch_timings.extend(stage.batch_timings)
+        if len(total.batch_timings) > _MAX_MATCHER_TIMINGS:
+            total.batch_timings = compact_timings(total.batch_timings)
+
+    def limit_stages(self, max_stages: int | None) -> None:
+        """From now on keeps only the latest max_stages stages. Totals are unaffected."""
+        self.max_stages = max_stages
+        self.stages = deque(self.stages, maxlen=max_stages)
+
+    @property
+    def texts_per_second(self) -> float:
+        return self.texts / self.wall_seconds if self.wall_seconds else 0.0
+
+    def by_matcher(self) -> dict[str, StageMetrics]:
+        return dict(self._matchers)
+
+    def as_dict(self) -> dict:
+        return {
+            "data_name": self.data_name,
+            "texts": self.texts,
+            "wall_seconds": self.wall_seconds,
+            "texts_per_second": self.texts_per_second,
+            "stages": [stage.as_dict() for stage in self.stages],
+            "matchers": {
+                matcher_name: stage.as_dict()
+                for matcher_name, stage in self.by_matcher().items()
+            },
+        }
@@ -0,0 +1,21 @@
+from abc import ABC, abstractmethod
+
+from deft_matcher.metrics import RunMetrics
+
+
+class MetricsExporter(ABC):
+    """
+    Sends DeftMatcher's metrics somewhere they can be looked at.
+
+    DeftMatcher calls export after every stage, with the metrics of the whole run so far.
+    """
+
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        """Each metrics exporter must have a 'name' attribute."""
+        pass
+
+    @abstractmethod
+    def export(self, metrics: RunMetrics) -> None:
+        raise NotImplementedError
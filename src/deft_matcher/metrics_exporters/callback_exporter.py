@@ -0,0 +1,20 @@
+from collections.abc import Callable
+
+from deft_matcher.metrics import RunMetrics
+from deft_matcher.metrics_exporter import MetricsExporter
+
+
+class CallbackExporter(MetricsExporter):
+    """Passes the metrics to a function of your choice."""
+
+    callback: Callable[[RunMetrics], None]
+
+    def __init__(self, callback: Callable[[RunMetrics], None]) -> None:
+        self.callback = callback
+
+    @property
+    def name(self) -> str:
+        return "CallbackExporter"
+
+    def export(self, metrics: RunMetrics) -> None:
+        self.callback(metrics)
@@ -0,0 +1,26 @@
+import json
+import os
+from pathlib import Path
+
+from deft_matcher.metrics import RunMetrics
+from deft_matcher.metrics_exporter import MetricsExporter
+
+
+class JsonFileExporter(MetricsExporter):
+    """Writes the metrics to a JSON file, replacing it atomically each time."""
+
+    path: Path
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+
+    @property
+    def name(self) -> str:
+        return "JsonFileExporter"
+
+    def export(self, metrics: RunMetrics) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(metrics.as_dict(), f, indent=2)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,72 @@
+import os
+from pathlib import Path
+
+from deft_matcher.metrics import RunMetrics
+from deft_matcher.metrics_exporter import MetricsExporter
+
+# (metric name, help text, type, StageMetrics attribute or latency percentile)
+_MATCHER_METRICS: list[tuple[str, str, str, str | float]] = [
+    ("texts_in", "Free texts given to the matcher's stages.", "counter", "texts_in"),
+    ("texts_sent", "Free texts actually sent to the matcher.", "counter", "texts_sent"),
+    ("matched", "Free texts matched by the matcher's stages.", "counter", "matched"),
+    ("cache_hits", "Match cache hits.", "counter", "cache_hits"),
+    ("cache_misses", "Match cache misses.", "counter", "cache_misses"),
+    (
+        "wall_seconds",
+        "Wall time spent in the matcher's stages.",
+        "counter",
+        "wall_seconds",
+    ),
+    ("texts_per_second", "Free texts per second.", "gauge", "texts_per_second"),
+    ("latency_p50_seconds", "Median per-text latency.", "gauge", 50),
+    ("latency_p95_seconds", "95th percentile per-text latency.", "gauge", 95),
+    ("latency_p99_seconds", "99th percentile per-text latency.", "gauge", 99),
+]
+
+
+def _escape(label_value: str) -> str:
+    return label_value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text(metrics: RunMetrics, prefix: str = "deft_matcher") -> str:
+    """The metrics of each matcher in Prometheus' text exposition format."""
+    data_name = _escape(metrics.data_name)
+    lines: list[str] = []
+    for metric, help_text, metric_type, source in _MATCHER_METRICS:
+        full_name = f"{prefix}_{metric}"
+        lines.append(f"# HELP {full_name} {help_text}")
+        lines.append(f"# TYPE {full_name} {metric_type}")
+        for matcher_name, stage in metrics.by_matcher().items():
+            value = (
+                stage.latency_percentile(source)
+                if isinstance(source, (int, float))
+                else getattr(stage, source)
+            )
+            lines.append(
+                f'{full_name}{{data_name="{data_name}",matcher="{_escape(matcher_name)}"}} {float(value)}'
+            )
+    return "\n".join(lines) + "\n"
+
+
+class PrometheusTextExporter(MetricsExporter):
+    """
+    Writes the metrics to a file in Prometheus' text exposition format,
+    e.g. for node_exporter's textfile collector, replacing it atomically each time.
+    """
+
+    path: Path
+    prefix: str
+
+    def __init__(self, path: str | Path, prefix: str = "deft_matcher") -> None:
+        self.path = Path(path)
+        self.prefix = prefix
+
+    @property
+    def name(self) -> str:
+        return "PrometheusTextExporter"
+
+    def export(self, metrics: RunMetrics) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(prometheus_text(metrics, self.prefix), encoding="utf-8")
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,80 @@
+import heapq
+import json
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+
+@dataclass(frozen=True)
+class ProfileConfig:
+    """
+    Where DeftMatcher writes its profiles, and how many of the slowest free texts to keep.
+
+    For each stage, a cProfile dump (readable with pstats or snakeviz) is written to
+    output_dir/<run stage number>_<matcher name>.prof,
+    and the top_n slowest free texts of every matcher so far to output_dir/slowest_texts.json.
+    """
+
+    output_dir: str
+    top_n: int = 20
+
+    def __post_init__(self) -> None:
+        if self.top_n < 0:
+            raise ValueError(f"top_n must not be negative, but was {self.top_n}.")
+
+    def profile_path(self, run_stage: int, matcher_name: str) -> Path:
+        safe_name = re.sub(r"[^\w.-]+", "_", matcher_name).strip("_")
+        return Path(self.output_dir) / f"{run_stage:03d}_{safe_name}.prof"
+
+    @property
+    def slowest_texts_path(self) -> Path:
+        return Path(self.output_dir) / "slowest_texts.json"
+
+
+class SlowestTexts:
+    """
+    Keeps the top_n free texts which took longest, in O(log top_n) per text.
+
+    >>> slowest = SlowestTexts(top_n=2)
+    >>> for free_text, seconds in [("a", 0.1), ("b", 0.3), ("c", 0.2)]:
+    ...     slowest.add(free_text, seconds)
+    >>> slowest.as_list()
+    [{'free_text': 'b', 'seconds': 0.3}, {'free_text': 'c', 'seconds': 0.2}]
+    """
+
+    top_n: int
+    _heap: list[tuple[float, str]]
+
+    def __init__(self, top_n: int) -> None:
+        self.top_n = top_n
+        self._heap = []
+
+    def add(self, free_text: str, seconds: float) -> None:
+        if len(self._heap) < self.top_n:
+            heapq.heappush(self._heap, (seconds, free_text))
+        elif self._heap and seconds > self._heap[0][0]:
+            heapq.heapreplace(self._heap, (seconds, free_text))
+
+    def as_list(self) -> list[dict[str, str | float]]:
+        return [
+            {"free_text": free_text, "seconds": seconds}
+            for seconds, free_text in sorted(self._heap, reverse=True)
+        ]
+
+
+def write_slowest_texts(path: Path, slowest_texts: dict[str, SlowestTexts]) -> None:
+    """Writes the slowest texts of each matcher as JSON, replacing the file atomically."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                matcher_name: slowest.as_list()
+                for matcher_name, slowest in slowest_texts.items()
+            },
+            f,
+            indent=2,
+            ensure_ascii=False,
+        )
+    os.replace(tmp_path, path)
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import sqlite3
+from abc import ABC, abstractmethod
+from collections.abc import Collection, Iterator
+from dataclasses import astuple, dataclass, fields
+from pathlib import Path
+
+from deft_matcher.canonicaliser import Canonicaliser
+from deft_matcher.decisive_matcher import DecisiveMatcher
+from deft_matcher.match_cache import matcher_key
+
+
+def stage_keys(
+    decisive_matchers: list[DecisiveMatcher], canonicaliser: Canonicaliser | None = None
+) -> list[str]:
+    """
+    For each stage, a key identifying it and every stage before it:
+    their matchers' names, configs and versions, and their resolvers,
+    and the canonicaliser and its config, if there is one.
+
+    What a stage decided still holds for as long as its key is unchanged,
+    since a change to an earlier stage could have decided the free text differently,
+    and a change to the canonicaliser could have grouped it with other free texts.
+    The key of the last stage identifies the whole pipeline.
+    """
+    digest = hashlib.sha256()
+    if canonicaliser is not None:
+        digest.update(
+            json.dumps(
+                [canonicaliser.name, canonicaliser.config], sort_keys=True
+            ).encode("utf-8")
+        )
+    keys = []
+    for dm in decisive_matchers:
+        digest.update(
+            json.dumps([matcher_key(dm.matcher), dm.ambiguity_resolver.name]).encode(
+                "utf-8"
+            )
+        )
+        keys.append(digest.copy().hexdigest())
+    return keys
+
+
+@dataclass(frozen=True)
+class MatchRecord:
+    """
+    What a DeftMatcher run decided for one free text, and how.
+
+    For a matched free text, the matcher, its version, and the resolver that decided it.
+    For a free text no stage could match, match and the rest are None.
+    provenance_key is the stage_keys entry of the deciding stage,
+    or of the last stage if the free text went unmatched.
+    """
+
+    free_text: str
+    match: str | None
+    matcher_name: str | None
+    matcher_version: str | None
+    resolver_name: str | None
+    provenance_key: str
+    data_name: str
+    recorded_at: str
+
+
+class ResultsStore(ABC):
+    """
+    Keeps the latest MatchRecord for each free text, across DeftMatcher runs,
+    so that later runs need only match what is new or out of date.
+    """
+
+    @abstractmethod
+    def get_many(self, free_texts: Collection[str]) -> dict[str, MatchRecord]:
+        """The stored records for those of the free texts that have one."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def put_many(self, records: list[MatchRecord]) -> None:
+        """Stores the records, replacing any earlier ones for the same free texts."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def records(self) -> Iterator[MatchRecord]:
+        """Every stored record, in free text order."""
+        raise NotImplementedError
+
+
+class SQLiteResultsStore(ResultsStore):
+    """A ResultsStore kept in a single SQLite file, one row per free text."""
+
+    path: Path
+    _connection: sqlite3.Connection
+
+    # Stay well below SQLite's limit on the number of query parameters.
+    _LOOKUP_CHUNK_SIZE = 500
+    _COLUMNS = tuple(field.name for field in fields(MatchRecord))
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._connection = sqlite3.connect(self.path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                free_text TEXT PRIMARY KEY,
+                match TEXT,
+                matcher_name TEXT,
+                matcher_version TEXT,
+                resolver_name TEXT,
+                provenance_key TEXT NOT NULL,
+                data_name TEXT NOT NULL,
+                recorded_at TEXT NOT NULL
+            )
+            """
+        )
+        self._connection.commit()
+
+    def __len__(self) -> int:
+        (count,) = self._connection.execute("SELECT COUNT(*) FROM results").fetchone()
+        return count
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def get_many(self, free_texts: Collection[str]) -> dict[str, MatchRecord]:
+        free_texts_list = list(free_texts)
+        found: dict[str, MatchRecord] = {}
+        for start in range(0, len(free_texts_list), self._LOOKUP_CHUNK_SIZE):
+            chunk = free_texts_list[start : start + self._LOOKUP_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._connection.execute(
+                f"SELECT {', '.join(self._COLUMNS)} FROM results "
+                f"WHERE free_text IN ({placeholders})",
+                chunk,
+            )
+            found.update((row[0], MatchRecord(*row)) for row in rows)
+        return found
+
+    def put_many(self, records: list[MatchRecord]) -> None:
+        placeholders = ",".join("?" * len(self._COLUMNS))
+        self._connection.executemany(
+            f"INSERT OR REPLACE INTO results VALUES ({placeholders})",
+            [astuple(record) for record in records],
+        )
+        self._connection.commit()
+
+    def records(self) -> Iterator[MatchRecord]:
+        rows = self._connection.execute(
+            f"SELECT {', '.join(self._COLUMNS)} FROM results ORDER BY free_text"
+        )
+        return (MatchRecord(*row) for row in rows)
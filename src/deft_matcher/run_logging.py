@@ -0,0 +1,118 @@
+import json
+import logging
+import queue
+from dataclasses import dataclass
+from datetime import datetime
+from logging import Handler, Logger
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from typing import Literal
+
+PerTextLogging = Literal["all", "sampled", "off"]
+
+# Extra fields attached to DeftMatcher's log records, written out by JsonLinesFormatter.
+STRUCTURED_FIELDS = ("event", "free_text", "match", "matcher", "resolver")
+
+
+@dataclass(frozen=True)
+class LogConfig:
+    """
+    How DeftMatcher logs its progress.
+
+    per_text decides whether a record is written for every free text ("all"),
+    for a random sample_rate share of them ("sampled"), or for none ("off").
+    Records are written to a new timestamped file in log_dir,
+    as JSON lines if structured = True, otherwise as plain text.
+    If asynchronous = True, records are handed to a background thread through a queue,
+    so the matching loop never waits on the file.
+    If log_dir is None, no file is written, and records just propagate
+    to whatever handlers the application has configured.
+    """
+
+    per_text: PerTextLogging = "all"
+    sample_rate: float = 0.01
+    structured: bool = False
+    asynchronous: bool = False
+    log_dir: str | None = "logs"
+    n_examples: int = 3
+
+    def __post_init__(self) -> None:
+        if self.per_text not in ("all", "sampled", "off"):
+            raise ValueError(f"Unknown per_text logging mode {self.per_text}.")
+        if not 0 <= self.sample_rate <= 1:
+            raise ValueError(
+                f"sample_rate must be between 0 and 1, but was {self.sample_rate}."
+            )
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formats each record as one JSON object, including any structured fields it carries."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            if hasattr(record, field):
+                entry[field] = getattr(record, field)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class RunLogHandlers:
+    """
+    Attaches the handlers asked for by config to logger, which should not be the root logger,
+    and detaches them again on close().
+
+    With asynchronous logging, close() also waits for the queued records to be written.
+    """
+
+    logger: Logger
+    _attached: Handler | None
+    _file_handler: Handler | None
+    _listener: QueueListener | None
+
+    def __init__(self, logger: Logger, config: LogConfig) -> None:
+        self.logger = logger
+        self._attached = None
+        self._file_handler = None
+        self._listener = None
+
+        logger.setLevel(logging.INFO)
+        if config.log_dir is None:
+            return
+
+        log_dir = Path(config.log_dir)
+        log_dir.mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
+        suffix = "jsonl" if config.structured else "log"
+        self._file_handler = logging.FileHandler(log_dir / f"{timestamp}.{suffix}")
+        self._file_handler.setFormatter(
+            JsonLinesFormatter()
+            if config.structured
+            else logging.Formatter(
+                "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+            )
+        )
+
+        if config.asynchronous:
+            record_queue: queue.SimpleQueue = queue.SimpleQueue()
+            self._attached = QueueHandler(record_queue)
+            self._listener = QueueListener(record_queue, self._file_handler)
+            self._listener.start()
+        else:
+            self._attached = self._file_handler
+        logger.addHandler(self._attached)
+
+    def close(self) -> None:
+        if self._attached is not None:
+            self.logger.removeHandler(self._attached)
+            self._attached = None
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+        if self._file_handler is not None:
+            self._file_handler.close()
+            self._file_handler = None
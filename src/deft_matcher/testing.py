@@ -0,0 +1,164 @@
+"""
+Offline stand-ins for the RAG-HPO pipeline's external pieces,
+shared by the tests and the benchmarks so that the two cannot drift apart.
+"""
+
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+
+def build_rag_data(
+    entries: list[dict[str, str]], output_dir: Path, dim: int = 64, seed: int = 0
+) -> dict[str, str]:
+    """
+    Builds a random-projection embedder, i.e. a SentenceTransformer averaging
+    a fixed random vector per word, then embeds the info of every entry with it.
+    Each entry needs an hp_id and an info, and is written to the metadata as it is.
+    Returns the three paths HpoCandidateRetriever needs.
+    """
+    import numpy as np
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import StaticEmbedding
+    from tokenizers import Tokenizer, models, normalizers, pre_tokenizers
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    words = sorted(
+        {
+            word
+            for entry in entries
+            for word in re.findall(r"\w+", entry["info"].lower())
+        }
+    )
+    vocab = {"[UNK]": 0, **{word: idx + 1 for idx, word in enumerate(words)}}
+    tokenizer = Tokenizer(models.WordLevel(vocab=vocab, unk_token="[UNK]"))
+    tokenizer.normalizer = normalizers.Lowercase()
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    weights = torch.randn(
+        len(vocab), dim, generator=torch.Generator().manual_seed(seed)
+    )
+    model = SentenceTransformer(
+        modules=[StaticEmbedding(tokenizer, embedding_weights=weights)], device="cpu"
+    )
+    model_path = output_dir / "embedder"
+    model.save(str(model_path))
+
+    embedded_hpo_path = output_dir / "hpo_embedded.npz"
+    np.savez(
+        embedded_hpo_path,
+        emb=model.encode([entry["info"] for entry in entries], batch_size=1024),
+    )
+    metadata_path = output_dir / "hpo_meta.json"
+    metadata_path.write_text(json.dumps({"entries": entries}), encoding="utf-8")
+
+    return {
+        "embedded_hpo_path": str(embedded_hpo_path),
+        "embedding_metadata_path": str(metadata_path),
+        "embedding_model_path": str(model_path),
+    }
+
+
+class FakeOllama:
+    """
+    A local stand-in for Ollama's /api/chat and /api/tags endpoints.
+
+    After waiting latency seconds, it answers with the HPO ID of the first candidate
+    it was sent, or with nothing, just as a perfectly obedient model would,
+    and records how many requests overlapped.
+    It lists the models in digests, by name and digest.
+
+    It serves between start() and stop(), or within a with block.
+    """
+
+    latency: float
+    digests: dict[str, str]
+    requests: int
+    in_flight: int
+    max_in_flight: int
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.digests = {}
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def host(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeOllama":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def answer(self, body: dict) -> str:
+        user_input = json.loads(body["messages"][-1]["content"])
+        candidates = user_input.get("candidates", [])
+        return candidates[0]["hpo_id"] if candidates else ""
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self._send_json(
+                    {
+                        "models": [
+                            {"model": model, "name": model, "digest": digest}
+                            for model, digest in fake.digests.items()
+                        ]
+                    }
+                )
+
+            def do_POST(self):
+                with fake._lock:
+                    fake.requests += 1
+                    fake.in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+                try:
+                    length = int(self.headers["Content-Length"])
+                    body = json.loads(self.rfile.read(length))
+                    time.sleep(fake.latency)
+                    content = fake.answer(body)
+                finally:
+                    with fake._lock:
+                        fake.in_flight -= 1
+
+                self._send_json(
+                    {
+                        "model": body["model"],
+                        "message": {"role": "assistant", "content": content},
+                        "done": True,
+                    }
+                )
+
+            def _send_json(self, response: dict) -> None:
+                payload = json.dumps(response).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
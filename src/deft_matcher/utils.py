@@ -1,9 +1,61 @@
-from hpotk import Ontology
+import hashlib
+import json
+import os
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING
 
+if TYPE_CHECKING:
+    from hpotk import Ontology
 
-def get_ontology_prefix(ontology: Ontology):
+
+def get_ontology_prefix(ontology: "Ontology"):
     for term_id in ontology.term_ids:
         prefix = term_id.prefix
         break
 
     return prefix
+
+
+def get_obo_data_version(obo_path: str) -> str | None:
+    """Reads the data-version from the header of an OBO file, if it has one."""
+    with open(obo_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("["):
+                break
+            if line.startswith("data-version:"):
+                return line.split(":", 1)[1].strip()
+    return None
+
+
+def file_digest(path: str, params: dict[str, str] | None = None) -> str:
+    """A short hash of a file's path, size and modification time, and any params."""
+    stat = os.stat(path)
+    key = json.dumps(
+        [os.path.abspath(path), stat.st_size, stat.st_mtime_ns, params or {}],
+        sort_keys=True,
+    )
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+@contextmanager
+def exclusive_lock(lock_path: Path) -> Iterator[None]:
+    """
+    Holds an exclusive lock on lock_path, across processes, until the block exits.
+
+    Where file locks are unavailable, as on Windows, nothing is locked,
+    so callers should still be safe without it, if slower.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+
+    with open(lock_path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,48 @@
+from pathlib import Path
+
+import hpotk
+import pytest
+
+from deft_matcher.testing import FakeOllama, build_rag_data
+
+
+@pytest.fixture
+def test_data_dir() -> Path:
+    return Path(__file__).parent / "data"
+
+
+@pytest.fixture
+def mini_hpo(test_data_dir):
+    """A ten term slice of HPO, small enough to load without the ontology store."""
+    return hpotk.load_ontology(str(test_data_dir / "mini_hp.json"))
+
+
+@pytest.fixture(scope="session")
+def mini_rag_data(tmp_path_factory) -> dict[str, str]:
+    """
+    Builds everything HpoCandidateRetriever needs from the mini HPO, offline:
+    a bag-of-words SentenceTransformer, the embedded labels and synonyms, and their metadata.
+    """
+    hpo = hpotk.load_ontology(str(Path(__file__).parent / "data" / "mini_hp.json"))
+
+    entries = []
+    for term in hpo.terms:
+        entries.append(
+            {"hp_id": term.identifier.value, "info": term.name, "direction": "label"}
+        )
+        for synonym in term.synonyms or []:
+            entries.append(
+                {
+                    "hp_id": term.identifier.value,
+                    "info": synonym.name,
+                    "direction": "label",
+                }
+            )
+
+    return build_rag_data(entries, tmp_path_factory.mktemp("rag_hpo"), dim=16)
+
+
+@pytest.fixture
+def fake_ollama():
+    with FakeOllama() as fake:
+        yield fake
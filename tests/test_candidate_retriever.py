@@ -0,0 +1,183 @@
+import json
+import pickle
+
+import numpy as np
+import pytest
+
+from deft_matcher.matchers.rag_hpo_matcher.candidate_retriever import (
+    HpoCandidateRetriever,
+)
+from deft_matcher.matchers.rag_hpo_matcher.embedding_metadata import EmbeddingMetadata
+from deft_matcher.matchers.rag_hpo_matcher.faiss_index import FaissIndexConfig
+
+
+@pytest.fixture
+def retriever(mini_rag_data):
+    return HpoCandidateRetriever(**mini_rag_data)
+
+
+@pytest.fixture
+def search_params():
+    return {
+        "amount_to_search": 500,
+        "min_candidates": 2,
+        "max_candidates": 5,
+        "similarity_threshold": 0.35,
+        "hybrid_search": True,
+    }
+
+
+def test_get_candidates(retriever, search_params):
+    candidates = retriever.get_candidates("muscle hypotonia", **search_params)
+
+    assert candidates[0]["hpo_id"] == "HP:0001252"
+    assert candidates[0]["similarity_score"] == pytest.approx(1.0, abs=1e-5)
+    assert len({candidate["hpo_id"] for candidate in candidates}) == len(candidates)
+
+
+def test_get_candidates_batch_matches_get_candidates(retriever, search_params):
+    phrases = ["muscle hypotonia", "leg pain", "short stature", "nonsense words"]
+
+    batch_candidates = retriever.get_candidates_batch(
+        phrases, batch_size=2, **search_params
+    )
+
+    assert len(batch_candidates) == len(phrases)
+    for phrase, candidates in zip(phrases, batch_candidates):
+        single_candidates = retriever.get_candidates(phrase, **search_params)
+        assert [c["hpo_id"] for c in candidates] == [
+            c["hpo_id"] for c in single_candidates
+        ]
+        assert [c["similarity_score"] for c in candidates] == pytest.approx(
+            [c["similarity_score"] for c in single_candidates], abs=1e-5
+        )
+
+
+def test_get_candidates_batch_empty(retriever, search_params):
+    assert retriever.get_candidates_batch([], **search_params) == []
+
+
+def test_retriever_loads_on_first_use(mini_rag_data, search_params):
+    retriever = HpoCandidateRetriever(**mini_rag_data)
+    assert not retriever.is_loaded
+
+    copy = pickle.loads(pickle.dumps(retriever))
+    candidates = copy.get_candidates("muscle hypotonia", **search_params)
+
+    assert copy.is_loaded
+    assert not retriever.is_loaded
+    assert candidates[0]["hpo_id"] == "HP:0001252"
+    assert not pickle.loads(pickle.dumps(copy)).is_loaded
+
+
+def test_select_candidates(mini_rag_data):
+    retriever = HpoCandidateRetriever(**mini_rag_data)
+    retriever._embedding_metadata = EmbeddingMetadata.from_entries(
+        [
+            {"hp_id": "HP:1", "info": "Hypotonia"},
+            {"hp_id": "HP:1", "info": "Low muscle tone"},
+            {"hp_id": "HP:2", "info": "Short stature"},
+            {"hp_id": "HP:3", "info": "Leg pain"},
+            {"hp_id": "HP:4", "info": "Muscle weakness"},
+            {"hp_id": "HP:5", "info": "Asthma"},
+        ]
+    )
+    # Out of order, as an approximate index might return them, and padded with -1.
+    similarities = np.array([0.9, 0.2, 0.8, 0.1, 0.3, 0.15, 0.0], dtype=np.float32)
+    indices = np.array([1, 3, 0, 4, 2, 5, -1])
+
+    def selected(phrase: str, min_candidates: int, hybrid_search: bool) -> list[str]:
+        candidates = retriever._select_candidates(
+            phrase,
+            similarities,
+            indices,
+            min_candidates=min_candidates,
+            max_candidates=3,
+            similarity_threshold=0.5,
+            hybrid_search=hybrid_search,
+        )
+        return [candidate["description"] for candidate in candidates]
+
+    assert selected("muscle", 0, hybrid_search=False) == ["Low muscle tone"]
+    assert selected("muscle", 0, hybrid_search=True) == [
+        "Low muscle tone",
+        "Muscle weakness",
+    ]
+    assert selected("muscle", 2, hybrid_search=False) == [
+        "Low muscle tone",
+        "Short stature",
+    ]
+    assert selected("asthma", 2, hybrid_search=True) == [
+        "Low muscle tone",
+        "Short stature",
+        "Asthma",
+    ]
+    assert selected("asthma", 10, hybrid_search=True) == [
+        "Low muscle tone",
+        "Short stature",
+        "Leg pain",
+    ]
+
+
+@pytest.mark.parametrize("initial_amount_to_search", [1, 3, 8, 1000])
+def test_adaptive_search_matches_full_search(
+    retriever, search_params, initial_amount_to_search
+):
+    phrases = ["muscle hypotonia", "leg pain", "short stature", "nonsense words", ""]
+    params = {**search_params, "min_candidates": 3, "max_candidates": 4}
+    full = retriever.get_candidates_batch(phrases, **params)
+
+    assert (
+        retriever.get_candidates_batch(
+            phrases, **params, initial_amount_to_search=initial_amount_to_search
+        )
+        == full
+    )
+    assert [
+        retriever.get_candidates(
+            phrase, **params, initial_amount_to_search=initial_amount_to_search
+        )
+        for phrase in phrases
+    ] == full
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat", "ivf_pq"])
+def test_adaptive_search_matches_full_search_with_ties(
+    mini_rag_data, tmp_path, index_type
+):
+    # Each embedding repeated under several HPO IDs, as when terms share a synonym.
+    emb = np.repeat(np.load(mini_rag_data["embedded_hpo_path"])["emb"], 25, axis=0)
+    np.savez(tmp_path / "tied.npz", emb=emb)
+    with open(tmp_path / "tied_meta.json", "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "entries": [
+                    {"hp_id": f"HP:{row:07d}", "info": "tied", "direction": "label"}
+                    for row in range(len(emb))
+                ]
+            },
+            f,
+        )
+    retriever = HpoCandidateRetriever(
+        embedded_hpo_path=str(tmp_path / "tied.npz"),
+        embedding_metadata_path=str(tmp_path / "tied_meta.json"),
+        embedding_model_path=mini_rag_data["embedding_model_path"],
+        index_config=FaissIndexConfig(index_type=index_type, nprobe=4, pq_m=4),
+    )
+    phrases = ["muscle hypotonia", "leg pain", "short stature", "low muscle tone"]
+    params = {
+        "amount_to_search": 500,
+        "min_candidates": 3,
+        "max_candidates": 5,
+        "similarity_threshold": 0.0,
+        "hybrid_search": False,
+    }
+    full = retriever.get_candidates_batch(phrases, **params)
+
+    for initial_amount_to_search in [1, 3, 8]:
+        assert (
+            retriever.get_candidates_batch(
+                phrases, **params, initial_amount_to_search=initial_amount_to_search
+            )
+            == full
+        )
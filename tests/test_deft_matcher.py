@@ -1,3 +1,7 @@
+import json
+import logging
+import pstats
+
 import hpotk
 import pytest
 import pandas as pd
@@ -6,13 +10,22 @@ import os
 from hpotk import OntologyType
 
 from deft_matcher.ambiguity_resolvers.choose_first_resolver import ChooseFirstResolver
+from deft_matcher.checkpoint import Checkpoint, CheckpointConfig
+from deft_matcher.canonicalisers.normalising_canonicaliser import (
+    NormalisingCanonicaliser,
+)
 from deft_matcher.decisive_matcher import DecisiveMatcher
 from deft_matcher.deft_matcher import DeftMatcher
+from deft_matcher.match_cache import SQLiteMatchCache
+from deft_matcher.matcher import Matcher
 from deft_matcher.matchers.exact_matcher import ExactMatcher
 from deft_matcher.matchers.fast_hpo_cr_matcher import FastHPOCRMatcher
 from deft_matcher.matchers.fast_mondo_cr_matcher import FastMONDOCRMatcher
 from deft_matcher.matchers.rag_hpo_matcher.rag_hpo_matcher import RagHpoMatcher
 from deft_matcher.matchers.synonym_matcher import SynonymMatcher
+from deft_matcher.profiling import ProfileConfig
+from deft_matcher.results_store import SQLiteResultsStore
+from deft_matcher.run_logging import LogConfig
 
 
 @pytest.fixture
@@ -163,3 +176,677 @@ def test_deft_matcher_conditions_col(
     )
 
     conditions_normaliser.run()
+
+
+class CountingMatcher(Matcher):
+    """Matches every free text to HP:0000001 and records the size of each batch."""
+
+    def __init__(self) -> None:
+        self.batch_sizes: list[int] = []
+
+    @property
+    def name(self) -> str:
+        return "CountingMatcher"
+
+    def get_matches(self, free_text: str) -> list[str]:
+        return ["HP:0000001"]
+
+    def get_matches_batch(self, free_texts: list[str]) -> list[list[str]]:
+        self.batch_sizes.append(len(free_texts))
+        return super().get_matches_batch(free_texts)
+
+
+def test_deft_matcher_feeds_matcher_in_batches(tmp_path, monkeypatch, choose_first):
+    monkeypatch.chdir(tmp_path)
+    counting_matcher = CountingMatcher()
+
+    deft_matcher = DeftMatcher(
+        decisive_matchers=[
+            DecisiveMatcher(matcher=counting_matcher, ambiguity_resolver=choose_first)
+        ],
+        free_texts={f"text {i}" for i in range(25)},
+        data_name="BATCHES",
+        batch_size=10,
+    )
+    deft_matcher.run()
+
+    assert counting_matcher.batch_sizes == [10, 10, 5]
+    assert len(deft_matcher.matched) == 25
+    assert deft_matcher.unmatched == set()
+
+
+def test_deft_matcher_mini_hpo(tmp_path, monkeypatch, mini_hpo, choose_first):
+    monkeypatch.chdir(tmp_path)
+
+    deft_matcher = DeftMatcher(
+        decisive_matchers=[
+            DecisiveMatcher(
+                matcher=ExactMatcher(mini_hpo), ambiguity_resolver=choose_first
+            ),
+            DecisiveMatcher(
+                matcher=SynonymMatcher(mini_hpo), ambiguity_resolver=choose_first
+            ),
+        ],
+        free_texts={"Asthma", "low muscle tone", "my leg hurts"},
+        data_name="MINI",
+        batch_size=2,
+    )
+    deft_matcher.run()
+
+    assert deft_matcher.matched == {
+        "Asthma": "HP:0002099",
+        "low muscle tone": "HP:0001252",
+    }
+    assert deft_matcher.unmatched == {"my leg hurts"}
+
+
+def test_deft_matcher_rejects_bad_batch_size(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    with pytest.raises(ValueError):
+        DeftMatcher(decisive_matchers=[], free_texts=set(), data_name="", batch_size=0)
+
+
+@pytest.mark.parametrize("executor_type", ["thread", "process"])
+def test_deft_matcher_worker_pool(
+    tmp_path, monkeypatch, mini_hpo, choose_first, executor_type
+):
+    monkeypatch.chdir(tmp_path)
+    free_texts = {"Asthma", "Seizure", "Hypotonia", "Small head", "ASD", "Osthma"}
+
+    deft_matcher = DeftMatcher(
+        decisive_matchers=[
+            DecisiveMatcher(
+                matcher=ExactMatcher(mini_hpo),
+                ambiguity_resolver=choose_first,
+                executor_type=executor_type,
+                n_workers=3,
+            )
+        ],
+        free_texts=free_texts,
+        data_name="POOL",
+    )
+    deft_matcher.run()
+
+    assert deft_matcher.matched == {
+        "Asthma": "HP:0002099",
+        "Seizure": "HP:0001250",
+        "Hypotonia": "HP:0001252",
+    }
+    assert deft_matcher.unmatched == {"Small head", "ASD", "Osthma"}
+
+
+def test_deft_matcher_match_cache(tmp_path, monkeypatch, choose_first):
+    monkeypatch.chdir(tmp_path)
+    free_texts = {f"text {i}" for i in range(5)}
+
+    def run(counting_matcher: CountingMatcher, match_cache: SQLiteMatchCache):
+        deft_matcher = DeftMatcher(
+            decisive_matchers=[
+                DecisiveMatcher(
+                    matcher=counting_matcher, ambiguity_resolver=choose_first
+                )
+            ],
+            free_texts=set(free_texts),
+            data_name="CACHED",
+            match_cache=match_cache,
+        )
+        deft_matcher.run()
+        return deft_matcher
+
+    match_cache = SQLiteMatchCache(tmp_path / "matches.sqlite")
+    first_matcher = CountingMatcher()
+    run(first_matcher, match_cache)
+
+    free_texts.add("text 5")
+    second_matcher = CountingMatcher()
+    second_run = run(second_matcher, match_cache)
+
+    assert first_matcher.batch_sizes == [5]
+    assert second_matcher.batch_sizes == [1]
+    assert len(second_run.matched) == 6
+    assert (match_cache.hits, match_cache.misses) == (5, 6)
+    match_cache.close()
+
+
+def test_deft_matcher_match_cache_keeps_texts_apart(
+    tmp_path, monkeypatch, mini_hpo, choose_first
+):
+    monkeypatch.chdir(tmp_path)
+    match_cache = SQLiteMatchCache(tmp_path / "matches.sqlite")
+
+    def run(free_texts: set[str]) -> DeftMatcher:
+        deft_matcher = DeftMatcher(
+            decisive_matchers=[
+                DecisiveMatcher(
+                    matcher=ExactMatcher(mini_hpo), ambiguity_resolver=choose_first
+                )
+            ],
+            free_texts=free_texts,
+            data_name="CACHED",
+            match_cache=match_cache,
+        )
+        deft_matcher.run()
+        return deft_matcher
+
+    assert run({"asthma", "asthma  "}).matched == {"asthma": "HP:0002099"}
+    assert run({"asthma"}).matched == {"asthma": "HP:0002099"}
+    match_cache.close()
+
+
+def test_deft_matcher_canonicaliser(tmp_path, monkeypatch, mini_hpo, choose_first):
+    monkeypatch.chdir(tmp_path)
+    counting_matcher = CountingMatcher()
+    free_texts = {"Asthma", "asthma.", " ASTHMA ", "Seizure", "seizure", "leg pain"}
+
+    deft_matcher = DeftMatcher(
+        decisive_matchers=[
+            DecisiveMatcher(
+                matcher=ExactMatcher(mini_hpo), ambiguity_resolver=choose_first
+            ),
+            DecisiveMatcher(matcher=counting_matcher, ambiguity_resolver=choose_first),
+        ],
+        free_texts=free_texts,
+        data_name="CANONICAL",
+        canonicaliser=NormalisingCanonicaliser(),
+    )
+    deft_matcher.run()
+
+    assert deft_matcher.matched == {
+        "Asthma": "HP:0002099",
+        "asthma.": "HP:0002099",
+        " ASTHMA ": "HP:0002099",
+        "Seizure": "HP:0001250",
+        "seizure": "HP:0001250",
+        "leg pain": "HP:0000001",
+    }
+    assert counting_matcher.batch_sizes == [1]
+    assert deft_matcher.saved_matcher_calls_by_matcher == {
+        "ExactMatcher(HP)": 3,
+        "CountingMatcher": 0,
+    }
+    assert deft_matcher.saved_matcher_calls == 3
+
+
+def test_deft_matcher_canonicaliser_tries_other_members(
+    tmp_path, monkeypatch, mini_hpo, choose_first
+):
+    monkeypatch.chdir(tmp_path)
+    counting_matcher = CountingMatcher()
+    free_texts = {
+        "Short-stature",
+        "short stature",  # Its own canonical form, so tried first
+        "SHORT-STATURE",
+        "Asthma",  # Tried after "ASTHMA!", which exact matching misses
+        "ASTHMA!",
+        "Leg-ache",
+        "leg ache!",
+    }
+
+    deft_matcher = DeftMatcher(
+        decisive_matchers=[
+            DecisiveMatcher(
+                matcher=ExactMatcher(mini_hpo), ambiguity_resolver=choose_first
+            ),
+            DecisiveMatcher(matcher=counting_matcher, ambiguity_resolver=choose_first),
+        ],
+        free_texts=free_texts,
+        data_name="CANONICAL",
+        canonicaliser=NormalisingCanonicaliser(),
+    )
+    deft_matcher.run()
+
+    assert deft_matcher.equivalence_classes["short stature"][0] == "short stature"
+    assert deft_matcher.matched == {
+        "Short-stature": "HP:0004322",
+        "short stature": "HP:0004322",
+        "SHORT-STATURE": "HP:0004322",
+        "Asthma": "HP:0002099",
+        "ASTHMA!": "HP:0002099",
+        "Leg-ache": "HP:0000001",
+        "leg ache!": "HP:0000001",
+    }
+    assert counting_matcher.batch_sizes == [1]
+    # The asthma and leg ache classes each had a second member sent.
+    assert deft_matcher.saved_matcher_calls_by_matcher == {
+        "ExactMatcher(HP)": 2,
+        "CountingMatcher": 1,
+    }
+
+
+def test_deft_matcher_stream(tmp_path, monkeypatch, mini_hpo, choose_first):
+    monkeypatch.chdir(tmp_path)
+    free_texts = [
+        "Asthma",
+        "Osthma",
+        "Seizure",
+        "ASD",
+        "Asthma",
+        "leg pain",
+        "Small head",
+    ]
+    pulled: list[str] = []
+
+    def free_text_source():
+        for free_text in free_texts:
+            pulled.append(free_text)
+            yield free_text
+
+    deft_matcher = DeftMatcher(
+        decisive_matchers=[
+            DecisiveMatcher(
+                matcher=ExactMatcher(mini_hpo), ambiguity_resolver=choose_first
+            ),
+            DecisiveMatcher(
+                matcher=SynonymMatcher(mini_hpo), ambiguity_resolver=choose_first
+            ),
+        ],
+        free_texts=set(),
+        data_name="STREAM",
+    )
+    results = deft_matcher.stream(free_text_source(), chunk_size=3)
+
+    assert next(results) == ("Asthma", "HP:0002099")
+    assert len(pulled) == 3
+    assert list(results) == [
+        ("Osthma", None),
+        ("Seizure", "HP:0001250"),
+        ("ASD", "HP:0000729"),
+        ("Asthma", "HP:0002099"),
+        ("leg pain", "HP:0012514"),
+        ("Small head", "HP:0000252"),
+    ]
+    assert deft_matcher.matched == {}
+    with pytest.raises(ValueError):
+        next(deft_matcher.stream(free_texts, chunk_size=0))
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_deft_matcher_structured_logging(
+    tmp_path, mini_hpo, choose_first, asynchronous
+):
+    root_handlers = list(logging.getLogger().handlers)
+
+    deft_matcher = DeftMatcher(
+        decisive_matchers=[
+            DecisiveMatcher(
+                matcher=ExactMatcher(mini_hpo), ambiguity_resolver=choose_first
+            )
+        ],
+        free_texts={"Asthma", "Osthma"},
+        data_name="STRUCTURED",
+        log_config=LogConfig(
+            structured=True, asynchronous=asynchronous, log_dir=str(tmp_path)
+        ),
+    )
+    deft_matcher.run()
+    deft_matcher.close()
+
+    (log_file,) = tmp_path.glob("*.jsonl")
+    records = [json.loads(line) for line in log_file.read_text().splitlines()]
+    per_text = {
+        record["free_text"]: record.get("match")
+        for record in records
+        if record.get("event") in ("matched", "unresolved")
+    }
+    assert per_text == {"Asthma": "HP:0002099", "Osthma": None}
+    assert logging.getLogger().handlers == root_handlers
+
+
+def test_deft_matcher_runs_with_same_data_name_log_separately(
+    tmp_path, mini_hpo, choose_first
+):
+    def deft_matcher(log_dir: str) -> DeftMatcher:
+        return DeftMatcher(
+            decisive_matchers=[
+                DecisiveMatcher(
+                    matcher=ExactMatcher(mini_hpo), ambiguity_resolver=choose_first
+                )
+            ],
+            free_texts={"Asthma"},
+            data_name="SHARED",
+            log_config=LogConfig(structured=True, log_dir=log_dir),
+        )
+
+    first = deft_matcher(str(tmp_path / "first"))
+    second = deft_matcher(str(tmp_path / "second"))
+    second.run()
+    first.close()
+    second.close()
+
+    (first_log,) = (tmp_path / "first").glob("*.jsonl")
+    (second_log,) = (tmp_path / "second").glob("*.jsonl")
+    second_events = [
+        json.loads(line).get("event") for line in second_log.read_text().splitlines()
+    ]
+    assert len(first_log.read_text().splitlines()) == 1
+    assert second_events.count("matched") == 1
+
+
+def test_deft_matcher_per_text_logging_off(tmp_path, mini_hpo, choose_first):
+    deft_matcher = DeftMatcher(
+        decisive_matchers=[
+            DecisiveMatcher(
+                matcher=ExactMatcher(mini_hpo), ambiguity_resolver=choose_first
+            )
+        ],
+        free_texts={"Asthma", "Osthma"},
+        data_name="QUIET",
+        log_config=LogConfig(per_text="off", log_dir=str(tmp_path)),
+    )
+    deft_matcher.run()
+    deft_matcher.close()
+
+    (log_file,) = tmp_path.glob("*.log")
+    log_text = log_file.read_text()
+    assert "was matched to" not in log_text
+    assert "1 string was matched" in log_text
+
+
+def test_log_config_rejects_bad_sample_rate():
+    with pytest.raises(ValueError):
+        LogConfig(per_text="sampled", sample_rate=2.0)
+
+
+def test_deft_matcher_profile(tmp_path, mini_hpo, choose_first):
+    deft_matcher = DeftMatcher(
+        decisive_matchers=[
+            DecisiveMatcher(
+                matcher=ExactMatcher(mini_hpo), ambiguity_resolver=choose_first
+            ),
+            DecisiveMatcher(
+                matcher=SynonymMatcher(mini_hpo), ambiguity_resolver=choose_first
+            ),
+        ],
+        free_texts={"Asthma", "Seizure", "ASD", "Osthma"},
+        data_name="PROFILED",
+        log_config=LogConfig(log_dir=None),
+    )
+    deft_matcher.run(profile=ProfileConfig(output_dir=str(tmp_path), top_n=2))
+
+    assert deft_matcher.matched == {
+        "Asthma": "HP:0002099",
+        "Seizure": "HP:0001250",
+        "ASD": "HP:0000729",
+    }
+    profile_paths = sorted(tmp_path.glob("*.prof"))
+    assert [path.name for path in profile_paths] == [
+        "000_ExactMatcher_HP.prof",
+        "001_SynonymMatcher_HP.prof",
+    ]
+    assert pstats.Stats(str(profile_paths[0])).total_calls > 0
+
+    with open(tmp_path / "slowest_texts.json") as f:
+        slowest_texts = json.load(f)
+    assert len(slowest_texts["ExactMatcher(HP)"]) == 2
+    assert {entry["free_text"] for entry in slowest_texts["SynonymMatcher(HP)"]} == {
+        "ASD",
+        "Osthma",
+    }
+
+
+class PreemptedMatcher(CountingMatcher):
+    """A CountingMatcher which dies on its fail_on_batch-th batch, as if preempted."""
+
+    def __init__(self, fail_on_batch: int) -> None:
+        super().__init__()
+        self.fail_on_batch = fail_on_batch
+
+    def get_matches_batch(self, free_texts: list[str]) -> list[list[str]]:
+        if len(self.batch_sizes) + 1 == self.fail_on_batch:
+            raise RuntimeError("Preempted!")
+        return super().get_matches_batch(free_texts)
+
+
+def test_deft_matcher_resumes_from_checkpoint(tmp_path, mini_hpo, choose_first):
+    free_texts = {"Asthma", "Seizure", "Hypotonia", *(f"text {i}" for i in range(6))}
+    checkpoint_config = CheckpointConfig(
+        path=str(tmp_path / "checkpoint.json"), every_n_texts=2
+    )
+
+    def deft_matcher(matcher: Matcher) -> DeftMatcher:
+        return DeftMatcher(
+            decisive_matchers=[
+                DecisiveMatcher(
+                    matcher=ExactMatcher(mini_hpo), ambiguity_resolver=choose_first
+                ),
+                DecisiveMatcher(matcher=matcher, ambiguity_resolver=choose_first),
+            ],
+            free_texts=set(free_texts),
+            data_name="CHECKPOINTED",
+            batch_size=2,
+            log_config=LogConfig(log_dir=None),
+            checkpoint_config=checkpoint_config,
+        )
+
+    preempted_matcher = PreemptedMatcher(fail_on_batch=2)
+    with pytest.raises(RuntimeError):
+        deft_matcher(preempted_matcher).run()
+
+    counting_matcher = CountingMatcher()
+    resumed = deft_matcher(counting_matcher)
+    assert resumed.next_index == 1
+    resumed.run()
+
+    assert preempted_matcher.batch_sizes == [2]
+    assert counting_matcher.batch_sizes == [2, 2]
+    assert resumed.matched == {
+        "Asthma": "HP:0002099",
+        "Seizure": "HP:0001250",
+        "Hypotonia": "HP:0001252",
+        **{f"text {i}": "HP:0000001" for i in range(6)},
+    }
+    assert resumed.unmatched == set()
+    assert Checkpoint.load(checkpoint_config.path).next_index == 2
+
+
+def test_deft_matcher_journals_only_new_progress(tmp_path, mini_hpo, choose_first):
+    free_texts = {"Asthma", *(f"text {i}" for i in range(6))}
+    checkpoint_config = CheckpointConfig(
+        path=str(tmp_path / "checkpoint.json"), every_n_texts=2
+    )
+    journal_path = tmp_path / "checkpoint.json.journal"
+
+    def deft_matcher(matcher: Matcher) -> DeftMatcher:
+        return DeftMatcher(
+            decisive_matchers=[
+                DecisiveMatcher(
+                    matcher=ExactMatcher(mini_hpo), ambiguity_resolver=choose_first
+                ),
+                DecisiveMatcher(matcher=matcher, ambiguity_resolver=choose_first),
+            ],
+            free_texts=set(free_texts),
+            data_name="JOURNALLED",
+            batch_size=2,
+            log_config=LogConfig(log_dir=None),
+            checkpoint_config=checkpoint_config,
+        )
+
+    with pytest.raises(RuntimeError):
+        deft_matcher(PreemptedMatcher(fail_on_batch=3)).run()
+
+    with open(checkpoint_config.path) as f:
+        snapshot = json.load(f)
+    assert snapshot["next_index"] == 1
+    assert snapshot["stage_done"] == []
+    entries = [json.loads(line) for line in journal_path.read_text().splitlines()]
+    assert [entry["stage_done"] for entry in entries] == [
+        ["text 0", "text 1"],
+        ["text 2", "text 3"],
+    ]
+    assert [entry["matched"] for entry in entries] == [
+        {"text 0": "HP:0000001", "text 1": "HP:0000001"},
+        {"text 2": "HP:0000001", "text 3": "HP:0000001"},
+    ]
+
+    # A crash part way through appending leaves a torn last entry.
+    with open(journal_path, "a", encoding="utf-8") as f:
+        f.write('{"next_index": 1, "matched": {"text 4"')
+
+    counting_matcher = CountingMatcher()
+    resumed = deft_matcher(counting_matcher)
+    assert not journal_path.exists()
+    assert Checkpoint.load(checkpoint_config.path).stage_done == [
+        f"text {i}" for i in range(4)
+    ]
+    resumed.run()
+
+    assert counting_matcher.batch_sizes == [2]
+    assert resumed.matched == {
+        "Asthma": "HP:0002099",
+        **{f"text {i}": "HP:0000001" for i in range(6)},
+    }
+
+
+def test_deft_matcher_refuses_mismatched_checkpoint(tmp_path, mini_hpo, choose_first):
+    checkpoint_config = CheckpointConfig(path=str(tmp_path / "checkpoint.json"))
+
+    def deft_matcher(matchers: list[Matcher], free_texts: set[str]) -> DeftMatcher:
+        return DeftMatcher(
+            decisive_matchers=[
+                DecisiveMatcher(matcher=matcher, ambiguity_resolver=choose_first)
+                for matcher in matchers
+            ],
+            free_texts=free_texts,
+            data_name="CHECKPOINTED",
+            log_config=LogConfig(log_dir=None),
+            checkpoint_config=checkpoint_config,
+        )
+
+    deft_matcher([ExactMatcher(mini_hpo)], {"Asthma", "ASD"}).run()
+
+    with pytest.raises(ValueError):
+        deft_matcher([SynonymMatcher(mini_hpo)], {"Asthma", "ASD"})
+    with pytest.raises(ValueError):
+        deft_matcher([ExactMatcher(mini_hpo)], {"Asthma", "ASD", "Seizure"})
+    assert deft_matcher([ExactMatcher(mini_hpo)], {"ASD", "Asthma"}).matched == {
+        "Asthma": "HP:0002099"
+    }
+
+
+def test_deft_matcher_refuses_checkpoint_of_other_canonicaliser_options(
+    tmp_path, mini_hpo, choose_first
+):
+    checkpoint_config = CheckpointConfig(path=str(tmp_path / "checkpoint.json"))
+
+    def deft_matcher(canonicaliser: NormalisingCanonicaliser) -> DeftMatcher:
+        return DeftMatcher(
+            decisive_matchers=[
+                DecisiveMatcher(
+                    matcher=ExactMatcher(mini_hpo), ambiguity_resolver=choose_first
+                )
+            ],
+            free_texts={"Asthma", "ASTHMA."},
+            data_name="CHECKPOINTED",
+            log_config=LogConfig(log_dir=None),
+            canonicaliser=canonicaliser,
+            checkpoint_config=checkpoint_config,
+        )
+
+    first_run = deft_matcher(NormalisingCanonicaliser(lowercase=False))
+    first_run.run()
+
+    with pytest.raises(ValueError):
+        deft_matcher(NormalisingCanonicaliser())
+    resumed = deft_matcher(NormalisingCanonicaliser(lowercase=False))
+    assert resumed.matched == first_run.matched
+
+
+class LookupMatcher(Matcher):
+    """Matches free texts found in a table, and records every free text it is sent."""
+
+    def __init__(self, name: str, table: dict[str, str], version: str) -> None:
+        self._name = name
+        self.table = table
+        self._version = version
+        self.sent: list[str] = []
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def version(self) -> str | None:
+        return self._version
+
+    def get_matches(self, free_text: str) -> list[str]:
+        self.sent.append(free_text)
+        return [self.table[free_text]] if free_text in self.table else []
+
+
+def test_deft_matcher_incremental(tmp_path, choose_first):
+    results_store = SQLiteResultsStore(tmp_path / "results.sqlite")
+
+    def run(
+        free_texts: set[str], second_version: str
+    ) -> tuple[DeftMatcher, LookupMatcher, LookupMatcher]:
+        first = LookupMatcher("First", {"a": "HP:1", "d": "HP:4"}, "v1")
+        second = LookupMatcher("Second", {"b": "HP:2", "c": "HP:3"}, second_version)
+        deft_matcher = DeftMatcher(
+            decisive_matchers=[
+                DecisiveMatcher(matcher=first, ambiguity_resolver=choose_first),
+                DecisiveMatcher(matcher=second, ambiguity_resolver=choose_first),
+            ],
+            free_texts=free_texts,
+            data_name="INCREMENTAL",
+            log_config=LogConfig(log_dir=None),
+            results_store=results_store,
+        )
+        deft_matcher.run()
+        return deft_matcher, first, second
+
+    run({"a", "b", "x"}, second_version="v1")
+
+    deft_matcher, first, second = run({"a", "b", "x", "c", "d"}, second_version="v1")
+    assert sorted(first.sent) == ["c", "d"]
+    assert second.sent == ["c"]
+    assert deft_matcher.reused == {"a", "b", "x"}
+    assert deft_matcher.matched == {"a": "HP:1", "b": "HP:2", "c": "HP:3", "d": "HP:4"}
+    assert deft_matcher.unmatched == {"x"}
+
+    # Only what the second stage decided, or left unmatched, depends on its version.
+    deft_matcher, first, second = run({"a", "b", "x", "c", "d"}, second_version="v2")
+    assert sorted(first.sent) == ["b", "c", "x"]
+    assert sorted(second.sent) == ["b", "c", "x"]
+    assert deft_matcher.reused == {"a", "d"}
+    assert deft_matcher.matched == {"a": "HP:1", "b": "HP:2", "c": "HP:3", "d": "HP:4"}
+
+    records = {record.free_text: record for record in results_store.records()}
+    assert (records["b"].matcher_name, records["b"].matcher_version) == ("Second", "v2")
+    assert (records["a"].matcher_name, records["a"].matcher_version) == ("First", "v1")
+    assert records["x"].match is None
+    results_store.close()
+
+
+def test_deft_matcher_incremental_canonicaliser(tmp_path, mini_hpo, choose_first):
+    results_store = SQLiteResultsStore(tmp_path / "results.sqlite")
+
+    def run(
+        free_texts: set[str], canonicaliser: NormalisingCanonicaliser | None
+    ) -> DeftMatcher:
+        deft_matcher = DeftMatcher(
+            decisive_matchers=[
+                DecisiveMatcher(
+                    matcher=ExactMatcher(mini_hpo), ambiguity_resolver=choose_first
+                )
+            ],
+            free_texts=free_texts,
+            data_name="INCREMENTAL",
+            log_config=LogConfig(log_dir=None),
+            canonicaliser=canonicaliser,
+            results_store=results_store,
+        )
+        deft_matcher.run()
+        return deft_matcher
+
+    # "asthma." is only matched as a member of the class of "Asthma".
+    assert run({"Asthma", "asthma."}, NormalisingCanonicaliser()).matched == {
+        "Asthma": "HP:0002099",
+        "asthma.": "HP:0002099",
+    }
+    assert run({"asthma."}, NormalisingCanonicaliser()).reused == {"asthma."}
+
+    without_canonicaliser = run({"asthma."}, None)
+    assert without_canonicaliser.reused == set()
+    assert without_canonicaliser.matched == {}
+    results_store.close()
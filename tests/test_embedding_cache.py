@@ -0,0 +1,151 @@
+import numpy as np
+import pytest
+
+from deft_matcher.matchers.rag_hpo_matcher.candidate_retriever import (
+    HpoCandidateRetriever,
+)
+from deft_matcher.matchers.rag_hpo_matcher.embedding_cache import (
+    EmbeddingCache,
+    EmbeddingStore,
+    embedding_model_key,
+)
+
+
+def _unit_rows(n: int, dim: int = 4) -> np.ndarray:
+    rows = np.random.default_rng(0).standard_normal((n, dim)).astype(np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+def test_embedding_cache_evicts_least_recently_used():
+    cache = EmbeddingCache(max_entries=2)
+    vecs = _unit_rows(3)
+
+    cache.put_many(["a", "b"], vecs[:2])
+    cache.get_many(["a"])
+    cache.put_many(["c"], vecs[2:])
+
+    found = cache.get_many(["a", "b", "c"])
+    assert [embedding is None for embedding in found] == [False, True, False]
+    np.testing.assert_array_equal(found[0], vecs[0])
+    assert cache.stats == {"hits": 3, "store_hits": 0, "misses": 1, "hit_rate": 0.75}
+    assert len(cache) == 2
+
+
+def test_embedding_cache_with_a_store_returns_what_the_store_does(tmp_path):
+    vecs = _unit_rows(2)
+    store = EmbeddingStore(tmp_path / "store", "model", dim=4)
+    cache = EmbeddingCache(max_entries=2, store=store)
+
+    put = cache.put_many(["a", "b"], vecs)
+    remembered = cache.get_many(["a", "b"])
+    stored = EmbeddingCache(max_entries=2, store=store).get_many(["a", "b"])
+
+    np.testing.assert_array_equal(put, np.stack(remembered))
+    np.testing.assert_array_equal(put, np.stack(stored))
+    assert not np.array_equal(put, vecs)
+    np.testing.assert_array_equal(
+        EmbeddingCache(max_entries=2).put_many(["a"], vecs), vecs
+    )
+
+
+def test_embedding_store_is_shared_and_reopened(tmp_path):
+    vecs = _unit_rows(3)
+    store = EmbeddingStore(tmp_path / "store", "model", dim=4)
+    store.put_many(["a", "b"], vecs[:2])
+    EmbeddingStore(tmp_path / "store", "model", dim=4).put_many(["c"], vecs[2:])
+
+    reopened = EmbeddingStore(tmp_path / "store", "model", dim=4)
+    found = reopened.get_many(["a", "b", "c", "d"])
+
+    assert len(reopened) == 3
+    assert found[3] is None
+    np.testing.assert_allclose(np.stack(found[:3]), vecs, atol=1e-3)
+    np.testing.assert_allclose(np.linalg.norm(np.stack(found[:3]), axis=1), 1.0)
+
+    with pytest.raises(ValueError):
+        EmbeddingStore(tmp_path / "store", "another model", dim=4)
+    with pytest.raises(ValueError):
+        EmbeddingStore(tmp_path / "store", "model", dim=8)
+
+
+def test_embedding_store_recovers_from_a_cut_short_append(tmp_path):
+    vecs = _unit_rows(2)
+    store = EmbeddingStore(tmp_path / "store", "model", dim=4)
+    store.put_many(["a"], vecs[:1])
+    with open(tmp_path / "store" / "embeddings.f16", "ab") as f:
+        f.write(b"\0\0\0")
+    with open(tmp_path / "store" / "index.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"phrase": "lost", "ro')
+
+    reopened = EmbeddingStore(tmp_path / "store", "model", dim=4)
+    reopened.put_many(["b"], vecs[1:])
+
+    found = EmbeddingStore(tmp_path / "store", "model", dim=4).get_many(["a", "b"])
+    np.testing.assert_allclose(np.stack(found), vecs, atol=1e-3)
+
+
+def test_embedding_model_key_follows_model_files(tmp_path):
+    (tmp_path / "model").mkdir()
+    (tmp_path / "model" / "weights.bin").write_bytes(b"1")
+    key = embedding_model_key(str(tmp_path / "model"))
+
+    assert embedding_model_key(str(tmp_path / "model")) == key
+    (tmp_path / "model" / "weights.bin").write_bytes(b"22")
+    assert embedding_model_key(str(tmp_path / "model")) != key
+    assert embedding_model_key("some/hub-model") != key
+
+
+def test_retriever_query_cache(mini_rag_data, tmp_path):
+    phrases = ["muscle hypotonia", "leg pain", "muscle hypotonia", "short stature"]
+    search_params = {
+        "amount_to_search": 500,
+        "min_candidates": 2,
+        "max_candidates": 5,
+        "similarity_threshold": 0.35,
+        "hybrid_search": True,
+    }
+    expected = HpoCandidateRetriever(**mini_rag_data).get_candidates_batch(
+        phrases, **search_params
+    )
+
+    retriever = HpoCandidateRetriever(**mini_rag_data, query_cache_size=10)
+    assert retriever.get_candidates_batch(phrases, **search_params) == expected
+    assert retriever.get_candidates("leg pain", **search_params) == expected[1]
+    assert retriever.query_cache.stats["hits"] == 1
+    assert retriever.query_cache.stats["misses"] == 4
+
+    stored = HpoCandidateRetriever(**mini_rag_data, query_cache_dir=str(tmp_path))
+    stored.get_candidates_batch(phrases, **search_params)
+    rerun = HpoCandidateRetriever(**mini_rag_data, query_cache_dir=str(tmp_path))
+    rerun_candidates = rerun.get_candidates_batch(phrases, **search_params)
+
+    assert rerun_candidates == stored.get_candidates_batch(phrases, **search_params)
+    assert rerun.query_cache.stats["store_hits"] == 4
+    assert rerun.query_cache.stats["misses"] == 0
+    assert [
+        [candidate["hpo_id"] for candidate in candidates]
+        for candidates in rerun_candidates
+    ] == [[candidate["hpo_id"] for candidate in candidates] for candidates in expected]
+
+
+def test_retriever_query_store_cold_and_warm_lookups_agree(mini_rag_data, tmp_path):
+    phrases = ["muscle hypotonia", "leg pain", "short stature"]
+    search_params = {
+        "amount_to_search": 500,
+        "min_candidates": 2,
+        "max_candidates": 5,
+        "similarity_threshold": 0.0,
+        "hybrid_search": False,
+    }
+    retriever = HpoCandidateRetriever(
+        **mini_rag_data, query_cache_size=10, query_cache_dir=str(tmp_path)
+    )
+    cold = retriever.get_candidates_batch(phrases, **search_params)
+    from_memory = retriever.get_candidates_batch(phrases, **search_params)
+    from_store = HpoCandidateRetriever(
+        **mini_rag_data, query_cache_dir=str(tmp_path)
+    ).get_candidates_batch(phrases, **search_params)
+
+    assert retriever.query_cache.stats["hits"] == 3
+    assert from_memory == cold
+    assert from_store == cold
@@ -0,0 +1,110 @@
+import json
+
+import numpy as np
+
+from deft_matcher.matchers.rag_hpo_matcher.candidate_retriever import (
+    HpoCandidateRetriever,
+)
+from deft_matcher.matchers.rag_hpo_matcher.embedding_metadata import (
+    EmbeddingMetadata,
+    load_embedding_metadata,
+)
+
+
+def test_save_and_load(tmp_path):
+    entries = [
+        {"hp_id": "HP:0001252", "info": "Hypotonia"},
+        {"hp_id": "HP:0001252", "info": "Muscle hypotonia"},
+        {"hp_id": "HP:0004322", "info": "Short stature"},
+        {"hp_id": "HP:0004322", "info": "Größe vermindert"},
+        {"hp_id": "HP:0000001", "info": ""},
+    ]
+    metadata = EmbeddingMetadata.from_entries(entries)
+    metadata.save(tmp_path / "metadata")
+
+    loaded = EmbeddingMetadata.load(tmp_path / "metadata")
+
+    assert isinstance(loaded.hpo_id_codes, np.memmap)
+    assert len(loaded) == len(entries)
+    assert [loaded.hpo_id(row) for row in range(len(loaded))] == [
+        entry["hp_id"] for entry in entries
+    ]
+    assert [loaded.info(row) for row in range(len(loaded))] == [
+        entry["info"] for entry in entries
+    ]
+    assert loaded.hpo_id_codes.tolist() == [0, 0, 1, 1, 2]
+
+
+def test_json_metadata_is_converted_once(mini_rag_data, tmp_path):
+    metadata_path = mini_rag_data["embedding_metadata_path"]
+    with open(metadata_path, encoding="utf-8") as f:
+        entries = json.load(f)["entries"]
+
+    load_embedding_metadata(metadata_path, str(tmp_path))
+    (directory,) = tmp_path.iterdir()
+    modified = directory.stat().st_mtime_ns
+    metadata = load_embedding_metadata(metadata_path, str(tmp_path))
+
+    assert directory.stat().st_mtime_ns == modified
+    assert [metadata.hpo_id(row) for row in range(len(metadata))] == [
+        entry["hp_id"] for entry in entries
+    ]
+
+
+def test_retriever_loads_saved_metadata(mini_rag_data, tmp_path):
+    EmbeddingMetadata.from_json(mini_rag_data["embedding_metadata_path"]).save(
+        tmp_path / "metadata"
+    )
+    search_params = {
+        "amount_to_search": 500,
+        "min_candidates": 2,
+        "max_candidates": 5,
+        "similarity_threshold": 0.35,
+        "hybrid_search": True,
+    }
+
+    from_json = HpoCandidateRetriever(**mini_rag_data)
+    from_directory = HpoCandidateRetriever(
+        **{**mini_rag_data, "embedding_metadata_path": str(tmp_path / "metadata")}
+    )
+
+    for phrase in ["muscle hypotonia", "leg pain", "short stature"]:
+        assert from_directory.get_candidates(
+            phrase, **search_params
+        ) == from_json.get_candidates(phrase, **search_params)
+
+
+def test_shares_token(tmp_path):
+    metadata = EmbeddingMetadata.from_entries(
+        [
+            {"hp_id": "HP:0001252", "info": "Hypotonia"},
+            {"hp_id": "HP:0001252", "info": "Low muscle tone"},
+            {"hp_id": "HP:0004322", "info": "Größe vermindert"},
+            {"hp_id": "HP:0000001", "info": ""},
+        ]
+    )
+    metadata.save(tmp_path / "metadata")
+    rows = np.array([3, 2, 1, 0, 1])
+
+    for loaded in [metadata, EmbeddingMetadata.load(tmp_path / "metadata")]:
+        assert loaded.shares_token(
+            rows, loaded.vocabulary_mask("MUSCLE, größe!")
+        ).tolist() == [False, True, True, False, True]
+        assert not loaded.shares_token(rows, loaded.vocabulary_mask("asthma")).any()
+
+    # Directories saved before labels and synonyms were tokenised are tokenised on load.
+    for name in [
+        "token_offsets",
+        "token_codes",
+        "vocabulary_offsets",
+        "vocabulary_bytes",
+    ]:
+        (tmp_path / "metadata" / f"{name}.npy").unlink()
+    legacy = EmbeddingMetadata.load(tmp_path / "metadata")
+    assert legacy.shares_token(rows, legacy.vocabulary_mask("hypotonia")).tolist() == [
+        False,
+        False,
+        False,
+        True,
+        False,
+    ]
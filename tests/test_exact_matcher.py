@@ -47,3 +47,17 @@ def test_exact_matcher_mondo_fail(exact_matcher_mondo):
     marfan_matches = exact_matcher_mondo.get_matches("morfan syndrome")
 
     assert len(marfan_matches) == 0
+
+
+def test_exact_matcher_batch(mini_hpo):
+    exact_matcher = ExactMatcher(mini_hpo)
+
+    assert exact_matcher.get_matches_batch(["ASTHMA", "Osthma", "hypotonia"]) == [
+        ["HP:0002099"],
+        [],
+        ["HP:0001252"],
+    ]
+
+
+def test_exact_matcher_version(mini_hpo):
+    assert ExactMatcher(mini_hpo).version == "2025-11-24"
@@ -0,0 +1,38 @@
+import pytest
+
+from deft_matcher.execution import StageExecutor
+from deft_matcher.matchers.exact_matcher import ExactMatcher
+
+
+@pytest.fixture
+def batches():
+    return [["Asthma", "Osthma"], ["hypotonia"], ["Seizure", "microcephaly", "ASD"]]
+
+
+@pytest.fixture
+def expected_matches():
+    return [
+        [["HP:0002099"], []],
+        [["HP:0001252"]],
+        [["HP:0001250"], ["HP:0000252"], []],
+    ]
+
+
+@pytest.mark.parametrize("executor_type", ["serial", "thread", "process"])
+def test_stage_executor_preserves_batch_order(
+    mini_hpo, batches, expected_matches, executor_type
+):
+    with StageExecutor(
+        ExactMatcher(mini_hpo), executor_type=executor_type, n_workers=2
+    ) as executor:
+        assert list(executor.map_batches(batches)) == expected_matches
+
+
+def test_stage_executor_rejects_unknown_executor(mini_hpo):
+    with pytest.raises(ValueError):
+        StageExecutor(ExactMatcher(mini_hpo), executor_type="cluster")
+
+
+def test_stage_executor_rejects_no_workers(mini_hpo):
+    with pytest.raises(ValueError):
+        StageExecutor(ExactMatcher(mini_hpo), executor_type="thread", n_workers=0)
@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+
+from deft_matcher.matchers.rag_hpo_matcher.candidate_retriever import (
+    HpoCandidateRetriever,
+)
+from deft_matcher.matchers.rag_hpo_matcher.faiss_index import (
+    FaissIndexConfig,
+    build_faiss_index,
+    index_file_path,
+    load_embedding_matrix,
+    load_or_build_faiss_index,
+)
+from deft_matcher.matchers.rag_hpo_matcher.index_benchmark import (
+    benchmark_index_configs,
+)
+
+
+@pytest.fixture(scope="module")
+def clustered_embedding() -> np.ndarray:
+    """Two thousand normalised vectors around fifty centres, enough to train IVF-PQ."""
+    rng = np.random.default_rng(0)
+    centres = rng.normal(size=(50, 32))
+    emb = centres[rng.integers(0, 50, size=2000)] + rng.normal(
+        scale=0.3, size=(2000, 32)
+    )
+    emb = emb.astype(np.float32)
+    emb /= np.linalg.norm(emb, axis=1, keepdims=True)
+    return emb
+
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw", "ivf_flat"])
+def test_stored_index_is_reused(mini_rag_data, tmp_path, index_type):
+    config = FaissIndexConfig(index_type=index_type, ivf_nlist=2, nprobe=2)
+    embedded_hpo_path = mini_rag_data["embedded_hpo_path"]
+
+    built = load_or_build_faiss_index(embedded_hpo_path, config, str(tmp_path))
+    path = index_file_path(embedded_hpo_path, config, str(tmp_path))
+    assert path.exists()
+    modified = path.stat().st_mtime_ns
+
+    reloaded = load_or_build_faiss_index(embedded_hpo_path, config, str(tmp_path))
+    assert path.stat().st_mtime_ns == modified
+    assert reloaded.ntotal == built.ntotal
+
+    queries = load_embedding_matrix(embedded_hpo_path)[:3]
+    assert (built.search(queries, 5)[1] == reloaded.search(queries, 5)[1]).all()
+
+
+def test_search_params_do_not_change_index_file(mini_rag_data, tmp_path):
+    embedded_hpo_path = mini_rag_data["embedded_hpo_path"]
+
+    assert index_file_path(
+        embedded_hpo_path, FaissIndexConfig("hnsw", ef_search=16), str(tmp_path)
+    ) == index_file_path(
+        embedded_hpo_path, FaissIndexConfig("hnsw", ef_search=256), str(tmp_path)
+    )
+    assert index_file_path(
+        embedded_hpo_path, FaissIndexConfig("hnsw", hnsw_m=16), str(tmp_path)
+    ) != index_file_path(
+        embedded_hpo_path, FaissIndexConfig("hnsw", hnsw_m=32), str(tmp_path)
+    )
+
+
+def test_unknown_index_type():
+    with pytest.raises(ValueError):
+        FaissIndexConfig(index_type="lsh").factory_string(100)  # type: ignore[arg-type]
+
+
+def test_approximate_retriever_matches_exact(mini_rag_data, tmp_path):
+    search_params = {
+        "amount_to_search": 500,
+        "min_candidates": 2,
+        "max_candidates": 5,
+        "similarity_threshold": 0.35,
+        "hybrid_search": True,
+    }
+    exact = HpoCandidateRetriever(**mini_rag_data)
+    approximate = HpoCandidateRetriever(
+        **mini_rag_data,
+        index_config=FaissIndexConfig(index_type="hnsw"),
+        index_cache_dir=str(tmp_path),
+    )
+
+    for phrase in ["muscle hypotonia", "leg pain", "short stature"]:
+        assert [
+            c["hpo_id"] for c in approximate.get_candidates(phrase, **search_params)
+        ] == [c["hpo_id"] for c in exact.get_candidates(phrase, **search_params)]
+
+
+def test_benchmark_index_configs(clustered_embedding):
+    configs = [
+        FaissIndexConfig(index_type="hnsw", ef_search=128),
+        FaissIndexConfig(index_type="ivf_flat", nprobe=180),
+        FaissIndexConfig(index_type="ivf_pq", nprobe=180, pq_m=8),
+    ]
+
+    results = benchmark_index_configs(
+        clustered_embedding, clustered_embedding[:50], configs, k=10
+    )
+
+    assert [result["index_type"] for result in results] == [
+        "hnsw",
+        "ivf_flat",
+        "ivf_pq",
+    ]
+    assert results[0]["recall_at_k"] > 0.9
+    assert results[1]["recall_at_k"] == pytest.approx(1.0)
+    assert 0 < results[2]["recall_at_k"] <= 1
+    assert all(result["query_latency_ms"] > 0 for result in results)
+
+
+def test_ivf_pq_index(clustered_embedding):
+    faiss_index = build_faiss_index(
+        clustered_embedding, FaissIndexConfig(index_type="ivf_pq", pq_m=8)
+    )
+
+    _, indices = faiss_index.search(clustered_embedding[:5], 1)
+    assert faiss_index.ntotal == len(clustered_embedding)
+    assert (indices[:, 0] >= 0).all()
@@ -0,0 +1,66 @@
+import shutil
+from pathlib import Path
+
+import pytest
+from FastHPOCR.cr.CRIndexKB import CRIndexKB
+
+from deft_matcher.matchers.fast_cr_index import (
+    _GroupedCRIndexKB,
+    build_fast_cr_indexes,
+    index_digest,
+    index_file_path,
+    load_or_build_fast_cr_index,
+)
+
+MINI_HP_OBO = str(Path(__file__).parent / "data" / "mini_hp.obo")
+MINI_MONDO_OBO = str(Path(__file__).parent / "data" / "mini_mondo.obo")
+
+
+def test_index_digest_follows_obo_content_and_config(tmp_path):
+    copied_obo = tmp_path / "copy.obo"
+    shutil.copy(MINI_HP_OBO, copied_obo)
+    digest = index_digest(MINI_HP_OBO, "hpo", {})
+
+    assert index_digest(str(copied_obo), "hpo", {}) == digest
+    assert index_digest(MINI_HP_OBO, "mondo", {}) != digest
+    assert index_digest(MINI_HP_OBO, "hpo", {"rootConcepts": ["HP:0000118"]}) != digest
+
+    with open(copied_obo, "a") as f:
+        f.write("\n")
+    assert index_digest(str(copied_obo), "hpo", {}) != digest
+
+
+def test_grouped_cr_index_kb_matches_cr_index_kb():
+    base_clusters = {"tone": "c1", "tonus": "c1", "short": "c2", "low": "c3"}
+    inverted_clusters = {"tone": "c1", "short": "c2", "stature": "c4"}
+
+    original, grouped = CRIndexKB(), _GroupedCRIndexKB()
+    for kb in (original, grouped):
+        kb.invertedClusters = dict(inverted_clusters)
+        kb.prepareClustersToSerialise(base_clusters)
+
+    assert grouped.clusters == original.clusters
+
+
+def test_load_or_build_fast_cr_index_reuses_index(tmp_path):
+    path = load_or_build_fast_cr_index(MINI_HP_OBO, "hpo", {}, str(tmp_path))
+    built_at = path.stat().st_mtime_ns
+
+    assert path == index_file_path(MINI_HP_OBO, "hpo", {}, str(tmp_path))
+    assert load_or_build_fast_cr_index(MINI_HP_OBO, "hpo", {}, str(tmp_path)) == path
+    assert path.stat().st_mtime_ns == built_at
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_build_fast_cr_indexes(tmp_path):
+    paths = build_fast_cr_indexes(
+        [(MINI_HP_OBO, "hpo", {}), (MINI_MONDO_OBO, "mondo", {})],
+        str(tmp_path),
+        n_workers=2,
+    )
+
+    assert [path.name.split("_")[0] for path in paths] == ["hpo", "mondo"]
+    assert all(path.exists() for path in paths)
+
+    with pytest.raises(ValueError):
+        build_fast_cr_indexes([], str(tmp_path), n_workers=0)
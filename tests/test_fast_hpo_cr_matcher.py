@@ -1,4 +1,6 @@
 import os
+import pickle
+from pathlib import Path
 
 import pytest
 
@@ -16,3 +18,125 @@ def test_fast_hpo_cr_matcher():
         "HP:0002099",  # Asthma
         "HP:0004322",  # Short stature
     ]
+
+
+@pytest.fixture(scope="module")
+def mini_fast_hpo_cr_matcher(tmp_path_factory):
+    data_output_dir = tmp_path_factory.mktemp("fast_hpo_cr")
+    return FastHPOCRMatcher(
+        hpo_obo_path=str(Path(__file__).parent / "data" / "mini_hp.obo"),
+        data_output_dir=str(data_output_dir),
+    )
+
+
+def test_fast_hpo_cr_matcher_mini_hpo(mini_fast_hpo_cr_matcher):
+    assert mini_fast_hpo_cr_matcher.get_matches("asthma and shortened stature") == [
+        "HP:0002099",  # Asthma
+        "HP:0004322",  # Short stature
+    ]
+    assert mini_fast_hpo_cr_matcher.get_matches("nothing to see here") == []
+
+
+def test_fast_hpo_cr_matcher_does_not_write_annotations(mini_fast_hpo_cr_matcher):
+    data_output_dir = Path(mini_fast_hpo_cr_matcher.data_output_dir)
+
+    mini_fast_hpo_cr_matcher.get_matches_batch(["asthma", "low muscle tone"])
+
+    assert [
+        path.name for path in data_output_dir.iterdir() if path.suffix != ".lock"
+    ] == [mini_fast_hpo_cr_matcher.index_path.name]
+
+
+def test_fast_hpo_cr_matcher_throughput(mini_fast_hpo_cr_matcher):
+    texts_before = mini_fast_hpo_cr_matcher.annotated_texts
+    annotations_before = mini_fast_hpo_cr_matcher.annotation_count
+
+    mini_fast_hpo_cr_matcher.get_matches_batch(["asthma", "seizures", "no match"])
+
+    assert mini_fast_hpo_cr_matcher.annotated_texts == texts_before + 3
+    assert mini_fast_hpo_cr_matcher.annotation_count == annotations_before + 2
+    assert mini_fast_hpo_cr_matcher.annotations_per_second > 0
+
+
+def test_fast_hpo_cr_matcher_bulk_annotation(mini_fast_hpo_cr_matcher):
+    bulk_matcher = FastHPOCRMatcher(
+        hpo_obo_path=mini_fast_hpo_cr_matcher.hpo_obo_path,
+        data_output_dir=mini_fast_hpo_cr_matcher.data_output_dir,
+        bulk_annotation=True,
+    )
+    free_texts = [
+        "asthma and shortened stature",
+        "short stature with asthma",  # IDs in this text's own order
+        "short",  # "short" and "stature" must not join across the boundary
+        "stature",
+        "anti-ro(52) with low muscle tone",
+        "",
+        "Seizures,\nmicrocephaly  ",
+        "asthma\0short stature",
+        "short stature " * 1000,
+    ]
+    # Enough distinct texts to fill several documents, and some repeated.
+    free_texts += [
+        f"{text} {number}" for number in range(400) for text in free_texts[:7]
+    ]
+    free_texts += free_texts[:20]
+
+    bulk_matches = bulk_matcher.get_matches_batch(free_texts)
+
+    assert bulk_matches == mini_fast_hpo_cr_matcher.get_matches_batch(free_texts)
+    assert bulk_matches[:2] == [
+        ["HP:0002099", "HP:0004322"],
+        ["HP:0004322", "HP:0002099"],
+    ]
+    assert bulk_matches[2:4] == [[], []]
+
+
+def test_fast_hpo_cr_matcher_version(mini_fast_hpo_cr_matcher):
+    assert mini_fast_hpo_cr_matcher.version == "hp/releases/2025-11-24"
+
+
+def test_fast_hpo_cr_matcher_builds_index_on_first_use(tmp_path):
+    matcher = FastHPOCRMatcher(
+        hpo_obo_path=str(Path(__file__).parent / "data" / "mini_hp.obo"),
+        data_output_dir=str(tmp_path),
+    )
+    assert list(tmp_path.iterdir()) == []
+
+    matcher.warmup()
+    assert matcher.index_path.parent == tmp_path
+    assert [path.name for path in tmp_path.glob("*.index")] == [matcher.index_path.name]
+
+    copy = pickle.loads(pickle.dumps(matcher))
+    assert copy._annotator is None
+    assert copy.get_matches("asthma") == ["HP:0002099"]
+
+
+def test_fast_hpo_cr_matcher_reuses_index(mini_fast_hpo_cr_matcher):
+    mini_fast_hpo_cr_matcher.warmup()
+    index_path = mini_fast_hpo_cr_matcher.index_path
+    built_at = index_path.stat().st_mtime_ns
+
+    matcher = FastHPOCRMatcher(
+        hpo_obo_path=mini_fast_hpo_cr_matcher.hpo_obo_path,
+        data_output_dir=mini_fast_hpo_cr_matcher.data_output_dir,
+    )
+    matcher.warmup()
+
+    assert matcher.index_path == index_path
+    assert index_path.stat().st_mtime_ns == built_at
+
+
+def test_fast_hpo_cr_matcher_index_config(mini_fast_hpo_cr_matcher):
+    mini_fast_hpo_cr_matcher.warmup()
+    matcher = FastHPOCRMatcher(
+        hpo_obo_path=mini_fast_hpo_cr_matcher.hpo_obo_path,
+        data_output_dir=mini_fast_hpo_cr_matcher.data_output_dir,
+        index_config={"rootConcepts": ["HP:0000118"], "allow3LetterAcronyms": True},
+    )
+    matcher.warmup()
+
+    assert matcher.index_path != mini_fast_hpo_cr_matcher.index_path
+    assert (
+        matcher.config["index_config"]
+        != mini_fast_hpo_cr_matcher.config["index_config"]
+    )
@@ -1,4 +1,5 @@
 import os
+from pathlib import Path
 
 import pytest
 
@@ -20,3 +21,17 @@ def test_fast_mondo_cr_matcher():
         "MONDO:0009061",  # cystic fibrosis
         "MONDO:0000001",  # disease
     ]
+
+
+def test_fast_mondo_cr_matcher_mini_mondo(tmp_path):
+    fast_mondo_cr_matcher = FastMONDOCRMatcher(
+        mondo_obo_path=str(Path(__file__).parent / "data" / "mini_mondo.obo"),
+        data_output_dir=str(tmp_path),
+    )
+
+    assert fast_mondo_cr_matcher.get_matches_batch(
+        ["cystic fibrosis and other conditions", "marfan syndrome", "asthmatic"]
+    ) == [["MONDO:0009061"], ["MONDO:0007947"], []]
+    assert [path.name for path in tmp_path.glob("*.index")] == [
+        fast_mondo_cr_matcher.index_path.name
+    ]
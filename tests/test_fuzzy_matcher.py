@@ -0,0 +1,80 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from deft_matcher.lexicon import Lexicon
+from deft_matcher.matchers.fuzzy_matcher import FuzzyIndex, FuzzyMatcher
+
+
+def test_fuzzy_matcher_typos(mini_hpo):
+    matcher = FuzzyMatcher(mini_hpo)
+
+    assert matcher.get_matches("hypotonai") == ["HP:0001252"]  # Hypotonia
+    assert matcher.get_matches("Microcephally") == ["HP:0000252"]  # Microcephaly
+    assert matcher.get_matches("short statrue") == ["HP:0004322"]  # Short stature
+    assert matcher.get_matches("low muscel tone") == ["HP:0001252"]  # synonym
+    assert matcher.get_matches("asthma") == ["HP:0002099"]
+    assert matcher.get_matches("atsthmatic") == []
+    assert matcher.get_matches("") == []
+
+
+def test_fuzzy_matcher_short_texts_match_exactly(mini_hpo):
+    matcher = FuzzyMatcher(mini_hpo)
+
+    assert set(matcher.get_matches("asd")) == {"HP:0000729", "HP:0001631"}
+    assert matcher.get_matches("asx") == []
+    assert FuzzyMatcher(mini_hpo, chars_per_edit=1).get_matches("asx") != []
+
+
+def test_fuzzy_index_prefers_nearest():
+    index = FuzzyIndex.from_keys(["autism", "seizure", "seizures"], 2)
+
+    assert index.search("seizure", 2) == [(0, 1), (1, 2)]
+    assert index.search("siezures", 2) == [(1, 2), (2, 1)]
+    assert index.search("seizure", 0) == [(0, 1)]
+
+
+def test_fuzzy_index_ties_are_in_key_order():
+    index = FuzzyIndex.from_keys(["cat", "bat", "hat", "rat"], 1)
+
+    assert index.search("at", 1) == [(1, 0), (1, 1), (1, 2), (1, 3)]
+    assert index.search("zat", 1) == [(1, 0), (1, 1), (1, 2), (1, 3)]
+    with pytest.raises(ValueError):
+        index.search("at", 2)
+
+
+def test_fuzzy_index_saved_and_loaded(mini_hpo, tmp_path):
+    lexicon = Lexicon.from_ontology(mini_hpo)
+    free_texts = ["hypotonai", "microcephally", "ASD", "leg pian", "no match"]
+
+    matcher = FuzzyMatcher(lexicon, index_cache_dir=str(tmp_path))
+    matches = matcher.get_matches_batch(free_texts)
+    (directory,) = tmp_path.iterdir()
+    modified = directory.stat().st_mtime_ns
+
+    reloaded = FuzzyMatcher(lexicon, index_cache_dir=str(tmp_path))
+    assert reloaded.get_matches_batch(free_texts) == matches
+    assert isinstance(reloaded._index._deletes, np.memmap)
+    assert directory.stat().st_mtime_ns == modified
+
+    FuzzyMatcher(lexicon, max_distance=1, index_cache_dir=str(tmp_path)).warmup()
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_fuzzy_matcher_pickles_without_index(mini_hpo):
+    matcher = FuzzyMatcher(mini_hpo)
+    matcher.warmup()
+
+    copy = pickle.loads(pickle.dumps(matcher))
+    assert copy._index is None
+    assert copy.get_matches("hypotonai") == ["HP:0001252"]
+
+
+def test_fuzzy_matcher_rejects_bad_settings(mini_hpo):
+    with pytest.raises(ValueError):
+        FuzzyMatcher(mini_hpo, max_distance=-1)
+    with pytest.raises(ValueError):
+        FuzzyMatcher(mini_hpo, chars_per_edit=0)
+    with pytest.raises(ValueError):
+        FuzzyMatcher(mini_hpo, max_distance=3, prefix_length=3)
@@ -0,0 +1,88 @@
+import pickle
+
+import numpy as np
+import pytest
+from hpotk import SynonymCategory, SynonymType
+
+from deft_matcher.lexicon import Lexicon, load_or_build_lexicon
+from deft_matcher.matchers.exact_matcher import ExactMatcher
+from deft_matcher.matchers.synonym_matcher import SynonymMatcher
+
+
+@pytest.fixture
+def mini_lexicon(mini_hpo):
+    return Lexicon.from_ontology(mini_hpo)
+
+
+def test_lexicon_lookup(mini_lexicon):
+    all_synonyms = mini_lexicon.synonym_mask(
+        [*SynonymCategory, None], [*SynonymType, None]
+    )
+
+    assert mini_lexicon.lookup("asthma", mini_lexicon.label_mask()) == ["HP:0002099"]
+    assert mini_lexicon.lookup("asthma", all_synonyms) == []
+    assert set(mini_lexicon.lookup("asd", all_synonyms)) == {"HP:0000729", "HP:0001631"}
+    assert mini_lexicon.lookup("osd", all_synonyms) == []
+
+
+def test_saved_lexicon_is_memory_mapped(mini_lexicon, tmp_path):
+    mini_lexicon.save(tmp_path / "lexicon")
+
+    loaded = Lexicon.load(tmp_path / "lexicon")
+
+    assert isinstance(loaded._term_codes, np.memmap)
+    assert (loaded.prefix, loaded.version) == ("HP", "2025-11-24")
+    assert len(loaded) == len(mini_lexicon)
+    for free_text in ["asthma", "ASD", "small head", "hypotonia"]:
+        assert ExactMatcher(loaded).get_matches(free_text) == ExactMatcher(
+            mini_lexicon
+        ).get_matches(free_text)
+        assert SynonymMatcher(loaded).get_matches(free_text) == SynonymMatcher(
+            mini_lexicon
+        ).get_matches(free_text)
+
+
+def test_matchers_share_a_lexicon(mini_hpo, mini_lexicon):
+    free_texts = ["ASD", "small head", "asthma", "OSD"]
+    filters = [
+        {},
+        {"synonym_categories": [SynonymCategory.BROAD]},
+        {"synonym_types": [SynonymType.UK_SPELLING]},
+        {
+            "synonym_types": [SynonymType.ABBREVIATION],
+            "synonym_categories": [SynonymCategory.EXACT],
+        },
+    ]
+
+    for synonym_filter in filters:
+        assert SynonymMatcher(mini_lexicon, **synonym_filter).get_matches_batch(
+            free_texts
+        ) == SynonymMatcher(mini_hpo, **synonym_filter).get_matches_batch(free_texts)
+    assert ExactMatcher(mini_lexicon).name == ExactMatcher(mini_hpo).name
+
+
+def test_matchers_agree_with_lookup(mini_lexicon):
+    keys = [*mini_lexicon._keys, "not a key"]
+    exact_matcher = pickle.loads(pickle.dumps(ExactMatcher(mini_lexicon)))
+    synonym_matcher = SynonymMatcher(mini_lexicon)
+    synonym_mask = synonym_matcher._synonym_mask
+
+    assert exact_matcher.get_matches_batch(keys) == [
+        mini_lexicon.lookup(key, mini_lexicon.label_mask())[-1:] for key in keys
+    ]
+    assert synonym_matcher.get_matches_batch(keys) == [
+        mini_lexicon.lookup(key, synonym_mask) for key in keys
+    ]
+
+
+def test_load_or_build_lexicon(test_data_dir, tmp_path):
+    ontology_path = str(test_data_dir / "mini_hp.json")
+
+    lexicon = load_or_build_lexicon(ontology_path, tmp_path)
+    (directory,) = tmp_path.iterdir()
+    modified = directory.stat().st_mtime_ns
+    reloaded = load_or_build_lexicon(ontology_path, tmp_path)
+
+    assert directory.stat().st_mtime_ns == modified
+    assert len(reloaded) == len(lexicon)
+    assert ExactMatcher(reloaded).get_matches("Asthma") == ["HP:0002099"]
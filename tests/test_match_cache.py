@@ -0,0 +1,118 @@
+import pytest
+
+from deft_matcher.match_cache import SQLiteMatchCache
+from deft_matcher.matcher import Matcher
+
+
+class VersionedMatcher(Matcher):
+    def __init__(self, version: str = "v1", name: str = "VersionedMatcher") -> None:
+        self._version = version
+        self._name = name
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def version(self) -> str | None:
+        return self._version
+
+    def get_matches(self, free_text: str) -> list[str]:
+        return [f"HP:{len(free_text):07d}"]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SQLiteMatchCache(tmp_path / "matches.sqlite")
+    yield cache
+    cache.close()
+
+
+def test_get_many_counts_hits_and_misses(cache):
+    matcher = VersionedMatcher()
+    cache.put_many(matcher, ["asthma", "seizure"], [["HP:0002099"], []])
+
+    assert cache.get_many(matcher, ["asthma", "seizure", "hypotonia"]) == [
+        ["HP:0002099"],
+        [],
+        None,
+    ]
+    assert (cache.hits, cache.misses) == (2, 1)
+    assert cache.stats_by_matcher == {"VersionedMatcher": {"hits": 2, "misses": 1}}
+    assert cache.hit_rate == pytest.approx(2 / 3)
+
+
+def test_texts_are_keyed_exactly(cache):
+    matcher = VersionedMatcher()
+    cache.put_many(matcher, ["asthma", "asthma  "], [["HP:0002099"], []])
+
+    assert cache.get_many(matcher, ["asthma", "asthma  ", " asthma"]) == [
+        ["HP:0002099"],
+        [],
+        None,
+    ]
+
+
+def test_entries_of_an_older_format_are_dropped(tmp_path):
+    matcher = VersionedMatcher()
+    cache = SQLiteMatchCache(tmp_path / "matches.sqlite")
+    cache.put_many(matcher, ["asthma"], [["HP:0002099"]])
+    cache._connection.execute("PRAGMA user_version = 1")
+    cache._connection.commit()
+    cache.close()
+
+    reopened = SQLiteMatchCache(tmp_path / "matches.sqlite")
+    assert reopened.get_many(matcher, ["asthma"]) == [None]
+    assert len(reopened) == 0
+    reopened.close()
+
+
+def test_cache_persists_between_runs(tmp_path):
+    matcher = VersionedMatcher()
+    first = SQLiteMatchCache(tmp_path / "matches.sqlite")
+    first.put_many(matcher, ["asthma"], [["HP:0002099"]])
+    first.close()
+
+    second = SQLiteMatchCache(tmp_path / "matches.sqlite")
+    assert second.get_many(matcher, ["asthma"]) == [["HP:0002099"]]
+    second.close()
+
+
+def test_new_version_misses_and_prune_stale(cache):
+    cache.put_many(VersionedMatcher("v1"), ["asthma"], [["HP:0002099"]])
+    new_matcher = VersionedMatcher("v2")
+
+    assert cache.get_many(new_matcher, ["asthma"]) == [None]
+
+    cache.put_many(new_matcher, ["seizure"], [["HP:0001250"]])
+    cache.prune_stale(new_matcher)
+    assert len(cache) == 1
+
+
+def test_invalidate(cache):
+    cache.put_many(VersionedMatcher(name="A"), ["asthma"], [["HP:0002099"]])
+    cache.put_many(VersionedMatcher(name="B"), ["asthma"], [["HP:0002099"]])
+
+    cache.invalidate("A")
+    assert len(cache) == 1
+
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = SQLiteMatchCache(tmp_path / "matches.sqlite", max_entries=10)
+    matcher = VersionedMatcher()
+    cache.put_many(matcher, ["keep me"], [["HP:0000001"]])
+    cache.put_many(matcher, [f"old {i}" for i in range(8)], [[]] * 8)
+    cache.get_many(matcher, ["keep me"])
+
+    cache.put_many(matcher, ["new 1", "new 2"], [[], []])
+
+    assert len(cache) <= 10
+    assert cache.get_many(matcher, ["keep me", "new 2", "old 0"]) == [
+        ["HP:0000001"],
+        [],
+        None,
+    ]
+    cache.close()
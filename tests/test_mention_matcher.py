@@ -0,0 +1,83 @@
+import pickle
+
+from hpotk import SynonymType
+
+from deft_matcher.lexicon import Lexicon
+from deft_matcher.matchers.mention_matcher import MentionMatcher
+
+
+def test_mention_matcher_finds_mentions_within_text(mini_hpo):
+    matcher = MentionMatcher(mini_hpo)
+
+    assert matcher.get_matches("Asthma and small stature since 2019") == [
+        "HP:0002099",  # Asthma
+        "HP:0004322",  # Short stature
+    ]
+    assert matcher.get_matches("Leg pain, then asthma; leg pain again") == [
+        "HP:0012514",  # Lower limb pain
+        "HP:0002099",  # Asthma
+    ]
+    assert set(matcher.get_matches("known ASD")) == {"HP:0000729", "HP:0001631"}
+    assert matcher.get_matches("nothing to see here") == []
+    assert matcher.get_matches("") == []
+
+
+def test_mention_matcher_word_boundaries(mini_hpo):
+    assert MentionMatcher(mini_hpo).get_matches("asthmatic, hypotoniac") == []
+    assert MentionMatcher(mini_hpo, word_boundaries=False).get_matches(
+        "asthmatic, hypotoniac"
+    ) == ["HP:0002099", "HP:0001252"]
+
+
+def test_mention_matcher_longest_match(mini_hpo):
+    text = "muscle hypotonia with epileptic seizure"
+
+    assert MentionMatcher(mini_hpo).find_mentions(text) == [
+        (0, 16, ["HP:0001252"]),
+        (22, 39, ["HP:0001250"]),
+    ]
+    assert MentionMatcher(mini_hpo, longest_match=False).find_mentions(text) == [
+        (0, 16, ["HP:0001252"]),
+        (7, 16, ["HP:0001252"]),
+        (22, 39, ["HP:0001250"]),
+        (32, 39, ["HP:0001250"]),
+    ]
+
+
+def test_mention_matcher_synonym_filters(mini_hpo):
+    text = "small head and leg pain"
+
+    assert MentionMatcher(mini_hpo).get_matches(text) == ["HP:0000252", "HP:0012514"]
+    assert MentionMatcher(mini_hpo, include_synonyms=False).get_matches(text) == []
+    assert MentionMatcher(
+        mini_hpo, synonym_types=[SynonymType.LAYPERSON_TERM]
+    ).get_matches(text) == ["HP:0000252", "HP:0012514"]
+    assert (
+        MentionMatcher(mini_hpo, synonym_types=[SynonymType.ABBREVIATION]).get_matches(
+            text
+        )
+        == []
+    )
+
+
+def test_mention_matcher_agrees_with_lexicon(mini_hpo):
+    matcher = MentionMatcher(Lexicon.from_ontology(mini_hpo))
+    free_texts = ["Seizures, microcephaly", "anti-ro(52) with low muscle tone"]
+
+    assert matcher.get_matches_batch(free_texts) == MentionMatcher(
+        mini_hpo
+    ).get_matches_batch(free_texts)
+    assert matcher.name == "MentionMatcher(HP)"
+    assert matcher.version == "2025-11-24"
+
+
+def test_mention_matcher_builds_automaton_on_first_use(mini_hpo):
+    matcher = MentionMatcher(mini_hpo)
+    assert matcher._automaton is None
+
+    assert matcher.get_matches("asthma") == ["HP:0002099"]
+    assert matcher._automaton is not None
+
+    copy = pickle.loads(pickle.dumps(matcher))
+    assert copy._automaton is None
+    assert copy.get_matches("asthma") == ["HP:0002099"]
@@ -0,0 +1,138 @@
+import json
+
+import pytest
+
+from deft_matcher.ambiguity_resolvers.choose_first_resolver import ChooseFirstResolver
+from deft_matcher.decisive_matcher import DecisiveMatcher
+from deft_matcher.deft_matcher import DeftMatcher
+from deft_matcher.matchers.exact_matcher import ExactMatcher
+from deft_matcher.matchers.synonym_matcher import SynonymMatcher
+from deft_matcher.metrics import RunMetrics, StageMetrics
+from deft_matcher.metrics_exporters.callback_exporter import CallbackExporter
+from deft_matcher.metrics_exporters.json_file_exporter import JsonFileExporter
+from deft_matcher.metrics_exporters.prometheus_exporter import (
+    PrometheusTextExporter,
+    prometheus_text,
+)
+from deft_matcher.run_logging import LogConfig
+
+
+def test_stage_metrics():
+    stage = StageMetrics(
+        stage=0,
+        matcher_name="M",
+        resolver_name="R",
+        texts_in=100,
+        cache_hits=3,
+        cache_misses=1,
+        wall_seconds=2.0,
+        batch_timings=[(50, 0.5), (49, 0.49), (1, 1.0)],
+    )
+
+    assert stage.texts_per_second == 50
+    assert stage.cache_hit_rate == 0.75
+    assert stage.latency_percentile(50) == pytest.approx(0.01)
+    assert stage.latency_percentile(99) == pytest.approx(0.01)
+    assert stage.latency_percentile(100) == pytest.approx(1.0)
+
+
+def test_prometheus_text():
+    metrics = RunMetrics(
+        "DATA", stages=[StageMetrics(0, 'Exact"Matcher', "R", texts_in=4, matched=3)]
+    )
+
+    text = prometheus_text(metrics)
+
+    assert "# TYPE deft_matcher_matched counter" in text
+    assert (
+        'deft_matcher_matched{data_name="DATA",matcher="Exact\\"Matcher"} 3.0' in text
+    )
+
+
+def test_deft_matcher_metrics(tmp_path, mini_hpo):
+    exported: list[int] = []
+    choose_first = ChooseFirstResolver()
+
+    deft_matcher = DeftMatcher(
+        decisive_matchers=[
+            DecisiveMatcher(
+                matcher=ExactMatcher(mini_hpo), ambiguity_resolver=choose_first
+            ),
+            DecisiveMatcher(
+                matcher=SynonymMatcher(mini_hpo), ambiguity_resolver=choose_first
+            ),
+        ],
+        free_texts={"Asthma", "Seizure", "ASD", "Osthma"},
+        data_name="METRICS",
+        batch_size=2,
+        log_config=LogConfig(log_dir=None),
+        metrics_exporters=[
+            CallbackExporter(lambda metrics: exported.append(len(metrics.stages))),
+            JsonFileExporter(tmp_path / "metrics.json"),
+            PrometheusTextExporter(tmp_path / "metrics.prom"),
+        ],
+    )
+    deft_matcher.run()
+
+    exact_stage, synonym_stage = deft_matcher.metrics.stages
+    assert (exact_stage.texts_in, exact_stage.matched, exact_stage.unmatched) == (
+        4,
+        2,
+        2,
+    )
+    assert (synonym_stage.texts_in, synonym_stage.matched) == (2, 1)
+    assert [n_texts for n_texts, _ in exact_stage.batch_timings] == [2, 2]
+    assert deft_matcher.metrics.texts == 4
+    assert exported == [1, 2]
+
+    with open(tmp_path / "metrics.json") as f:
+        exported_json = json.load(f)
+    assert exported_json["matchers"]["SynonymMatcher(HP)"]["matched"] == 1
+    assert 'matcher="ExactMatcher(HP)"} 2.0' in (tmp_path / "metrics.prom").read_text()
+
+
+def test_streaming_metrics_stay_bounded(mini_hpo):
+    choose_first = ChooseFirstResolver()
+    exported: list[int] = []
+    deft_matcher = DeftMatcher(
+        decisive_matchers=[
+            DecisiveMatcher(
+                matcher=ExactMatcher(mini_hpo), ambiguity_resolver=choose_first
+            ),
+            DecisiveMatcher(
+                matcher=SynonymMatcher(mini_hpo), ambiguity_resolver=choose_first
+            ),
+        ],
+        free_texts=set(),
+        data_name="STREAM",
+        batch_size=1,
+        log_config=LogConfig(log_dir=None),
+        metrics_exporters=[
+            CallbackExporter(lambda metrics: exported.append(len(metrics.stages)))
+        ],
+    )
+    free_texts = [f"text {i}" for i in range(40)] + ["Asthma", "ASD"]
+
+    for _ in deft_matcher.stream(free_texts, chunk_size=2):
+        pass
+
+    metrics = deft_matcher.metrics
+    assert max(exported) == len(metrics.stages) == 2
+    assert metrics.stage_count == 42
+    assert metrics.texts == 42
+    exact_total = metrics.by_matcher()["ExactMatcher(HP)"]
+    assert (exact_total.texts_in, exact_total.matched) == (42, 1)
+    assert metrics.by_matcher()["SynonymMatcher(HP)"].matched == 1
+
+
+def test_matcher_timings_are_compacted():
+    metrics = RunMetrics("DATA")
+    for i in range(30000):
+        metrics.add_stage(
+            StageMetrics(0, "M", "R", texts_in=1, batch_timings=[(1, 0.001 * (i % 7))])
+        )
+
+    total = metrics.by_matcher()["M"]
+    assert len(total.batch_timings) <= 20000
+    assert total.texts_in == 30000
+    assert total.latency_percentile(50) == pytest.approx(0.003)
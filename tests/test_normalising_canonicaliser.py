@@ -0,0 +1,25 @@
+from deft_matcher.canonicalisers.normalising_canonicaliser import (
+    NormalisingCanonicaliser,
+)
+
+
+def test_normalising_canonicaliser():
+    canonicaliser = NormalisingCanonicaliser()
+
+    assert canonicaliser.canonicalise("Short  Stature") == "short stature"
+    assert canonicaliser.canonicalise("short-stature.") == "short stature"
+    assert canonicaliser.canonicalise("ＡＳＤ") == "asd"
+    assert canonicaliser.canonicalise("CD4+") != canonicaliser.canonicalise("CD4")
+
+
+def test_normalising_canonicaliser_options():
+    canonicaliser = NormalisingCanonicaliser(
+        lowercase=False,
+        strip_punctuation=False,
+        trailing_qualifiers=["NOS", "not otherwise specified"],
+    )
+
+    assert canonicaliser.canonicalise("Asthma, NOS") == "Asthma,"
+    assert canonicaliser.canonicalise("Asthma not otherwise specified NOS") == "Asthma"
+    assert canonicaliser.canonicalise("NOS") == "NOS"
+    assert canonicaliser.config != NormalisingCanonicaliser().config
@@ -0,0 +1,85 @@
+import json
+import pickle
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+from deft_matcher.matchers.rag_hpo_matcher.ollama_client import OllamaClient
+
+
+def user_input(hpo_id: str) -> str:
+    return json.dumps({"phrase": "x", "candidates": [{"hpo_id": hpo_id}]})
+
+
+def test_query(fake_ollama):
+    client = OllamaClient(model_name="fake", host=fake_ollama.host)
+
+    assert client.query("system", user_input("HP:0002099")) == "HP:0002099"
+    assert client.query("system", json.dumps({"candidates": []})) == ""
+
+
+def test_query_many_keeps_order_and_bounds_concurrency(fake_ollama):
+    fake_ollama.latency = 0.05
+    client = OllamaClient(
+        model_name="fake", host=fake_ollama.host, max_concurrent_requests=3
+    )
+    hpo_ids = [f"HP:{i:07d}" for i in range(12)]
+
+    answers = client.query_many("system", [user_input(hpo_id) for hpo_id in hpo_ids])
+
+    assert answers == hpo_ids
+    assert fake_ollama.requests == 12
+    assert 1 < fake_ollama.max_in_flight <= 3
+
+
+def test_query_many_reuses_event_loop(fake_ollama):
+    client = OllamaClient(model_name="fake", host=fake_ollama.host)
+
+    assert client.query_many("system", [user_input("HP:0000001")]) == ["HP:0000001"]
+    assert client.query_many("system", [user_input("HP:0000002")]) == ["HP:0000002"]
+
+
+def test_client_survives_pickling(fake_ollama):
+    client = OllamaClient(model_name="fake", host=fake_ollama.host)
+    client.query("system", user_input("HP:0000001"))
+
+    copied_client = pickle.loads(pickle.dumps(client))
+
+    assert copied_client.query_many("system", [user_input("HP:0000002")]) == [
+        "HP:0000002"
+    ]
+
+
+def test_concurrency_is_bounded_across_threads(fake_ollama):
+    fake_ollama.latency = 0.05
+    client = OllamaClient(
+        model_name="fake", host=fake_ollama.host, max_concurrent_requests=2
+    )
+    hpo_ids = [f"HP:{i:07d}" for i in range(6)]
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        answers = list(
+            pool.map(
+                lambda hpo_id: client.query_many("system", [user_input(hpo_id)] * 2),
+                hpo_ids,
+            )
+        )
+
+    assert answers == [[hpo_id, hpo_id] for hpo_id in hpo_ids]
+    assert 1 < fake_ollama.max_in_flight <= 2
+    client.close()
+
+
+def test_close_stops_the_event_loop(fake_ollama):
+    client = OllamaClient(model_name="fake", host=fake_ollama.host)
+    client.query("system", user_input("HP:0000001"))
+    client.query_many("system", [user_input("HP:0000001")])
+    loop_thread = client._loop_thread
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", ResourceWarning)
+        client.close()
+
+    assert loop_thread.loop.is_closed()
+    assert not loop_thread.thread.is_alive()
+    assert client.query_many("system", [user_input("HP:0000002")]) == ["HP:0000002"]
+    client.close()
@@ -1,6 +1,10 @@
+import json
 import os
+import shutil
+from pathlib import Path
 
 import pytest
+
 from deft_matcher.matchers.rag_hpo_matcher.rag_hpo_matcher import RagHpoMatcher
 
 
@@ -24,3 +28,87 @@ def test_rag_hpo_matcher(rag_hpo_matcher):
 
     assert len(painful_leg_matches) == 1
     assert painful_leg_matches[0] == "HP:0012514"
+
+
+@pytest.fixture
+def mini_rag_hpo_matcher(mini_rag_data, fake_ollama):
+    return RagHpoMatcher(
+        model_name="fake",
+        ollama_host=fake_ollama.host,
+        min_candidates=1,
+        embedding_batch_size=2,
+        max_concurrent_requests=2,
+        **mini_rag_data,
+    )
+
+
+def test_rag_hpo_matcher_fake_ollama(mini_rag_hpo_matcher):
+    assert mini_rag_hpo_matcher.get_matches("muscle hypotonia") == ["HP:0001252"]
+
+
+def test_rag_hpo_matcher_batch_fake_ollama(mini_rag_hpo_matcher, fake_ollama):
+    fake_ollama.latency = 0.02
+    free_texts = ["muscle hypotonia", "leg pain", "short stature", "asthma", "seizures"]
+
+    assert mini_rag_hpo_matcher.get_matches_batch(free_texts) == [
+        ["HP:0001252"],
+        ["HP:0012514"],
+        ["HP:0004322"],
+        ["HP:0002099"],
+        ["HP:0001250"],
+    ]
+    assert fake_ollama.requests == 5
+    assert fake_ollama.max_in_flight <= 2
+
+
+def test_rag_hpo_matcher_query_cache(mini_rag_data, fake_ollama, tmp_path):
+    matcher = RagHpoMatcher(
+        model_name="fake",
+        ollama_host=fake_ollama.host,
+        min_candidates=1,
+        query_cache_size=8,
+        **mini_rag_data,
+    )
+    assert matcher.get_matches("muscle hypotonia") == ["HP:0001252"]
+    assert matcher.get_matches_batch(["muscle hypotonia"]) == [["HP:0001252"]]
+    assert matcher.query_cache.stats["hits"] == 1
+    assert matcher.query_cache.stats["misses"] == 1
+    assert "query_embedding_store" not in matcher.config
+
+    stored = RagHpoMatcher(
+        model_name="fake", query_cache_dir=str(tmp_path), **mini_rag_data
+    )
+    assert stored.config["query_embedding_store"] == "float16"
+
+
+def test_rag_hpo_matcher_version(mini_rag_data, fake_ollama, tmp_path):
+    data = {
+        name: shutil.copy(path, tmp_path)
+        if os.path.isfile(path)
+        else shutil.copytree(path, tmp_path / Path(path).name)
+        for name, path in mini_rag_data.items()
+    }
+    matcher = RagHpoMatcher(model_name="fake", ollama_host=fake_ollama.host, **data)
+    unreachable = RagHpoMatcher(
+        model_name="fake", ollama_host="http://127.0.0.1:9", **data
+    )
+
+    assert json.loads(unreachable.version)["model_digest"] is None
+    assert json.loads(matcher.version)["model_digest"] is None
+    fake_ollama.digests["fake:latest"] = "sha256:1"
+    assert json.loads(matcher.version)["model_digest"] == "sha256:1"
+
+    versions = [matcher.version]
+    fake_ollama.digests["fake:latest"] = "sha256:2"
+    versions.append(matcher.version)
+    for name in ("embedded_hpo_path", "embedding_metadata_path"):
+        os.utime(data[name], ns=(0, os.stat(data[name]).st_mtime_ns + 1))
+        versions.append(matcher.version)
+    model_file = next(
+        path for path in Path(data["embedding_model_path"]).rglob("*") if path.is_file()
+    )
+    os.utime(model_file, ns=(0, model_file.stat().st_mtime_ns + 1))
+    versions.append(matcher.version)
+
+    assert len(set(versions)) == len(versions)
+    assert matcher.version == versions[-1]
@@ -0,0 +1,65 @@
+import pytest
+
+from deft_matcher.ambiguity_resolvers.choose_first_resolver import ChooseFirstResolver
+from deft_matcher.decisive_matcher import DecisiveMatcher
+from deft_matcher.matchers.exact_matcher import ExactMatcher
+from deft_matcher.matchers.synonym_matcher import SynonymMatcher
+from deft_matcher.canonicalisers.normalising_canonicaliser import (
+    NormalisingCanonicaliser,
+)
+from deft_matcher.results_store import MatchRecord, SQLiteResultsStore, stage_keys
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteResultsStore(tmp_path / "results.sqlite")
+    yield store
+    store.close()
+
+
+def record(free_text: str, match: str | None) -> MatchRecord:
+    return MatchRecord(
+        free_text=free_text,
+        match=match,
+        matcher_name="ExactMatcher(HP)" if match else None,
+        matcher_version="2025-11-24" if match else None,
+        resolver_name="ChooseFirstResolver" if match else None,
+        provenance_key="key",
+        data_name="TEST",
+        recorded_at="2025-01-01T00:00:00+00:00",
+    )
+
+
+def test_put_and_get_many(store):
+    store.put_many([record("asthma", "HP:0002099"), record("my leg hurts", None)])
+
+    assert store.get_many(["asthma", "my leg hurts", "seizure"]) == {
+        "asthma": record("asthma", "HP:0002099"),
+        "my leg hurts": record("my leg hurts", None),
+    }
+
+
+def test_put_many_replaces_records(store):
+    store.put_many([record("asthma", None)])
+    store.put_many([record("asthma", "HP:0002099")])
+
+    assert len(store) == 1
+    assert list(store.records()) == [record("asthma", "HP:0002099")]
+
+
+def test_stage_keys_depend_on_earlier_stages(mini_hpo):
+    choose_first = ChooseFirstResolver()
+    exact = DecisiveMatcher(ExactMatcher(mini_hpo), ambiguity_resolver=choose_first)
+    synonym = DecisiveMatcher(SynonymMatcher(mini_hpo), ambiguity_resolver=choose_first)
+
+    exact_then_synonym = stage_keys([exact, synonym])
+    synonym_then_exact = stage_keys([synonym, exact])
+
+    assert len(set(exact_then_synonym)) == 2
+    assert stage_keys([exact]) == exact_then_synonym[:1]
+    assert set(exact_then_synonym).isdisjoint(synonym_then_exact)
+    canonicalised = stage_keys([exact], NormalisingCanonicaliser())
+    assert canonicalised != stage_keys([exact])
+    assert canonicalised != stage_keys(
+        [exact], NormalisingCanonicaliser(lowercase=False)
+    )
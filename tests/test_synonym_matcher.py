@@ -87,3 +87,15 @@ def test_synonym_matcher_mondo(synonym_matcher_mondo):
         "MONDO:0007947",  # Marfan Syndrome
         "MONDO:0019202",  # Myxofibrosarcoma
     }
+
+
+def test_synonym_matcher_batch(mini_hpo):
+    synonym_matcher = SynonymMatcher(mini_hpo)
+
+    asd_matches, osd_matches, small_head_matches = synonym_matcher.get_matches_batch(
+        ["ASD", "OSD", "small head"]
+    )
+
+    assert set(asd_matches) == {"HP:0000729", "HP:0001631"}
+    assert osd_matches == []
+    assert small_head_matches == ["HP:0000252"]